@@ -10,11 +10,29 @@ from faker import Faker
 from datetime import datetime, timedelta
 import random
 import logging
-from tqdm import tqdm
 import json
 import os
+import io
+import csv
+import time
+import sys
+import argparse
+import multiprocessing
+import importlib.util
 from dotenv import load_dotenv
 
+try:
+    import resource
+except ImportError:  # No disponible en Windows
+    resource = None
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Solo se requiere para FileSink en formato Parquet
+    pa = None
+    pq = None
+
 # Configuración de logging
 logging.basicConfig(
     level=logging.INFO,
@@ -41,13 +59,276 @@ Faker.seed(42)
 random.seed(42)
 np.random.seed(42)
 
+# Motor de reglas de calidad compartido con el ETL (el nombre con guiones no es importable directamente)
+DATA_QUALITY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'A1-02_data_quality.py')
+_spec = importlib.util.spec_from_file_location('fleetlogix_data_quality', DATA_QUALITY_PATH)
+data_quality = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(data_quality)
+
+# Filas por buffer CSV enviado en cada COPY FROM STDIN
+COPY_BUFFER_ROWS = 50000
+
+# Columnas de viajes y entregas (con IDs asignados por el generador)
+TRIP_COLUMNS = ['trip_id', 'vehicle_id', 'driver_id', 'route_id', 'departure_datetime',
+                'arrival_datetime', 'fuel_consumed_liters', 'total_weight_kg', 'status']
+DELIVERY_COLUMNS = ['delivery_id', 'trip_id', 'tracking_number', 'customer_name', 'delivery_address',
+                    'package_weight_kg', 'scheduled_datetime', 'delivered_datetime',
+                    'delivery_status', 'recipient_signature']
+
+# Tablas que la migración opcional SQL/A2-05_partitioning.sql particiona por mes, y su columna de partición
+# (el esquema canónico SQL/fleetlogix_db_schema.sql es heap). FileSink también las reparte por día
+PARTITION_COLUMNS = {
+    'trips': 'departure_datetime',
+    'deliveries': 'scheduled_datetime'
+}
+# Meses creados por delante del último dato (entregas programadas tras la fecha actual)
+PARTITION_MONTHS_AHEAD = 1
+
+# Orden de carga respetando foreign keys y columna de ID de cada tabla
+TABLE_LOAD_ORDER = ['vehicles', 'drivers', 'routes', 'trips', 'deliveries', 'maintenance']
+ID_COLUMNS = {
+    'vehicles': 'vehicle_id',
+    'drivers': 'driver_id',
+    'routes': 'route_id',
+    'trips': 'trip_id',
+    'deliveries': 'delivery_id',
+    'maintenance': 'maintenance_id'
+}
+
+
+def peak_rss_mb():
+    """Memoria residente pico del proceso en MB (None si la plataforma no la expone)"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reporta KB y macOS bytes
+    return peak / 1024 / (1024 if sys.platform == 'darwin' else 1)
+
+
+class PostgresSink:
+    """Destino PostgreSQL: COPY FROM STDIN o INSERT con execute_batch"""
+    
+    def __init__(self, connection, load_mode='copy', checkpoint_rows=None):
+        if load_mode not in ('copy', 'insert'):
+            raise ValueError(f"Modo de carga no soportado: {load_mode}")
+        self.connection = connection
+        self.cursor = connection.cursor()
+        self.load_mode = load_mode
+        # Commit intermedio cada N filas en modo COPY (None = una transacción por tabla)
+        self.checkpoint_rows = checkpoint_rows
+        self.name = load_mode
+    
+    def write(self, table, columns, rows, progress_every=None):
+        """Cargar filas (lista de tuplas o DataFrame) con el modo configurado"""
+        if self.load_mode == 'copy':
+            self._copy_rows(table, columns, rows)
+        else:
+            self._insert_rows(table, columns, rows, progress_every)
+    
+    def _insert_rows(self, table, columns, rows, progress_every=None):
+        """Ruta INSERT: execute_batch con commit cada 1000 filas"""
+        if isinstance(rows, pd.DataFrame):
+            # psycopg2 no adapta tipos de NumPy: convertir a objetos nativos y NaT/NaN a None
+            rows = list(rows.astype(object).where(rows.notna(), None).itertuples(index=False, name=None))
+        query = f"""
+            INSERT INTO {table} ({', '.join(columns)})
+            VALUES ({', '.join(['%s'] * len(columns))})
+        """
+        
+        batch_size = 1000
+        for i in range(0, len(rows), batch_size):
+            batch = rows[i:i+batch_size]
+            execute_batch(self.cursor, query, batch, page_size=100)
+            self.connection.commit()
+            
+            if progress_every and i % progress_every == 0:
+                logging.info(f"  Progreso: {i}/{len(rows)} {table} insertados")
+    
+    def _copy_rows(self, table, columns, rows):
+        """Ruta COPY: envía buffers CSV en memoria con COPY FROM STDIN, una transacción por tabla"""
+        query = f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)"
+        
+        buffer_rows = min(COPY_BUFFER_ROWS, self.checkpoint_rows) if self.checkpoint_rows else COPY_BUFFER_ROWS
+        since_checkpoint = 0
+        for i in range(0, len(rows), buffer_rows):
+            batch = rows[i:i+buffer_rows]
+            self._copy_batch(query, batch)
+            
+            since_checkpoint += len(batch)
+            if self.checkpoint_rows and since_checkpoint >= self.checkpoint_rows:
+                self.connection.commit()
+                since_checkpoint = 0
+                logging.info(f"  Checkpoint: {i + len(batch)}/{len(rows)} {table} confirmados")
+        
+        self.connection.commit()
+    
+    def _copy_batch(self, query, batch):
+        """Enviar un lote como buffer CSV en memoria con COPY FROM STDIN (sin confirmar)"""
+        # None/NaT se escribe como campo vacío, que COPY interpreta como NULL
+        buffer = io.StringIO()
+        if isinstance(batch, pd.DataFrame):
+            batch.to_csv(buffer, header=False, index=False, lineterminator='\n')
+        else:
+            csv.writer(buffer, lineterminator='\n').writerows(batch)
+        buffer.seek(0)
+        self.cursor.copy_expert(query, buffer)
+    
+    def copy_files(self, table, root):
+        """Cargar con COPY los archivos generados por FileSink para una tabla (una transacción)"""
+        paths = sorted(
+            os.path.join(directory, name)
+            for directory, _, names in os.walk(os.path.join(root, table))
+            for name in names if name.endswith(('.csv', '.parquet'))
+        )
+        rows = 0
+        for path in paths:
+            if path.endswith('.csv'):
+                with open(path, encoding='utf-8') as f:
+                    columns = next(csv.reader(f))
+                    f.seek(0)
+                    self.cursor.copy_expert(
+                        f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv, HEADER true)", f
+                    )
+                rows += self.cursor.rowcount
+            else:
+                # Parquet: cada lote se reenvía como un buffer CSV dentro de la misma transacción
+                parquet = pq.ParquetFile(path)
+                query = f"COPY {table} ({', '.join(parquet.schema_arrow.names)}) FROM STDIN WITH (FORMAT csv)"
+                for batch in parquet.iter_batches(batch_size=COPY_BUFFER_ROWS):
+                    frame = batch.to_pandas()
+                    self._copy_batch(query, frame)
+                    rows += len(frame)
+        self.connection.commit()
+        logging.info(f"  {table}: {rows:,} filas cargadas desde {len(paths)} archivos")
+        return rows
+    
+    def close(self):
+        """Los datos ya quedan confirmados en cada write"""
+        self.cursor.close()
+
+
+class FileSink:
+    """Destino de archivos locales (Parquet o CSV) particionados por YYYY/MM/DD.
+    
+    Los viajes se particionan por departure_datetime y las entregas por scheduled_datetime;
+    el resto de tablas se escribe sin partición. En Parquet cada partición se escribe en row
+    groups a medida que llegan los lotes y el total de filas retenidas en memoria se limita a
+    row_group_rows. Los CSV usan el dialecto de COPY (FORMAT csv, HEADER true)."""
+    
+    def __init__(self, root, file_format='parquet', row_group_rows=100000, prefix=''):
+        if file_format not in ('parquet', 'csv'):
+            raise ValueError(f"Formato de archivo no soportado: {file_format}")
+        if file_format == 'parquet' and pq is None:
+            raise RuntimeError("pyarrow es necesario para escribir Parquet")
+        self.root = root
+        self.file_format = file_format
+        self.row_group_rows = row_group_rows
+        # Prefijo de los archivos para que varios procesos escriban en las mismas particiones
+        self.prefix = prefix
+        self.name = file_format
+        self._writers = {}
+        self._buffers = {}
+        self._buffered_rows = 0
+        self._file_counters = {}
+        # CSV abiertos en esta corrida: el primer lote reemplaza el archivo de una corrida anterior
+        self._csv_paths = set()
+    
+    def write(self, table, columns, rows, progress_every=None):
+        """Escribir un lote repartiendo sus filas en las particiones por fecha"""
+        frame = rows if isinstance(rows, pd.DataFrame) else pd.DataFrame(rows, columns=columns)
+        partition_column = PARTITION_COLUMNS.get(table)
+        if partition_column is None:
+            groups = [('', frame)]
+        else:
+            days = pd.to_datetime(frame[partition_column]).dt.floor('D')
+            groups = [
+                (day.strftime('%Y/%m/%d') if pd.notna(day) else 'sin_fecha', group)
+                for day, group in frame.groupby(days, sort=True, dropna=False)
+            ]
+        
+        if self.file_format == 'csv':
+            for partition, group in groups:
+                path = self._partition_path(table, partition, 0)
+                is_new = path not in self._csv_paths
+                self._csv_paths.add(path)
+                group.to_csv(path, mode='w' if is_new else 'a', header=is_new, index=False, lineterminator='\n')
+            return
+        
+        touched = set()
+        for partition, group in groups:
+            key = (table, partition)
+            touched.add(key)
+            self._buffers.setdefault(key, []).append(group)
+            self._buffered_rows += len(group)
+        if self._buffered_rows >= self.row_group_rows:
+            self._flush(keep_open=touched)
+    
+    def _partition_path(self, table, partition, file_number):
+        directory = os.path.join(self.root, table, partition)
+        os.makedirs(directory, exist_ok=True)
+        return os.path.join(directory, f"part-{self.prefix}{file_number:05d}.{self.file_format}")
+    
+    def _flush(self, keep_open=()):
+        """Escribir los buffers como row groups y cerrar las particiones que ya no reciben datos"""
+        for key, frames in self._buffers.items():
+            table = pa.Table.from_pandas(pd.concat(frames, ignore_index=True), preserve_index=False)
+            writer = self._writers.get(key)
+            if writer is None:
+                file_number = self._file_counters.get(key, 0)
+                self._file_counters[key] = file_number + 1
+                writer = pq.ParquetWriter(self._partition_path(key[0], key[1], file_number), table.schema)
+                self._writers[key] = writer
+            writer.write_table(table.cast(writer.schema))
+        self._buffers = {}
+        self._buffered_rows = 0
+        
+        for key in [k for k in self._writers if k not in keep_open]:
+            self._writers.pop(key).close()
+    
+    def close(self):
+        """Vaciar los buffers pendientes y cerrar todos los archivos"""
+        if self.file_format == 'parquet':
+            self._flush()
+
+
 class DataGenerator:
-    def __init__(self, db_config):
+    def __init__(self, db_config, load_mode='copy', checkpoint_rows=None, seed=42, name_pool_size=5000, sink=None,
+                 chunk_size=100000, quality='batch', quality_sample_percent=1.0,
+                 quality_report='data_quality_report.json'):
         self.db_config = db_config
         self.connection = None
         self.cursor = None
+        # Destino de los datos generados: PostgresSink al conectar o FileSink para archivos locales
+        self.sink = sink
         self.cities = ['Bogotá', 'Medellín', 'Cali', 'Barranquilla', 'Cartagena']
         
+        # Modo de carga del PostgresSink: 'copy' (COPY FROM STDIN) o 'insert' (execute_batch)
+        self.load_mode = load_mode
+        # Commit intermedio cada N filas en modo COPY (None = una transacción por tabla)
+        self.checkpoint_rows = checkpoint_rows
+        
+        # Semilla de la generación columnar: cada bloque deriva sus generadores de NumPy de ella
+        self.seed = seed
+        # Viajes por bloque en la generación en streaming (la memoria pico depende de este valor)
+        self.chunk_size = chunk_size
+        # Tamaño del pool de nombres/direcciones de Faker (se genera una sola vez)
+        self.name_pool_size = name_pool_size
+        self._faker_pools = None
+        
+        # Reglas de calidad (A1-02): 'batch' valida cada bloque en memoria antes de escribirlo, 'sample'
+        # verifica una muestra TABLESAMPLE al terminar y 'off' no valida
+        self.quality = data_quality.DataQualityEngine(mode=quality) if quality != 'off' else None
+        self.quality_sample_percent = quality_sample_percent
+        self.quality_report = quality_report
+        
+        # Datos generados conservados en memoria (columnar, con IDs asignados) para alimentar
+        # las etapas siguientes sin releer PostgreSQL
+        self.vehicles = None
+        self.drivers = None
+        self.routes = None
+        self.trips = None
+        self.vehicle_trip_stats = None
+        
         # Contadores para logging
         self.counters = {
             'vehicles': 0,
@@ -57,18 +338,121 @@ class DataGenerator:
             'deliveries': 0,
             'maintenance': 0
         }
+        # Rendimiento de carga por tabla (filas/segundo) y memoria pico de la generación
+        self.load_stats = {}
+        self.peak_rss_mb = None
     
     def connect(self):
         """Establecer conexión con la base de datos"""
         try:
             self.connection = psycopg2.connect(**self.db_config)
             self.cursor = self.connection.cursor()
+            if self.sink is None:
+                self.sink = PostgresSink(self.connection, self.load_mode, self.checkpoint_rows)
             logging.info(" Conexión exitosa a PostgreSQL")
             return True
         except Exception as e:
             logging.error(f" Error al conectar: {e}")
             return False
     
+    def _next_id(self, table, id_column):
+        """Primer ID libre de una tabla (1 si se genera sin base de datos)"""
+        if self.connection is None:
+            return 1
+        self.cursor.execute(f"SELECT COALESCE(MAX({id_column}), 0) + 1 FROM {table}")
+        return self.cursor.fetchone()[0]
+    
+    def _sync_sequence(self, table, id_column):
+        """Alinear la secuencia SERIAL con los IDs asignados explícitamente"""
+        if self.connection is None:
+            return
+        self.cursor.execute(f"""
+            SELECT setval(pg_get_serial_sequence('{table}', '{id_column}'), GREATEST(MAX({id_column}), 1))
+            FROM {table}
+        """)
+        self.connection.commit()
+    
+    def _partitioned_tables(self):
+        """Tablas de PARTITION_COLUMNS declaradas como particionadas en la base de datos"""
+        if self.connection is None:
+            return []
+        self.cursor.execute("""
+            SELECT c.relname FROM pg_partitioned_table p
+            JOIN pg_class c ON c.oid = p.partrelid
+            JOIN pg_namespace n ON n.oid = c.relnamespace
+            WHERE n.nspname = current_schema() AND c.relname = ANY(%s)
+        """, (list(PARTITION_COLUMNS),))
+        return [r[0] for r in self.cursor.fetchall()]
+    
+    def ensure_partitions(self, start_date, end_date):
+        """Crear las particiones mensuales (tabla_YYYY_MM) que falten entre start_date y end_date más
+        PARTITION_MONTHS_AHEAD meses. Sin tablas particionadas (esquema heap) no hace nada"""
+        tables = self._partitioned_tables()
+        if not tables:
+            return
+        months = pd.date_range(pd.Timestamp(start_date).to_period('M').to_timestamp(),
+                               pd.Timestamp(end_date) + pd.DateOffset(months=PARTITION_MONTHS_AHEAD), freq='MS')
+        self.cursor.execute("""
+            SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent::regclass::text = ANY(%s)
+        """, (tables,))
+        existing = {r[0] for r in self.cursor.fetchall()}
+        created = 0
+        for table in tables:
+            for month in months:
+                name = f"{table}_{month:%Y_%m}"
+                if name in existing:
+                    continue
+                self.cursor.execute(
+                    f"CREATE TABLE {name} PARTITION OF {table} FOR VALUES FROM (%s) TO (%s)",
+                    (month.to_pydatetime(), (month + pd.DateOffset(months=1)).to_pydatetime())
+                )
+                created += 1
+        self.connection.commit()
+        logging.info(f" Particiones mensuales: {created} creadas en {', '.join(tables)} "
+                     f"({months[0]:%Y-%m} a {months[-1]:%Y-%m})")
+    
+    def _load_rows(self, table, columns, rows, progress_every=None):
+        """Enviar filas (lista de tuplas o DataFrame) al destino configurado y registrar filas/segundo"""
+        if isinstance(rows, pd.DataFrame):
+            rows = rows[columns]
+        self._validate_rows(table, columns, rows)
+        if self.sink is None:
+            logging.info(f"  Sin destino: {len(rows):,} filas de {table} solo en memoria")
+            return
+        start = time.perf_counter()
+        self.sink.write(table, columns, rows, progress_every)
+        elapsed = time.perf_counter() - start
+        
+        # Acumular por tabla: en streaming una tabla se carga en varios bloques
+        rows_per_sec = len(rows) / elapsed if elapsed > 0 else 0.0
+        stats = self.load_stats.setdefault(table, {'mode': self.sink.name, 'rows': 0, 'seconds': 0.0})
+        stats['rows'] += len(rows)
+        stats['seconds'] = round(stats['seconds'] + elapsed, 3)
+        stats['rows_per_sec'] = round(stats['rows'] / stats['seconds'], 1) if stats['seconds'] > 0 else 0.0
+        logging.info(f"  Carga {table} ({self.sink.name}): {len(rows):,} filas en {elapsed:.2f}s ({rows_per_sec:,.0f} filas/s)")
+    
+    def _validate_rows(self, table, columns, rows):
+        """Evaluar las reglas de calidad sobre el bloque en memoria, antes de escribirlo (modo batch)"""
+        if self.quality is None or self.quality.mode != 'batch' or table not in data_quality.RULES:
+            return
+        frame = rows if isinstance(rows, pd.DataFrame) else pd.DataFrame(rows, columns=columns)
+        invalid = self.quality.validate(table, frame)
+        if invalid:
+            logging.warning(f"  Calidad {table}: {invalid:,} filas del bloque violan reglas de integridad")
+    
+    def _quality_reference(self, table, frame):
+        """Registrar las filas contra las que se validan las referencias de las tablas siguientes"""
+        if self.quality is not None:
+            self.quality.set_reference(table, frame)
+    
+    def _set_quality_references(self, vehicles, drivers, routes):
+        """Referencias de los viajes a partir de los datos de _fetch_reference_data (listas de tuplas)"""
+        self._quality_reference('vehicles', pd.DataFrame(vehicles, columns=['vehicle_id', 'capacity_kg'])
+                                .astype({'capacity_kg': float}))
+        self._quality_reference('drivers', pd.DataFrame({'driver_id': drivers}))
+        self._quality_reference('routes', pd.DataFrame([r[:1] for r in routes], columns=['route_id']))
+    
     def generate_vehicles(self, count=200):
         """Generar 200 vehículos con diferentes tipos y capacidades"""
         logging.info(f"Generando {count} vehículos...")
@@ -105,20 +489,13 @@ class DataGenerator:
                 status
             ))
         
-        # Insertar en batch
-        query = """
-            INSERT INTO vehicles (
-                license_plate, 
-                vehicle_type, 
-                capacity_kg, 
-                fuel_type, 
-                acquisition_date, 
-                status
-            ) VALUES (%s, %s, %s, %s, %s, %s)
-        """
-        
-        execute_batch(self.cursor, query, vehicles, page_size=100)
-        self.connection.commit()
+        # Insertar en batch con IDs asignados (se conservan en memoria para los viajes)
+        columns = ['license_plate', 'vehicle_type', 'capacity_kg', 'fuel_type', 'acquisition_date', 'status']
+        self.vehicles = pd.DataFrame(vehicles, columns=columns)
+        first_id = self._next_id('vehicles', 'vehicle_id')
+        self.vehicles.insert(0, 'vehicle_id', np.arange(first_id, first_id + len(vehicles)))
+        self._load_rows('vehicles', ['vehicle_id'] + columns, self.vehicles)
+        self._sync_sequence('vehicles', 'vehicle_id')
         self.counters['vehicles'] = count
         logging.info(f" {count} vehículos insertados")
     
@@ -160,15 +537,13 @@ class DataGenerator:
                 status
             ))
         
-        query = """
-            INSERT INTO drivers (employee_code, first_name, last_name, 
-                               license_number, license_expiry, phone, 
-                               hire_date, status)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-        """
-        
-        execute_batch(self.cursor, query, drivers, page_size=100)
-        self.connection.commit()
+        columns = ['employee_code', 'first_name', 'last_name', 'license_number',
+                   'license_expiry', 'phone', 'hire_date', 'status']
+        self.drivers = pd.DataFrame(drivers, columns=columns)
+        first_id = self._next_id('drivers', 'driver_id')
+        self.drivers.insert(0, 'driver_id', np.arange(first_id, first_id + len(drivers)))
+        self._load_rows('drivers', ['driver_id'] + columns, self.drivers)
+        self._sync_sequence('drivers', 'driver_id')
         self.counters['drivers'] = count
         logging.info(f" {count} conductores insertados")
     
@@ -222,14 +597,13 @@ class DataGenerator:
         # Ajustar para tener exactamente 50 rutas
         routes = routes[:count]
         
-        query = """
-            INSERT INTO routes (route_code, origin_city, destination_city, 
-                              distance_km, estimated_duration_hours, toll_cost)
-            VALUES (%s, %s, %s, %s, %s, %s)
-        """
-        
-        execute_batch(self.cursor, query, routes, page_size=50)
-        self.connection.commit()
+        columns = ['route_code', 'origin_city', 'destination_city',
+                   'distance_km', 'estimated_duration_hours', 'toll_cost']
+        self.routes = pd.DataFrame(routes, columns=columns)
+        first_id = self._next_id('routes', 'route_id')
+        self.routes.insert(0, 'route_id', np.arange(first_id, first_id + len(routes)))
+        self._load_rows('routes', ['route_id'] + columns, self.routes)
+        self._sync_sequence('routes', 'route_id')
         self.counters['routes'] = count
         logging.info(f" {count} rutas insertadas")
     
@@ -253,90 +627,299 @@ class DataGenerator:
         return distances.get(key, 500)
     
     def generate_trips(self, count=100000):
-        """Generar 100000 viajes en 2 años de operación"""
+        """Generar 100000 viajes en 2 años de operación (por bloques de chunk_size)"""
         logging.info(f"Generando {count} viajes...")
         
-        # Obtener IDs válidos
+        reference = self._fetch_reference_data()
+        self._set_quality_references(*reference)
+        routes = reference[2]
+        
+        # Fecha inicial: 2 años atrás
+        now = datetime.now()
+        start_date = now - timedelta(days=730)
+        self.ensure_partitions(start_date, now)
+        first_id = self._next_id('trips', 'trip_id')
+        
+        # Insertar por bloques y conservar en memoria la vista compacta para entregas y mantenimiento
+        compact_chunks = []
+        for trips, num_deliveries, _ in self._iter_trip_chunks(count, reference, start_date, now, first_id):
+            self._load_rows('trips', TRIP_COLUMNS, trips, progress_every=10000)
+            compact = self._compact_trips(trips, routes, num_deliveries)
+            self._accumulate_vehicle_trip_stats(compact)
+            compact_chunks.append(compact)
+        self._sync_sequence('trips', 'trip_id')
+        self.trips = pd.concat(compact_chunks, ignore_index=True)
+        
+        self.counters['trips'] = count
+        logging.info(f" {count} viajes insertados")
+    
+    def generate_trips_and_deliveries(self, trip_count=100000, delivery_count=400000):
+        """Generar viajes y entregas en streaming: cada bloque de viajes se carga junto con sus entregas
+        y se descarta, de modo que la memoria pico depende de chunk_size y no del total"""
+        logging.info(f"Generando {trip_count} viajes y {delivery_count} entregas en bloques de {self.chunk_size}...")
+        
+        reference = self._fetch_reference_data()
+        self._set_quality_references(*reference)
+        now = datetime.now()
+        start_date = now - timedelta(days=730)
+        self.ensure_partitions(start_date, now)
+        
+        trips, deliveries = self._stream_trips_and_deliveries(
+            reference, trip_count, delivery_count, start_date, now,
+            first_trip_id=self._next_id('trips', 'trip_id'),
+            first_delivery_id=self._next_id('deliveries', 'delivery_id')
+        )
+        self._sync_sequence('trips', 'trip_id')
+        self._sync_sequence('deliveries', 'delivery_id')
+        
+        self.counters['trips'] = trips
+        self.counters['deliveries'] = deliveries
+        self.peak_rss_mb = peak_rss_mb()
+        logging.info(f" {trips} viajes y {deliveries} entregas insertados (memoria pico: {self.peak_rss_mb or 0:.0f} MB)")
+    
+    def _stream_trips_and_deliveries(self, reference, trip_count, delivery_limit, start_date, now,
+                                     first_trip_id, first_delivery_id, shard=0, first_index=0, total=None):
+        """Ciclo productor -> destino por bloques, compartido por la ruta secuencial y los shards"""
+        routes = reference[2]
+        trips_written = 0
+        deliveries_written = 0
+        for trips, num_deliveries, delivery_rng in self._iter_trip_chunks(
+            trip_count, reference, start_date, now, first_trip_id, shard, first_index, total
+        ):
+            self._load_rows('trips', TRIP_COLUMNS, trips)
+            compact = self._compact_trips(trips, routes, num_deliveries)
+            self._accumulate_vehicle_trip_stats(compact)
+            trips_written += len(trips)
+            
+            deliveries = self._build_delivery_frame(
+                compact, delivery_limit - deliveries_written, first_delivery_id + deliveries_written, delivery_rng
+            )
+            # Las entregas del bloque solo referencian viajes del mismo bloque
+            self._quality_reference('trips', compact)
+            self._load_rows('deliveries', DELIVERY_COLUMNS, deliveries)
+            deliveries_written += len(deliveries)
+        return trips_written, deliveries_written
+    
+    def _iter_trip_chunks(self, count, reference, start_date, now, first_id, shard=0, first_index=0, total=None):
+        """Productor de viajes en bloques de chunk_size con trip_id asignado y entregas por viaje ya sorteadas.
+        Cada bloque usa sus propios generadores derivados de (semilla, shard, bloque)"""
+        vehicles, drivers, routes = reference
+        total = total or count
+        for chunk, offset in enumerate(range(0, count, self.chunk_size)):
+            size = min(self.chunk_size, count - offset)
+            trip_rng, delivery_rng = self._chunk_rngs(shard, chunk)
+            trips = self._build_trip_frame(size, vehicles, drivers, routes, start_date, now, trip_rng,
+                                           first_index=first_index + offset, total=total)
+            trips.insert(0, 'trip_id', np.arange(first_id + offset, first_id + offset + size))
+            
+            # Entregas por viaje solo para los viajes completados
+            completed = (trips['status'] == 'completed').to_numpy()
+            num_deliveries = np.zeros(size, dtype=np.int8)
+            num_deliveries[completed] = self._draw_delivery_counts(int(completed.sum()), trip_rng)
+            yield trips, num_deliveries, delivery_rng
+    
+    def _chunk_rngs(self, shard, chunk):
+        """Generadores independientes para viajes y para atributos de entregas de un bloque"""
+        trip_seed, delivery_seed = np.random.SeedSequence(self.seed, spawn_key=(shard, chunk)).spawn(2)
+        return np.random.default_rng(trip_seed), np.random.default_rng(delivery_seed)
+    
+    def _fetch_reference_data(self):
+        """Obtener vehículos, conductores y rutas válidos para asignar a los viajes"""
+        if self.vehicles is not None and self.drivers is not None and self.routes is not None:
+            # Flota generada en esta ejecución: no hace falta consultar la base de datos
+            active_vehicles = self.vehicles[self.vehicles['status'] == 'active']
+            vehicles = list(zip(active_vehicles['vehicle_id'].tolist(), active_vehicles['capacity_kg'].tolist()))
+            drivers = self.drivers.loc[self.drivers['status'] == 'active', 'driver_id'].tolist()
+            routes = list(self.routes[['route_id', 'distance_km', 'estimated_duration_hours', 'destination_city']]
+                          .astype(object).itertuples(index=False, name=None))
+            return vehicles, drivers, routes
+        
         self.cursor.execute("SELECT vehicle_id, capacity_kg FROM vehicles WHERE status = 'active'")
         vehicles = self.cursor.fetchall()
         
         self.cursor.execute("SELECT driver_id FROM drivers WHERE status = 'active'")
         drivers = [d[0] for d in self.cursor.fetchall()]
         
-        self.cursor.execute("SELECT route_id, distance_km, estimated_duration_hours FROM routes")
+        self.cursor.execute("SELECT route_id, distance_km, estimated_duration_hours, destination_city FROM routes")
         routes = self.cursor.fetchall()
+        return vehicles, drivers, routes
+    
+    def _build_trip_frame(self, count, vehicles, drivers, routes, start_date, now, rng, first_index=0, total=None):
+        """Generar los viajes de forma columnar: cada atributo se sortea en una sola llamada de NumPy.
+        first_index/total ubican el bloque dentro de la línea de tiempo completa (bloques y shards)"""
+        total = total or count
+        vehicle_ids = np.array([v[0] for v in vehicles])
+        capacities = np.array([float(v[1]) for v in vehicles])
+        route_ids = np.array([r[0] for r in routes])
+        distances = np.array([float(r[1]) for r in routes])
+        est_durations = np.array([float(r[2]) for r in routes])
         
-        # Fecha inicial: 2 años atrás
-        start_date = datetime.now() - timedelta(days=730)
+        # Selección aleatoria de vehículo, conductor y ruta
+        vehicle_idx = rng.integers(0, len(vehicle_ids), count)
+        driver_ids = rng.choice(np.array(drivers), count)
+        route_idx = rng.integers(0, len(route_ids), count)
         
-        trips = []
-        current_date = start_date
+        # Horario de salida (más viajes en horario laboral); la distribución se calcula una sola vez
+        hours = rng.choice(24, size=count, p=self._get_hourly_distribution())
+        minutes = rng.integers(0, 60, count)
         
-        # Distribuir viajes a lo largo de 2 años
-        for i in tqdm(range(count), desc="Generando trips"):
-            vehicle_id, capacity = random.choice(vehicles)
-            capacity = float(capacity)
-            driver_id = random.choice(drivers)
-            route_id, distance, est_duration = random.choice(routes)
-            
-            distance = float(distance)
-            est_duration = float(est_duration)
-            
-            # Horario de salida (más viajes en horario laboral)
-            hour = np.random.choice(
-                range(24), 
-                p=self._get_hourly_distribution()
-            )
-            departure = current_date.replace(hour=hour, minute=random.randint(0, 59))
-            
-            # Duración real con variación
-            actual_duration = est_duration * random.uniform(0.8, 1.3)
-            arrival = departure + timedelta(hours=actual_duration)
-            
-            # Consumo de combustible basado en distancia y tipo de vehículo
-            fuel_consumed = distance * random.uniform(0.08, 0.15)  # 8-15L/100km
-            
-            # Peso total (40-90% de capacidad)
-            total_weight = capacity * random.uniform(0.4, 0.9)
-            
-            # Estado (95% completados)
-            if arrival < datetime.now():
-                status = 'completed'
-            else:
-                status = 'in_progress'
-            
-            trips.append((
-                vehicle_id,
-                driver_id,
-                route_id,
-                departure,
-                arrival if status == 'completed' else None,
-                round(fuel_consumed, 2),
-                round(total_weight, 2),
-                status
-            ))
-            
-            # Avanzar fecha (distribución uniforme)
-            current_date += timedelta(minutes=int(1440 * 2 * 365 / count))
-        
-        # Insertar en batches
-        query = """
-            INSERT INTO trips (vehicle_id, driver_id, route_id, departure_datetime,
-                             arrival_datetime, fuel_consumed_liters, total_weight_kg, status)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-        """
+        # Avanzar fecha (distribución uniforme en los 2 años). Por encima de un viaje por minuto
+        # el paso entero en minutos sería 0, así que se usa un paso en microsegundos
+        step_minutes = int(1440 * 2 * 365 / total)
+        if step_minutes > 0:
+            step = np.timedelta64(step_minutes, 'm')
+        else:
+            step = np.timedelta64(2 * 365 * 86400 * 10**6 // total, 'us')
+        current_dates = np.datetime64(start_date, 'us') + np.arange(first_index, first_index + count) * step
         
-        batch_size = 1000
-        for i in range(0, len(trips), batch_size):
-            batch = trips[i:i+batch_size]
-            execute_batch(self.cursor, query, batch, page_size=100)
-            self.connection.commit()
+        # Equivalente a current_date.replace(hour=hour, minute=minute): conserva segundos y microsegundos
+        sub_minute = np.timedelta64(start_date.second * 10**6 + start_date.microsecond, 'us')
+        departure = (current_dates.astype('datetime64[D]').astype('datetime64[us]')
+                     + hours * np.timedelta64(1, 'h')
+                     + minutes * np.timedelta64(1, 'm')
+                     + sub_minute)
+        
+        # Duración real con variación
+        actual_duration = est_durations[route_idx] * rng.uniform(0.8, 1.3, count)
+        arrival = departure + (actual_duration * 3600 * 10**6).astype('int64') * np.timedelta64(1, 'us')
+        
+        # Consumo de combustible (8-15L/100km) y peso total (40-90% de capacidad)
+        fuel_consumed = distances[route_idx] * rng.uniform(0.08, 0.15, count)
+        total_weight = capacities[vehicle_idx] * rng.uniform(0.4, 0.9, count)
+        
+        # Estado: completado si ya llegó, en progreso en caso contrario (sin fecha de llegada)
+        completed = arrival < np.datetime64(now, 'us')
+        
+        return pd.DataFrame({
+            'vehicle_id': vehicle_ids[vehicle_idx],
+            'driver_id': driver_ids,
+            'route_id': route_ids[route_idx],
+            'departure_datetime': departure,
+            'arrival_datetime': np.where(completed, arrival, np.datetime64('NaT')),
+            'fuel_consumed_liters': fuel_consumed.round(2),
+            'total_weight_kg': total_weight.round(2),
+            'status': np.where(completed, 'completed', 'in_progress')
+        })
+    
+    def generate_trips_and_deliveries_sharded(self, trip_count=100000, delivery_count=400000, workers=4):
+        """Generar viajes y entregas en paralelo: un shard por proceso, cada uno con su semilla derivada
+        y su propia conexión. Los IDs se asignan explícitamente para que el resultado sea idéntico
+        para una misma semilla y número de shards, sin importar el orden de ejecución de los procesos"""
+        logging.info(f"Generando {trip_count} viajes y {delivery_count} entregas en {workers} shards...")
+        
+        vehicles, drivers, routes = self._fetch_reference_data()
+        now = datetime.now()
+        start_date = now - timedelta(days=730)
+        # Las particiones se crean antes de lanzar los shards para que no compitan por el DDL
+        self.ensure_partitions(start_date, now)
+        
+        # Bases de IDs: los shards escriben trip_id/delivery_id explícitos a continuación de los existentes
+        trip_base = self._next_id('trips', 'trip_id') - 1
+        delivery_base = self._next_id('deliveries', 'delivery_id') - 1
+        
+        # Rangos contiguos de la línea de tiempo de viajes, uno por shard
+        bounds = np.linspace(0, trip_count, workers + 1).astype(int)
+        specs = [{
+            'db_config': self.db_config,
+            'connected': self.connection is not None,
+            'file_sink': self._file_sink_spec(),
+            'load_mode': self.load_mode,
+            'checkpoint_rows': self.checkpoint_rows,
+            'seed': self.seed,
+            'name_pool_size': self.name_pool_size,
+            'chunk_size': self.chunk_size,
+            'quality': self.quality.mode if self.quality is not None else 'off',
+            'shard': shard,
+            'first_index': int(bounds[shard]),
+            'count': int(bounds[shard + 1] - bounds[shard]),
+            'total': trip_count,
+            'vehicles': vehicles,
+            'drivers': drivers,
+            'routes': routes,
+            'start_date': start_date,
+            'now': now,
+            'trip_base': trip_base,
+            'delivery_base': delivery_base
+        } for shard in range(workers)]
+        
+        with multiprocessing.Pool(workers) as pool:
+            # Fase 1: cada shard calcula cuántas entregas producirá (solo viajes y conteos, sin Faker ni carga)
+            planned = pool.map(_plan_shard, specs)
+            offsets = np.concatenate(([0], np.cumsum(planned)[:-1]))
+            for spec, offset, shard_planned in zip(specs, offsets, planned):
+                spec['delivery_offset'] = int(offset)
+                spec['delivery_limit'] = int(max(0, min(shard_planned, delivery_count - offset)))
             
-            if i % 10000 == 0:
-                logging.info(f"  Progreso: {i}/{count} trips insertados")
+            # Fase 2: generación completa y carga concurrente, cada shard con su conexión
+            results = pool.map(_run_shard, specs)
         
-        self.counters['trips'] = count
-        logging.info(f" {count} viajes insertados")
+        # Sincronizar las secuencias SERIAL con los IDs explícitos
+        self._sync_sequence('trips', 'trip_id')
+        self._sync_sequence('deliveries', 'delivery_id')
+        
+        self.counters['trips'] = sum(r['trips'] for r in results)
+        self.counters['deliveries'] = sum(r['deliveries'] for r in results)
+        self.vehicle_trip_stats = self._merge_vehicle_trip_stats([r['vehicle_trip_stats'] for r in results])
+        for result in results:
+            if result['quality'] is not None:
+                self.quality.merge(result['quality'])
+        self.peak_rss_mb = max([r['peak_rss_mb'] or 0 for r in results] + [peak_rss_mb() or 0])
+        for table in ('trips', 'deliveries'):
+            if not any(table in r['load_stats'] for r in results):
+                continue
+            rows = sum(r['load_stats'][table]['rows'] for r in results)
+            seconds = max(r['load_stats'][table]['seconds'] for r in results)
+            self.load_stats[table] = {
+                'mode': f"{self.sink.name} x{workers}",
+                'rows': rows,
+                'seconds': seconds,
+                'rows_per_sec': round(rows / seconds, 1) if seconds > 0 else 0.0
+            }
+        logging.info(f" {self.counters['trips']} viajes y {self.counters['deliveries']} entregas insertados "
+                     f"({workers} shards, memoria pico por proceso: {self.peak_rss_mb:.0f} MB)")
+    
+    def _file_sink_spec(self):
+        """Parámetros para que cada shard abra su propio FileSink sobre el mismo directorio"""
+        if not isinstance(self.sink, FileSink):
+            return None
+        return {'root': self.sink.root, 'file_format': self.sink.file_format, 'row_group_rows': self.sink.row_group_rows}
+    
+    def _compact_trips(self, trips, routes, num_deliveries):
+        """Vista compacta de los viajes para generar entregas y mantenimiento (IDs, tiempos, peso, ciudad)"""
+        cities = {r[0]: r[3] for r in routes}
+        return pd.DataFrame({
+            'trip_id': trips['trip_id'].to_numpy(np.int64),
+            'vehicle_id': trips['vehicle_id'].to_numpy(np.int32),
+            'departure_datetime': trips['departure_datetime'].to_numpy('datetime64[us]'),
+            'arrival_datetime': trips['arrival_datetime'].to_numpy('datetime64[us]'),
+            'total_weight_kg': trips['total_weight_kg'].to_numpy(np.float64),
+            'destination_city': pd.Categorical(trips['route_id'].map(cities), categories=sorted(set(cities.values()))),
+            'status': pd.Categorical(trips['status'], categories=['completed', 'in_progress']),
+            'num_deliveries': num_deliveries
+        })
+    
+    def _vehicle_trip_stats(self, trips):
+        """Viajes por vehículo con primera y última salida (entrada de generate_maintenance)"""
+        return trips.groupby('vehicle_id').agg(
+            trip_count=('trip_id', 'size'),
+            first_trip=('departure_datetime', 'min'),
+            last_trip=('departure_datetime', 'max')
+        ).reset_index()
+    
+    def _accumulate_vehicle_trip_stats(self, trips):
+        """Acumular las estadísticas por vehículo bloque a bloque (tamaño acotado por la flota)"""
+        stats = self._vehicle_trip_stats(trips)
+        if self.vehicle_trip_stats is not None:
+            stats = self._merge_vehicle_trip_stats([self.vehicle_trip_stats, stats])
+        self.vehicle_trip_stats = stats
+    
+    def _merge_vehicle_trip_stats(self, stats):
+        """Combinar estadísticas por vehículo calculadas por separado (shards)"""
+        return pd.concat(stats).groupby('vehicle_id').agg(
+            trip_count=('trip_count', 'sum'),
+            first_trip=('first_trip', 'min'),
+            last_trip=('last_trip', 'max')
+        ).reset_index()
     
     def _get_hourly_distribution(self):
         """Distribución de probabilidad por hora del día"""
@@ -348,118 +931,132 @@ class DataGenerator:
         return probs / probs.sum()
        
     def generate_deliveries(self, count=400000):
-        """Generar 400000 entregas (promedio 4 por viaje)"""
+        """Generar 400000 entregas (promedio 4 por viaje) por bloques de chunk_size viajes"""
         logging.info(f"Generando {count} entregas...")
         
-        # Obtener todos los trips con su información
-        self.cursor.execute("""
-            SELECT t.trip_id, t.departure_datetime, t.arrival_datetime, 
-                t.total_weight_kg, r.destination_city
-            FROM trips t
-            JOIN routes r ON t.route_id = r.route_id
-            WHERE t.status = 'completed'
-        """)
-        trips_data = self.cursor.fetchall()
-        
-        deliveries = []
-        delivery_counter = 0
-        # Distribuir entregas entre los viajes
-        for trip_id, departure, arrival, total_weight, city in tqdm(trips_data, desc="Generando deliveries"):
-            # Número de entregas para este viaje (2-6, promedio 4)
-            num_deliveries = np.random.choice([2, 3, 4, 5, 6], p=[0.1, 0.2, 0.4, 0.2, 0.1])
-            
-            # Peso por entrega
-            weights = self._distribute_weight(float(total_weight), num_deliveries)
-            
-            # Tiempo entre entregas
-            if arrival:
-                delivery_duration = (arrival - departure).total_seconds() / 3600
-                time_per_delivery = delivery_duration / num_deliveries
-            else:
-                time_per_delivery = 0.5
-            
-            for i in range(num_deliveries):
-                tracking_number = f"FL{datetime.now().year}{str(delivery_counter+1).zfill(8)}"
-                customer_name = fake.name()
-                delivery_address = f"{fake.street_address()}, {city}"
-                # Se cambio para parsear a float nativo de python.
-                package_weight = float(weights[i])
-                
-                # Horario programado y real - CORREGIDO
-                scheduled = departure + timedelta(hours=time_per_delivery * (i + 0.5))
-
-                # Validar que scheduled sea después de la salida
-                if scheduled < departure:
-                    scheduled = departure + timedelta(minutes=30)  # Mínimo 30 min después
-
-                if arrival:
-                    # 90% entregados a tiempo (0-30 min después), 10% con retraso
-                    if random.random() < 0.9:
-                        # NUNCA antes de programada, siempre entre 0 y 30 minutos después
-                        delivered = scheduled + timedelta(minutes=random.randint(0, 30))
-                    else:
-                        delivered = scheduled + timedelta(minutes=random.randint(60, 180))
-                    
-                    # VALIDACIÓN CRÍTICA: No puede ser después de la llegada
-                    if delivered > arrival:
-                        delivered = arrival - timedelta(minutes=5)  # 5 minutos antes de llegar
-                    
-                    # VALIDACIÓN CRÍTICA: No puede ser antes de la salida
-                    if delivered < departure:
-                        delivered = departure + timedelta(minutes=30)  # 30 min después de salir
-                    
-                    delivery_status = 'delivered'
-                    signature = random.random() < 0.95  # 95% con firma
-                else:
-                    delivered = None
-                    delivery_status = 'pending'
-                    signature = False
-                
-                deliveries.append((
-                    trip_id,
-                    tracking_number,
-                    customer_name,
-                    delivery_address,
-                    package_weight,  # Ya es float nativo
-                    scheduled,
-                    delivered,
-                    delivery_status,
-                    signature
-                ))
-                
-                delivery_counter += 1
-                if delivery_counter > count:
-                    break
-            
-            if delivery_counter > count:
+        if self.trips is not None:
+            # Viajes generados en esta ejecución, directamente desde memoria
+            trips = self.trips
+        else:
+            # Obtener todos los trips con su información
+            self.cursor.execute("""
+                SELECT t.trip_id, t.departure_datetime, t.arrival_datetime, 
+                    t.total_weight_kg, r.destination_city
+                FROM trips t
+                JOIN routes r ON t.route_id = r.route_id
+                WHERE t.status = 'completed'
+            """)
+            trips = pd.DataFrame(
+                self.cursor.fetchall(),
+                columns=['trip_id', 'departure_datetime', 'arrival_datetime', 'total_weight_kg', 'destination_city']
+            )
+        
+        first_id = self._next_id('deliveries', 'delivery_id')
+        produced = 0
+        for chunk, offset in enumerate(range(0, len(trips), self.chunk_size)):
+            if produced >= count:
                 break
+            block = trips.iloc[offset:offset + self.chunk_size]
+            trip_rng, delivery_rng = self._chunk_rngs(0, chunk)
+            if 'num_deliveries' not in block:
+                block = block.assign(num_deliveries=self._draw_delivery_counts(len(block), trip_rng))
+            deliveries = self._build_delivery_frame(block, count - produced, first_id + produced, delivery_rng)
+            self._quality_reference('trips', block)
+            # Insertar en batches
+            self._load_rows('deliveries', DELIVERY_COLUMNS, deliveries, progress_every=50000)
+            produced += len(deliveries)
+        self._sync_sequence('deliveries', 'delivery_id')
         
-        # Insertar en batches
-        query = """
-            INSERT INTO deliveries (trip_id, tracking_number, customer_name,
-                                delivery_address, package_weight_kg, scheduled_datetime,
-                                delivered_datetime, delivery_status, recipient_signature)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-        """
+        self.counters['deliveries'] = produced
+        logging.info(f" {produced} entregas insertadas")
+    
+    def _build_delivery_frame(self, trips, count, first_id, rng):
+        """Expandir viajes a entregas de forma columnar (np.repeat) con nombres y direcciones de un pool.
+        Usa el número de entregas ya sorteado por viaje (columna num_deliveries)"""
+        trips = trips[trips['num_deliveries'] > 0]
+        departure = pd.to_datetime(trips['departure_datetime']).to_numpy('datetime64[us]')
+        arrival = pd.to_datetime(trips['arrival_datetime']).to_numpy('datetime64[us]')
+        total_weight = trips['total_weight_kg'].astype(float).to_numpy()
         
-        batch_size = 1000
-        for i in range(0, len(deliveries), batch_size):
-            batch = deliveries[i:i+batch_size]
-            execute_batch(self.cursor, query, batch, page_size=100)
-            self.connection.commit()
-            
-            if i % 50000 == 0:
-                logging.info(f"  Progreso: {i}/{len(deliveries)} deliveries insertados")
-        
-        self.counters['deliveries'] = len(deliveries)
-        logging.info(f" {len(deliveries)} entregas insertadas")
-    
-    def _distribute_weight(self, total_weight, num_packages):
-        """Distribuir peso total entre paquetes de manera realista"""
-        # Generar pesos aleatorios
-        weights = np.random.exponential(scale=1.0, size=num_packages)
-        # Normalizar para que sumen el total
-        weights = weights / weights.sum() * total_weight * 0.95  # 95% del peso total
+        # Expansión viaje -> entregas
+        num_deliveries = trips['num_deliveries'].to_numpy()
+        trip_idx = np.repeat(np.arange(len(trips)), num_deliveries)
+        # Recortar al total solicitado antes de sortear atributos por entrega
+        trip_idx = trip_idx[:max(count, 0)]
+        offsets = np.concatenate(([0], np.cumsum(num_deliveries)[:-1]))
+        position = np.arange(len(trip_idx)) - offsets[trip_idx]
+        n = len(trip_idx)
+        
+        # Peso por entrega
+        weights = self._distribute_weight(total_weight, trip_idx, offsets, rng)
+        
+        # Tiempo entre entregas (0.5h si el viaje no tiene llegada)
+        has_arrival = ~np.isnat(arrival)
+        trip_hours = (arrival - departure) / np.timedelta64(1, 'h')
+        time_per_delivery = np.where(has_arrival, trip_hours / num_deliveries, 0.5)
+        
+        dep = departure[trip_idx]
+        arr = arrival[trip_idx]
+        arrived = has_arrival[trip_idx]
+        minute = np.timedelta64(1, 'm')
+        
+        # Horario programado; nunca antes de la salida (mínimo 30 min después)
+        scheduled_offset = time_per_delivery[trip_idx] * (position + 0.5) * 3600 * 10**6
+        scheduled = dep + scheduled_offset.astype('int64') * np.timedelta64(1, 'us')
+        scheduled = np.where(scheduled < dep, dep + 30 * minute, scheduled)
+        
+        # 90% entregados a tiempo (0-30 min después), 10% con retraso (60-180 min)
+        on_time = rng.random(n) < 0.9
+        delay = np.where(on_time, rng.integers(0, 31, n), rng.integers(60, 181, n))
+        delivered = scheduled + delay * minute
+        # VALIDACIÓN CRÍTICA: no puede ser después de la llegada ni antes de la salida
+        delivered = np.where(delivered > arr, arr - 5 * minute, delivered)
+        delivered = np.where(delivered < dep, dep + 30 * minute, delivered)
+        delivered = np.where(arrived, delivered, np.datetime64('NaT'))
+        
+        # 95% con firma, solo si la entrega se realizó
+        signature = arrived & (rng.random(n) < 0.95)
+        
+        # Nombres y direcciones sorteados de un pool generado una sola vez con Faker
+        name_pool, address_pool = self._get_faker_pools()
+        cities = trips['destination_city'].to_numpy()[trip_idx]
+        addresses = pd.Series(address_pool[rng.integers(0, len(address_pool), n)]) + ', ' + cities
+        delivery_ids = np.arange(first_id, first_id + n)
+        sequence = pd.Series(delivery_ids).astype(str).str.zfill(8)
+        
+        return pd.DataFrame({
+            'delivery_id': delivery_ids,
+            'trip_id': trips['trip_id'].to_numpy()[trip_idx],
+            'tracking_number': f"FL{datetime.now().year}" + sequence,
+            'customer_name': name_pool[rng.integers(0, len(name_pool), n)],
+            'delivery_address': addresses,
+            'package_weight_kg': weights,
+            'scheduled_datetime': scheduled,
+            'delivered_datetime': delivered,
+            'delivery_status': np.where(arrived, 'delivered', 'pending'),
+            'recipient_signature': signature
+        })
+    
+    def _draw_delivery_counts(self, num_trips, rng):
+        """Número de entregas por viaje (2-6, promedio 4)"""
+        return rng.choice([2, 3, 4, 5, 6], size=num_trips, p=[0.1, 0.2, 0.4, 0.2, 0.1])
+    
+    def _get_faker_pools(self):
+        """Pool de nombres y direcciones generado con Faker una sola vez por generador"""
+        if self._faker_pools is None:
+            logging.info(f"  Generando pool de {self.name_pool_size} nombres y direcciones...")
+            names = np.array([fake.name() for _ in range(self.name_pool_size)], dtype=object)
+            addresses = np.array([fake.street_address() for _ in range(self.name_pool_size)], dtype=object)
+            self._faker_pools = (names, addresses)
+        return self._faker_pools
+    
+    def _distribute_weight(self, total_weights, package_trip, offsets, rng):
+        """Distribuir el peso total de cada viaje entre sus paquetes (normalización por segmentos)"""
+        # Generar pesos aleatorios para todos los paquetes de todos los viajes
+        weights = rng.exponential(scale=1.0, size=len(package_trip))
+        # Normalizar para que cada viaje sume su total (suma por segmento con reduceat)
+        segment_sums = np.add.reduceat(weights, offsets[:package_trip[-1] + 1]) if len(weights) else weights
+        weights = weights / segment_sums[package_trip] * total_weights[package_trip] * 0.95  # 95% del peso total
         # Mínimo 0.5kg por paquete
         weights = np.maximum(weights, 0.5)
         return weights
@@ -468,20 +1065,30 @@ class DataGenerator:
         """Generar 5000 registros de mantenimiento"""
         logging.info(f"Generando {count} registros de mantenimiento...")
         
-        # Obtener información de vehículos y sus viajes
-        self.cursor.execute("""
-            SELECT 
-                v.vehicle_id,
-                v.vehicle_type,
-                COUNT(t.trip_id) as trip_count,
-                MIN(t.departure_datetime) as first_trip,
-                MAX(t.departure_datetime) as last_trip
-            FROM vehicles v
-            LEFT JOIN trips t ON v.vehicle_id = t.vehicle_id
-            GROUP BY v.vehicle_id, v.vehicle_type
-            ORDER BY v.vehicle_id
-        """)
-        vehicle_stats = self.cursor.fetchall()
+        if self.vehicles is not None and self.vehicle_trip_stats is not None:
+            # Estadísticas por vehículo calculadas en memoria al generar los viajes
+            stats = self.vehicles[['vehicle_id', 'vehicle_type']].merge(
+                self.vehicle_trip_stats, on='vehicle_id', how='left'
+            ).sort_values('vehicle_id')
+            stats['trip_count'] = stats['trip_count'].fillna(0).astype(int)
+            vehicle_stats = list(stats.astype(object).where(stats.notna(), None).itertuples(index=False, name=None))
+        else:
+            # Obtener información de vehículos y sus viajes
+            self.cursor.execute("""
+                SELECT 
+                    v.vehicle_id,
+                    v.vehicle_type,
+                    COUNT(t.trip_id) as trip_count,
+                    MIN(t.departure_datetime) as first_trip,
+                    MAX(t.departure_datetime) as last_trip
+                FROM vehicles v
+                LEFT JOIN trips t ON v.vehicle_id = t.vehicle_id
+                GROUP BY v.vehicle_id, v.vehicle_type
+                ORDER BY v.vehicle_id
+            """)
+            vehicle_stats = self.cursor.fetchall()
+        # Los mantenimientos pueden ser de cualquier vehículo de la flota, no solo de los activos
+        self._quality_reference('vehicles', pd.DataFrame({'vehicle_id': [s[0] for s in vehicle_stats]}))
         
         maintenance_types = [
             ('Cambio de aceite', 150000, 30),
@@ -536,99 +1143,58 @@ class DataGenerator:
                         break
         
         # Insertar en batch
-        query = """
-            INSERT INTO maintenance (vehicle_id, maintenance_date, maintenance_type,
-                                   description, cost, next_maintenance_date, performed_by)
-            VALUES (%s, %s, %s, %s, %s, %s, %s)
-        """
-        
-        execute_batch(self.cursor, query, maintenance_records[:count], page_size=100)
-        self.connection.commit()
+        columns = ['vehicle_id', 'maintenance_date', 'maintenance_type',
+                   'description', 'cost', 'next_maintenance_date', 'performed_by']
+        self._load_rows('maintenance', columns, maintenance_records[:count])
         self.counters['maintenance'] = min(len(maintenance_records), count)
         logging.info(f" {self.counters['maintenance']} mantenimientos insertados")
     
     def validate_data_quality(self):
-        """Validar integridad y calidad de datos"""
+        """Validar integridad y calidad de datos con las reglas de A1-02. En modo batch ya se evaluaron sobre
+        cada bloque antes de escribirlo; en modo sample se verifica una muestra (TABLESAMPLE) de lo cargado"""
         logging.info("\n VALIDANDO CALIDAD DE DATOS...")
+        if self.quality is None:
+            logging.info("   Validación desactivada")
+            return None
+        if self.quality.mode == 'sample':
+            if self.connection is None:
+                logging.info("   Sin base de datos: no hay carga que muestrear")
+                return None
+            self.quality.verify_sample(self.connection, self.quality_sample_percent, seed=self.seed)
         
-        validations = {
-            "Integridad referencial - Trips sin vehículo válido": """
-                SELECT COUNT(*) FROM trips t 
-                LEFT JOIN vehicles v ON t.vehicle_id = v.vehicle_id 
-                WHERE v.vehicle_id IS NULL
-            """,
-            "Integridad referencial - Deliveries sin trip válido": """
-                SELECT COUNT(*) FROM deliveries d 
-                LEFT JOIN trips t ON d.trip_id = t.trip_id 
-                WHERE t.trip_id IS NULL
-            """,
-            "Consistencia temporal - Trips con arrival < departure": """
-                SELECT COUNT(*) FROM trips 
-                WHERE arrival_datetime IS NOT NULL 
-                AND arrival_datetime < departure_datetime
-            """,
-            "Consistencia de peso - Trips excediendo capacidad": """
-                SELECT COUNT(*) FROM trips t 
-                JOIN vehicles v ON t.vehicle_id = v.vehicle_id 
-                WHERE t.total_weight_kg > v.capacity_kg
-            """,
-            "Entregas sin tracking number": """
-                SELECT COUNT(*) FROM deliveries 
-                WHERE tracking_number IS NULL OR tracking_number = ''
-            """
-        }
-        
-        all_valid = True
-        for description, query in validations.items():
-            self.cursor.execute(query)
-            count = self.cursor.fetchone()[0]
-            if count > 0:
-                logging.warning(f"    {description}: {count} registros")
-                all_valid = False
-            else:
-                logging.info(f"   {description}: OK")
-        
-        return all_valid
+        load_seconds = sum(stats['seconds'] for stats in self.load_stats.values())
+        report = self.quality.save_report(self.quality_report, load_seconds=load_seconds or None)
+        self.quality.log_report(report)
+        logging.info(f"   Reporte de calidad guardado en {self.quality_report}")
+        return report['passed']
     
     def generate_summary_report(self):
-        """Generar reporte resumen de datos generados"""
+        """Generar reporte resumen de datos generados (contadores de la generación, sin recorrer las tablas)"""
         logging.info("\n RESUMEN DE GENERACIÓN DE DATOS")
         logging.info("="*50)
         
-        # Conteos finales
-        tables = ['vehicles', 'drivers', 'routes', 'trips', 'deliveries', 'maintenance']
-        total_records = 0
-        
-        for table in tables:
-            self.cursor.execute(f"SELECT COUNT(*) FROM {table}")
-            count = self.cursor.fetchone()[0]
+        for table, count in self.counters.items():
             logging.info(f"  {table}: {count:,} registros")
-            total_records += count
-        
+        total_records = sum(self.counters.values())
         logging.info(f"\n  TOTAL: {total_records:,} registros")
         
-        # Estadísticas adicionales
-        self.cursor.execute("""
-            SELECT 
-                AVG(delivery_count) as avg_deliveries_per_trip,
-                MIN(delivery_count) as min_deliveries,
-                MAX(delivery_count) as max_deliveries
-            FROM (
-                SELECT trip_id, COUNT(*) as delivery_count
-                FROM deliveries
-                GROUP BY trip_id
-            ) as delivery_stats
-        """)
+        validations_passed = self.validate_data_quality()
         
-        avg_del, min_del, max_del = self.cursor.fetchone()
-        logging.info(f"\n  Entregas por viaje: AVG={avg_del:.1f}, MIN={min_del}, MAX={max_del}")
+        # Entregas por viaje desde el perfil acumulado por las reglas de calidad
+        if self.quality is not None:
+            per_trip = self.quality.report()['profiles']['deliveries_per_trip']
+            if per_trip['trips']:
+                logging.info(f"\n  Entregas por viaje: AVG={per_trip['avg']:.1f}, MIN={per_trip['min']}, MAX={per_trip['max']}")
         
         # Guardar resumen en JSON
         summary = {
             'generation_date': datetime.now().isoformat(),
             'total_records': total_records,
             'table_counts': self.counters,
-            'validations_passed': self.validate_data_quality()
+            'load_stats': self.load_stats,
+            'peak_rss_mb': self.peak_rss_mb,
+            'validations_passed': validations_passed,
+            'data_quality_report': self.quality_report if self.quality is not None else None
         }
         
         with open('generation_summary.json', 'w') as f:
@@ -637,7 +1203,9 @@ class DataGenerator:
         logging.info("\n Resumen guardado en generation_summary.json")
     
     def close(self):
-        """Cerrar conexión"""
+        """Cerrar destino y conexión"""
+        if self.sink:
+            self.sink.close()
         if self.cursor:
             self.cursor.close()
         if self.connection:
@@ -645,25 +1213,128 @@ class DataGenerator:
         logging.info("\n Conexión cerrada")
 
 
+def _shard_generator(spec):
+    """DataGenerator de un shard; Faker se siembra con una semilla derivada de (semilla, shard)"""
+    generator = DataGenerator(spec['db_config'], load_mode=spec['load_mode'], checkpoint_rows=spec['checkpoint_rows'],
+                              seed=spec['seed'], name_pool_size=spec['name_pool_size'], chunk_size=spec['chunk_size'],
+                              quality=spec['quality'])
+    if spec['file_sink']:
+        generator.sink = FileSink(prefix=f"s{spec['shard']:03d}-", **spec['file_sink'])
+    seed_sequence = np.random.SeedSequence(spec['seed'], spawn_key=(spec['shard'],))
+    fake.seed_instance(int(seed_sequence.generate_state(1)[0]))
+    return generator
+
+
+def _plan_shard(spec):
+    """Fase 1: número de entregas que producirá un shard (mismos sorteos de viajes que la fase 2)"""
+    generator = _shard_generator(spec)
+    reference = (spec['vehicles'], spec['drivers'], spec['routes'])
+    chunks = generator._iter_trip_chunks(
+        spec['count'], reference, spec['start_date'], spec['now'],
+        spec['trip_base'] + spec['first_index'] + 1, spec['shard'], spec['first_index'], spec['total']
+    )
+    return int(sum(num_deliveries.sum(dtype=np.int64) for _, num_deliveries, _ in chunks))
+
+
+def _run_shard(spec):
+    """Fase 2: generar y cargar por bloques los viajes y entregas de un shard con su propio destino"""
+    generator = _shard_generator(spec)
+    if spec['connected'] and not generator.connect():
+        raise RuntimeError(f"Shard {spec['shard']}: no se pudo conectar a PostgreSQL")
+    try:
+        reference = (spec['vehicles'], spec['drivers'], spec['routes'])
+        generator._set_quality_references(*reference)
+        trips, deliveries = generator._stream_trips_and_deliveries(
+            reference, spec['count'], spec['delivery_limit'], spec['start_date'], spec['now'],
+            first_trip_id=spec['trip_base'] + spec['first_index'] + 1,
+            first_delivery_id=spec['delivery_base'] + spec['delivery_offset'] + 1,
+            shard=spec['shard'], first_index=spec['first_index'], total=spec['total']
+        )
+        return {
+            'trips': trips,
+            'deliveries': deliveries,
+            'load_stats': generator.load_stats,
+            'vehicle_trip_stats': generator.vehicle_trip_stats,
+            'quality': generator.quality.report() if generator.quality is not None else None,
+            'peak_rss_mb': peak_rss_mb()
+        }
+    finally:
+        generator.close()
+
+
+def parse_args():
+    """Opciones de línea de comandos"""
+    parser = argparse.ArgumentParser(description="FleetLogix - Generación de datos sintéticos")
+    parser.add_argument('--load-mode', choices=['copy', 'insert'], default='copy',
+                        help="Ruta de carga: COPY FROM STDIN o INSERT con execute_batch")
+    parser.add_argument('--checkpoint-rows', type=int, default=None,
+                        help="Commit intermedio cada N filas en modo COPY")
+    parser.add_argument('--seed', type=int, default=42,
+                        help="Semilla de la generación columnar")
+    parser.add_argument('--name-pool-size', type=int, default=5000,
+                        help="Nombres y direcciones de Faker pre-generados para las entregas")
+    parser.add_argument('--chunk-size', type=int, default=100000,
+                        help="Viajes por bloque en la generación en streaming (acota la memoria pico)")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="Procesos (shards) para generar y cargar viajes y entregas en paralelo")
+    parser.add_argument('--no-db', action='store_true',
+                        help="Generar solo en memoria, sin conectarse a PostgreSQL")
+    # --load-files necesita el PostgresSink: no se combina con un destino de archivos
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument('--output-dir', default=None,
+                        help="Escribir en archivos locales particionados por fecha en lugar de PostgreSQL")
+    parser.add_argument('--file-format', choices=['parquet', 'csv'], default='parquet',
+                        help="Formato de los archivos de --output-dir")
+    target.add_argument('--load-files', default=None,
+                        help="Cargar con COPY en PostgreSQL un directorio generado con --output-dir y salir")
+    parser.add_argument('--quality', choices=['batch', 'sample', 'off'], default='batch',
+                        help="Reglas de calidad: sobre cada bloque antes de escribirlo, sobre una muestra de lo cargado o ninguna")
+    parser.add_argument('--quality-sample-percent', type=float, default=1.0,
+                        help="Porcentaje de páginas leídas con TABLESAMPLE SYSTEM en el modo sample")
+    parser.add_argument('--quality-report', default='data_quality_report.json',
+                        help="Archivo JSON del reporte de calidad")
+    args = parser.parse_args()
+    if args.load_files and args.no_db:
+        parser.error("--load-files requiere conexión a PostgreSQL (no se combina con --no-db)")
+    return args
+
+
 def main():
     """Función principal"""
+    args = parse_args()
     print(" FLEETLOGIX - Generación de Datos Masivos")
     print("="*60)
     print("Objetivo: Generar 505000+ registros manteniendo integridad")
     print("="*60)
     
-    generator = DataGenerator(DB_CONFIG)
+    sink = FileSink(args.output_dir, args.file_format) if args.output_dir else None
+    generator = DataGenerator(DB_CONFIG, load_mode=args.load_mode, checkpoint_rows=args.checkpoint_rows,
+                              seed=args.seed, name_pool_size=args.name_pool_size, sink=sink,
+                              chunk_size=args.chunk_size, quality=args.quality,
+                              quality_sample_percent=args.quality_sample_percent, quality_report=args.quality_report)
     
     try:
-        if not generator.connect():
+        if not (args.no_db or args.output_dir) and not generator.connect():
+            return
+        
+        if args.load_files:
+            # Carga masiva de archivos generados previamente, en orden de foreign keys. Los archivos cubren
+            # la ventana de dos años de la generación; si se aplicó la migración opcional SQL/A2-05_partitioning.sql,
+            # lo que quede fuera va a la partición por defecto
+            generator.ensure_partitions(datetime.now() - timedelta(days=730), datetime.now())
+            for table in TABLE_LOAD_ORDER:
+                generator.sink.copy_files(table, args.load_files)
+                generator._sync_sequence(table, ID_COLUMNS[table])
             return
         
         # Generar datos en orden (respetando foreign keys)
         generator.generate_vehicles(200)
         generator.generate_drivers(400)
         generator.generate_routes(50)
-        generator.generate_trips(100000)
-        generator.generate_deliveries(400000)
+        if args.workers > 1:
+            generator.generate_trips_and_deliveries_sharded(100000, 400000, workers=args.workers)
+        else:
+            generator.generate_trips_and_deliveries(100000, 400000)
         generator.generate_maintenance(5000)
         
         # Validar y generar reporte
@@ -671,7 +1342,8 @@ def main():
         
     except Exception as e:
         logging.error(f" Error durante la generación: {e}")
-        generator.connection.rollback()
+        if generator.connection:
+            generator.connection.rollback()
     finally:
         generator.close()
 
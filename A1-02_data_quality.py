@@ -0,0 +1,429 @@
+"""
+FleetLogix - Motor de Calidad de Datos
+Reglas de integridad y de negocio evaluadas de forma vectorizada sobre los bloques en memoria antes de
+escribirlos (generador A1-01 y bloques del ETL A3-05), o sobre una muestra TABLESAMPLE de lo ya cargado.
+Reemplaza las consultas COUNT(*) sobre tablas completas y la verificación manual de
+SQL/Verificacion_de_datos_generados.sql, y deja un reporte JSON legible por máquina
+"""
+import os
+import json
+import time
+import logging
+import argparse
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import psycopg2
+from dotenv import load_dotenv
+
+
+# Configuración de conexión (verificación por muestra desde la línea de comandos)
+load_dotenv()
+DB_CONFIG = {
+    'host': os.getenv('DB_HOST'),
+    'database': os.getenv('DB_NAME'),
+    'user': os.getenv('DB_USER'),
+    'password': os.getenv('DB_PASSWORD'),
+    'port': os.getenv('DB_PORT')
+}
+
+# Rangos de ocupación de SQL/Verificacion_de_datos_generados.sql (porcentaje de la capacidad del vehículo)
+OCCUPANCY_BANDS = ['Baja (<30%)', 'Normal (30-70%)', 'Óptima (70-95%)', 'Sobre (>95%)']
+OCCUPANCY_MIN, OCCUPANCY_MAX = 30, 95
+
+# Llave de cada tabla: identifica las filas de ejemplo de cada violación y las tablas de referencia
+KEY_COLUMNS = {
+    'vehicles': 'vehicle_id',
+    'drivers': 'driver_id',
+    'routes': 'route_id',
+    'trips': 'trip_id',
+    'deliveries': 'delivery_id',
+    'maintenance': 'maintenance_id'
+}
+
+# Columnas que cada tabla toma de sus referencias: tabla referenciada -> (llave, columnas). Cada lookup agrega
+# además la columna <referencia>_found. Si el bloque ya trae las columnas (bloques del ETL, con joins) no se busca
+LOOKUPS = {
+    'trips': {
+        'vehicles': ('vehicle_id', ['capacity_kg']),
+        'drivers': ('driver_id', []),
+        'routes': ('route_id', [])
+    },
+    'deliveries': {
+        'trips': ('trip_id', ['departure_datetime', 'arrival_datetime'])
+    },
+    'maintenance': {
+        'vehicles': ('vehicle_id', [])
+    }
+}
+
+
+def occupancy(f):
+    """Ocupación del viaje en porcentaje de la capacidad del vehículo"""
+    return f['total_weight_kg'] / f['capacity_kg'] * 100
+
+
+# Reglas por tabla: nombre -> (severidad, descripción, columnas requeridas, función que marca las filas inválidas).
+# 'error' rompe la integridad del modelo; 'warning' es una regla de negocio de la generación.
+# Una regla cuyas columnas no están en el bloque (ni en sus referencias) se omite y queda registrada como omitida
+RULES = {
+    'vehicles': {
+        'vehicle_capacity_positive': ('error', "Vehículos con capacidad no positiva", ['capacity_kg'],
+                                      lambda f: f['capacity_kg'] <= 0)
+    },
+    'routes': {
+        'route_distance_positive': ('error', "Rutas con distancia no positiva", ['distance_km'],
+                                    lambda f: f['distance_km'] <= 0)
+    },
+    'trips': {
+        'trip_vehicle_exists': ('error', "Integridad referencial - Trips sin vehículo válido", ['vehicles_found'],
+                                lambda f: ~f['vehicles_found']),
+        'trip_driver_exists': ('error', "Integridad referencial - Trips sin conductor válido", ['drivers_found'],
+                               lambda f: ~f['drivers_found']),
+        'trip_route_exists': ('error', "Integridad referencial - Trips sin ruta válida", ['routes_found'],
+                              lambda f: ~f['routes_found']),
+        'trip_arrival_after_departure': ('error', "Consistencia temporal - Trips con arrival < departure",
+                                         ['departure_datetime', 'arrival_datetime'],
+                                         lambda f: f['arrival_datetime'] < f['departure_datetime']),
+        'trip_weight_within_capacity': ('error', "Consistencia de peso - Trips excediendo capacidad",
+                                        ['total_weight_kg', 'capacity_kg'],
+                                        lambda f: f['total_weight_kg'] > f['capacity_kg']),
+        'trip_occupancy_range': ('warning', f"Ocupación fuera del rango normal y óptimo ({OCCUPANCY_MIN}-{OCCUPANCY_MAX}%)",
+                                 ['total_weight_kg', 'capacity_kg'],
+                                 lambda f: (occupancy(f) < OCCUPANCY_MIN) | (occupancy(f) > OCCUPANCY_MAX)),
+        'trip_status_consistent': ('warning', "Trips completados sin llegada o en progreso con llegada",
+                                   ['status', 'arrival_datetime'],
+                                   lambda f: (f['status'] == 'completed') != f['arrival_datetime'].notna())
+    },
+    'deliveries': {
+        'delivery_trip_exists': ('error', "Integridad referencial - Deliveries sin trip válido", ['trips_found'],
+                                 lambda f: ~f['trips_found']),
+        'delivery_tracking_number': ('error', "Entregas sin tracking number", ['tracking_number'],
+                                     lambda f: f['tracking_number'].isna() | (f['tracking_number'] == '')),
+        'delivery_tracking_unique': ('error', "Tracking number repetido en el bloque", ['tracking_number'],
+                                     lambda f: f['tracking_number'].duplicated()),
+        'delivery_tracking_unique_table': ('error', "Tracking number repetido en la tabla (solo verificación)",
+                                           ['tracking_count'], lambda f: f['tracking_count'] > 1),
+        'delivery_before_departure': ('error', "Entregas imposibles - delivered_datetime antes de la salida",
+                                      ['delivered_datetime', 'departure_datetime'],
+                                      lambda f: f['delivered_datetime'] < f['departure_datetime']),
+        'delivery_after_arrival': ('warning', "Entregas después de la llegada del viaje",
+                                   ['delivered_datetime', 'arrival_datetime'],
+                                   lambda f: f['delivered_datetime'] > f['arrival_datetime']),
+        'delivery_weight_range': ('warning', "Paquetes con peso fuera de (0, 10000) kg", ['package_weight_kg'],
+                                  lambda f: (f['package_weight_kg'] <= 0) | (f['package_weight_kg'] >= 10000)),
+        'delivery_status_consistent': ('warning', "Entregas 'delivered' sin fecha de entrega o pendientes con fecha",
+                                       ['delivery_status', 'delivered_datetime'],
+                                       lambda f: (f['delivery_status'] == 'delivered') != f['delivered_datetime'].notna())
+    },
+    'maintenance': {
+        'maintenance_vehicle_exists': ('error', "Integridad referencial - Mantenimientos sin vehículo válido",
+                                       ['vehicles_found'], lambda f: ~f['vehicles_found']),
+        'maintenance_next_after_date': ('warning', "Próximo mantenimiento no posterior al actual",
+                                        ['maintenance_date', 'next_maintenance_date'],
+                                        lambda f: f['next_maintenance_date'] <= f['maintenance_date']),
+        'maintenance_cost_positive': ('warning', "Mantenimientos con costo no positivo", ['cost'],
+                                      lambda f: f['cost'] <= 0)
+    }
+}
+
+# Modo sample: las tablas maestras son pequeñas y se leen completas (son la referencia de las demás);
+# viajes, entregas y mantenimientos se leen con TABLESAMPLE SYSTEM (páginas completas, sin recorrer la tabla).
+# Con la semilla fija, las particiones y tablas de pocas páginas pueden no aportar ninguna: si SYSTEM no devuelve
+# filas de una tabla con datos se repite con BERNOULLI (por filas, recorre la tabla pero solo devuelve la muestra)
+REFERENCE_QUERIES = {
+    'vehicles': "SELECT vehicle_id, capacity_kg FROM vehicles",
+    'drivers': "SELECT driver_id FROM drivers",
+    'routes': "SELECT route_id, distance_km FROM routes"
+}
+SAMPLE_QUERIES = {
+    'trips': """
+        SELECT trip_id, vehicle_id, driver_id, route_id, departure_datetime, arrival_datetime,
+               total_weight_kg, status
+        FROM trips TABLESAMPLE {method} (%(percent)s) REPEATABLE (%(seed)s)
+    """,
+    'deliveries': """
+        SELECT delivery_id, trip_id, tracking_number, package_weight_kg, scheduled_datetime,
+               delivered_datetime, delivery_status
+        FROM deliveries TABLESAMPLE {method} (%(percent)s) REPEATABLE (%(seed)s)
+    """,
+    'maintenance': """
+        SELECT maintenance_id, vehicle_id, maintenance_date, next_maintenance_date, cost
+        FROM maintenance TABLESAMPLE {method} (%(percent)s) REPEATABLE (%(seed)s)
+    """
+}
+# Viajes referenciados por las entregas de la muestra (búsqueda por llave, no otra muestra)
+SAMPLE_TRIPS_QUERY = """
+    SELECT trip_id, departure_datetime, arrival_datetime FROM trips WHERE trip_id = ANY(%s)
+"""
+# Apariciones en toda la tabla de los tracking numbers de la muestra: con deliveries particionada la unicidad
+# global ya no la garantiza una restricción (ver SQL/A2-05_partitioning.sql)
+SAMPLE_TRACKING_QUERY = """
+    SELECT tracking_number, COUNT(*) FROM deliveries WHERE tracking_number = ANY(%s) GROUP BY tracking_number
+"""
+# Filas estimadas por el catálogo, sin COUNT(*): la tabla o la suma de sus particiones hoja (desde PostgreSQL 14
+# ANALYZE también guarda en la tabla particionada el total de sus particiones)
+ESTIMATED_ROWS_QUERY = """
+    SELECT NULLIF(SUM(GREATEST(c.reltuples, 0)), 0)::BIGINT FROM pg_class c
+    WHERE (c.oid = %(table)s::regclass AND c.relkind = 'r')
+       OR c.oid IN (SELECT relid FROM pg_partition_tree(%(table)s::regclass) WHERE isleaf)
+"""
+
+
+def violation_mask(values) -> np.ndarray:
+    """Máscara booleana de NumPy de una regla; un resultado nulo (comparación con NULL/NaT) no es violación"""
+    if isinstance(values, pd.Series):
+        return values.fillna(False).to_numpy(dtype=bool)
+    return np.asarray(values, dtype=bool)
+
+
+class DataQualityEngine:
+    """Evalúa RULES bloque a bloque y acumula conteos, ejemplos y perfiles para el reporte"""
+
+    def __init__(self, mode='batch', max_examples=5):
+        if mode not in ('batch', 'sample'):
+            raise ValueError(f"Modo de validación no soportado: {mode}")
+        # 'batch': bloques en memoria antes de escribirlos; 'sample': muestra de lo cargado (verify_sample)
+        self.mode = mode
+        self.max_examples = max_examples
+        # Tablas de referencia indexadas por su llave (solo las columnas que usan los lookups)
+        self.references = {}
+        # Estado acumulado: por tabla (bloques, filas, segundos) y por regla (filas revisadas, violaciones)
+        self.tables = {}
+        self.rules = {}
+        self.profiles = {
+            'occupancy_bands': {band: 0 for band in OCCUPANCY_BANDS},
+            'deliveries_per_trip': {'trips': 0, 'deliveries': 0, 'min': None, 'max': None}
+        }
+        self.sample = None
+
+    def set_reference(self, table, frame):
+        """Registrar (o reemplazar) la tabla de referencia de los lookups, p. ej. los viajes del bloque actual"""
+        key = KEY_COLUMNS[table]
+        columns = sorted({c for lookups in LOOKUPS.values() for ref, (_, cols) in lookups.items()
+                          if ref == table for c in cols if c in frame})
+        self.references[table] = frame[[key] + columns].drop_duplicates(key).set_index(key)
+
+    def validate(self, table, frame):
+        """Evaluar las reglas de una tabla sobre un bloque en memoria. Devuelve el número de filas que violan
+        alguna regla de severidad 'error' (el llamador decide si solo reporta o detiene la carga)"""
+        rules = RULES.get(table)
+        if not rules or len(frame) == 0:
+            return 0
+        start = time.perf_counter()
+        view = self._lookup(table, frame.reset_index(drop=True))
+        key = KEY_COLUMNS[table]
+        invalid = np.zeros(len(view), dtype=bool)
+
+        for name, (severity, description, columns, check) in rules.items():
+            stats = self.rules.setdefault(table, {}).setdefault(name, {
+                'severity': severity, 'description': description,
+                'checked': 0, 'violations': 0, 'skipped_batches': 0, 'examples': []
+            })
+            if any(c not in view for c in columns):
+                stats['skipped_batches'] += 1
+                continue
+            mask = violation_mask(check(view))
+            count = int(mask.sum())
+            stats['checked'] += len(view)
+            stats['violations'] += count
+            if count and len(stats['examples']) < self.max_examples and key in view:
+                missing = self.max_examples - len(stats['examples'])
+                stats['examples'].extend(view.loc[mask, key].head(missing).tolist())
+            if severity == 'error':
+                invalid |= mask
+
+        self._profile(table, view)
+        elapsed = time.perf_counter() - start
+        table_stats = self.tables.setdefault(table, {'batches': 0, 'rows': 0, 'seconds': 0.0})
+        table_stats['batches'] += 1
+        table_stats['rows'] += len(view)
+        table_stats['seconds'] += elapsed
+        return int(invalid.sum())
+
+    def _lookup(self, table, frame):
+        """Agregar al bloque las columnas de sus referencias registradas y la marca <referencia>_found"""
+        for ref, (key, columns) in LOOKUPS.get(table, {}).items():
+            reference = self.references.get(ref)
+            if reference is None or key not in frame:
+                continue
+            keys = frame[key].to_numpy()
+            frame[f"{ref}_found"] = np.isin(keys, reference.index.to_numpy())
+            missing = [c for c in columns if c not in frame and c in reference]
+            if missing:
+                matched = reference[missing].reindex(keys)
+                for column in missing:
+                    frame[column] = matched[column].to_numpy()
+        return frame
+
+    def _profile(self, table, view):
+        """Perfiles del reporte: rangos de ocupación de los viajes y entregas por viaje (bloques con viajes
+        completos, de modo que los conteos por viaje se pueden combinar entre bloques)"""
+        if table == 'trips' and 'total_weight_kg' in view and 'capacity_kg' in view:
+            values = pd.to_numeric(occupancy(view), errors='coerce').to_numpy(dtype=float, na_value=np.nan)
+            values = values[~np.isnan(values)]
+            bands = np.select([values < 30, values <= 70, values <= 95], OCCUPANCY_BANDS[:3], OCCUPANCY_BANDS[3])
+            for band, count in zip(*np.unique(bands, return_counts=True)):
+                self.profiles['occupancy_bands'][band] += int(count)
+        elif table == 'deliveries' and 'trip_id' in view:
+            per_trip = view['trip_id'].value_counts()
+            stats = self.profiles['deliveries_per_trip']
+            stats['trips'] += len(per_trip)
+            stats['deliveries'] += int(per_trip.sum())
+            stats['min'] = min(int(per_trip.min()), stats['min'] or int(per_trip.min()))
+            stats['max'] = max(int(per_trip.max()), stats['max'] or 0)
+
+    def verify_sample(self, connection, percent=1.0, seed=42):
+        """Verificación posterior a la carga sobre una muestra TABLESAMPLE SYSTEM de viajes, entregas y
+        mantenimientos (las tablas maestras se leen completas). El reporte extrapola las violaciones con las
+        filas estimadas del catálogo"""
+        logging.info(f" Verificando calidad sobre una muestra del {percent}% (TABLESAMPLE SYSTEM)...")
+        self.sample = {'percent': percent, 'seed': seed, 'tables': {}}
+        cursor = connection.cursor()
+        try:
+            for table, query in REFERENCE_QUERIES.items():
+                frame = self._fetch(cursor, query)
+                self.validate(table, frame)
+                self.set_reference(table, frame)
+
+            for table, query in SAMPLE_QUERIES.items():
+                cursor.execute(ESTIMATED_ROWS_QUERY, {'table': table})
+                estimated_rows = cursor.fetchone()[0]
+                params = {'percent': percent, 'seed': seed}
+                method = 'SYSTEM'
+                frame = self._fetch(cursor, query.format(method=method), params)
+                if frame.empty and estimated_rows:
+                    method = 'BERNOULLI'
+                    frame = self._fetch(cursor, query.format(method=method), params)
+                if table == 'deliveries' and len(frame):
+                    trip_ids = frame['trip_id'].unique().tolist()
+                    self.set_reference('trips', self._fetch(cursor, SAMPLE_TRIPS_QUERY, (trip_ids,)))
+                    cursor.execute(SAMPLE_TRACKING_QUERY, (frame['tracking_number'].dropna().unique().tolist(),))
+                    counts = dict(cursor.fetchall())
+                    frame['tracking_count'] = frame['tracking_number'].map(counts).fillna(0).astype(int)
+                self.validate(table, frame)
+                self.sample['tables'][table] = {'method': method, 'sampled_rows': len(frame),
+                                                'estimated_rows': estimated_rows}
+        finally:
+            connection.rollback()
+            cursor.close()
+
+    def _fetch(self, cursor, query, params=None):
+        cursor.execute(query, params)
+        columns = [c[0] for c in cursor.description]
+        return pd.DataFrame.from_records(cursor.fetchall(), columns=columns, coerce_float=True)
+
+    def merge(self, report):
+        """Sumar el reporte de otro motor (un shard del generador). Los shards corren en paralelo, así que el
+        tiempo por tabla es el máximo, igual que en load_stats"""
+        for table, stats in report['tables'].items():
+            own = self.tables.setdefault(table, {'batches': 0, 'rows': 0, 'seconds': 0.0})
+            own['batches'] += stats['batches']
+            own['rows'] += stats['rows']
+            own['seconds'] = max(own['seconds'], stats['seconds'])
+        for table, rules in report['rules'].items():
+            for name, stats in rules.items():
+                own = self.rules.setdefault(table, {}).setdefault(name, {
+                    'severity': stats['severity'], 'description': stats['description'],
+                    'checked': 0, 'violations': 0, 'skipped_batches': 0, 'examples': []
+                })
+                for field in ('checked', 'violations', 'skipped_batches'):
+                    own[field] += stats[field]
+                own['examples'] = (own['examples'] + stats['examples'])[:self.max_examples]
+        for band, count in report['profiles']['occupancy_bands'].items():
+            self.profiles['occupancy_bands'][band] += count
+        own, other = self.profiles['deliveries_per_trip'], report['profiles']['deliveries_per_trip']
+        own['trips'] += other['trips']
+        own['deliveries'] += other['deliveries']
+        mins = [v for v in (own['min'], other['min']) if v is not None]
+        own['min'] = min(mins) if mins else None
+        own['max'] = max(own['max'] or 0, other['max'] or 0) or None
+
+    def violations(self, severity='error'):
+        """Violaciones acumuladas de una severidad"""
+        return sum(s['violations'] for rules in self.rules.values() for s in rules.values() if s['severity'] == severity)
+
+    def report(self, load_seconds=None):
+        """Reporte legible por máquina. Con load_seconds incluye la fracción del tiempo de carga que costó validar"""
+        seconds = sum(t['seconds'] for t in self.tables.values())
+        rules = {}
+        for table, table_rules in self.rules.items():
+            estimated = (self.sample or {}).get('tables', {}).get(table, {})
+            rules[table] = {}
+            for name, stats in table_rules.items():
+                entry = dict(stats)
+                entry['violation_rate'] = round(stats['violations'] / stats['checked'], 6) if stats['checked'] else None
+                if estimated.get('estimated_rows') and entry['violation_rate'] is not None:
+                    entry['estimated_violations'] = int(round(entry['violation_rate'] * estimated['estimated_rows']))
+                rules[table][name] = entry
+        per_trip = dict(self.profiles['deliveries_per_trip'])
+        per_trip['avg'] = round(per_trip['deliveries'] / per_trip['trips'], 2) if per_trip['trips'] else None
+        return {
+            'mode': self.mode,
+            'generated_at': datetime.now().isoformat(),
+            'passed': self.violations('error') == 0,
+            'errors': self.violations('error'),
+            'warnings': self.violations('warning'),
+            'seconds': round(seconds, 3),
+            'load_seconds': round(load_seconds, 3) if load_seconds is not None else None,
+            'overhead_pct': round(100 * seconds / load_seconds, 2) if load_seconds else None,
+            'sample': self.sample,
+            'tables': {t: dict(s, seconds=round(s['seconds'], 3)) for t, s in self.tables.items()},
+            'rules': rules,
+            'profiles': {'occupancy_bands': dict(self.profiles['occupancy_bands']), 'deliveries_per_trip': per_trip}
+        }
+
+    def save_report(self, path, load_seconds=None):
+        """Guardar el reporte JSON y devolverlo"""
+        report = self.report(load_seconds)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False, default=str)
+        return report
+
+    def log_report(self, report):
+        """Resumen por regla en el log (mismo formato que la validación SQL anterior)"""
+        for table, rules in report['rules'].items():
+            for name, stats in rules.items():
+                if stats['skipped_batches'] and not stats['checked']:
+                    continue
+                if stats['violations'] > 0:
+                    estimated = f" (~{stats['estimated_violations']:,} en la tabla)" if 'estimated_violations' in stats else ""
+                    log = logging.warning if stats['severity'] == 'error' else logging.info
+                    log(f"    {stats['description']}: {stats['violations']} registros{estimated}")
+                else:
+                    logging.info(f"   {stats['description']}: OK")
+        overhead = f" ({report['overhead_pct']}% del tiempo de carga)" if report['overhead_pct'] is not None else ""
+        logging.info(f"   Validación: {report['errors']} errores, {report['warnings']} advertencias "
+                     f"en {report['seconds']}s{overhead}")
+
+
+def parse_args():
+    """Opciones de línea de comandos"""
+    parser = argparse.ArgumentParser(description="FleetLogix - Verificación de calidad sobre una muestra de lo cargado")
+    parser.add_argument('--sample-percent', type=float, default=1.0,
+                        help="Porcentaje de páginas leídas con TABLESAMPLE SYSTEM en trips, deliveries y maintenance")
+    parser.add_argument('--seed', type=int, default=42,
+                        help="Semilla de la muestra (REPEATABLE)")
+    parser.add_argument('--output', default='data_quality_report.json',
+                        help="Archivo JSON del reporte")
+    return parser.parse_args()
+
+
+def main():
+    """Verificación por muestra de la base de datos cargada"""
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    args = parse_args()
+    engine = DataQualityEngine(mode='sample')
+    connection = psycopg2.connect(**DB_CONFIG)
+    try:
+        engine.verify_sample(connection, args.sample_percent, args.seed)
+    finally:
+        connection.close()
+    report = engine.save_report(args.output)
+    engine.log_report(report)
+    logging.info(f" Reporte guardado en {args.output}")
+
+
+if __name__ == "__main__":
+    main()
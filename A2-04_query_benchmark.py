@@ -0,0 +1,318 @@
+"""
+FleetLogix - Benchmark de las 12 Queries Analíticas
+Ejecuta las queries de SQL/A2-01_queries.sql N veces con caché fría y caliente sobre el PostgreSQL
+poblado por DataGenerator (A1-01), guarda tiempos y planes EXPLAIN (ANALYZE, BUFFERS) en JSON y
+señala regresiones contra una línea base, con y sin los índices de SQL/A2-03_optimization_indexes.sql
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import logging
+import argparse
+import subprocess
+from datetime import datetime
+from typing import Dict, List, Tuple
+
+import numpy as np
+import psycopg2
+from dotenv import load_dotenv
+
+
+# Configuración de logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    handlers=[
+        logging.FileHandler('query_benchmark.log'),
+        logging.StreamHandler()
+    ]
+)
+
+# Configuración de conexión
+load_dotenv()
+DB_CONFIG = {
+    'host': os.getenv('DB_HOST'),
+    'database': os.getenv('DB_NAME'),
+    'user': os.getenv('DB_USER'),
+    'password': os.getenv('DB_PASSWORD'),
+    'port': os.getenv('DB_PORT')
+}
+
+SQL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'SQL')
+QUERIES_SQL = os.path.join(SQL_DIR, 'A2-01_queries.sql')
+INDEXES_SQL = os.path.join(SQL_DIR, 'A2-03_optimization_indexes.sql')
+
+# Una query empeora si su mediana caliente supera la línea base en más de este porcentaje y del piso de ruido
+REGRESSION_THRESHOLD = 0.20
+NOISE_FLOOR_MS = 1.0
+# Mejora objetivo de los índices de A2-03
+INDEX_TARGET_GAIN = 0.20
+
+
+def load_queries(path: str = QUERIES_SQL) -> List[Dict]:
+    """ Lee las queries del archivo SQL: cada una inicia con '-- name:' y '-- title:' y termina en ';' """
+    with open(path, 'r', encoding='utf-8') as f:
+        content = f.read()
+    queries = []
+    for block in re.split(r"^-- name:", content, flags=re.M)[1:]:
+        name, rest = block.split('\n', 1)
+        title = re.search(r"^-- title:\s*(.+)$", rest, flags=re.M).group(1).strip()
+        body = '\n'.join(line for line in rest.splitlines() if not line.startswith('--'))
+        queries.append({'name': name.strip(), 'title': title, 'sql': body.strip().split(';')[0]})
+    return queries
+
+
+def load_index_statements(path: str = INDEXES_SQL) -> List[Tuple[str, str, str]]:
+    """ (índice, tabla, DDL) de cada CREATE INDEX del archivo de optimización """
+    with open(path, 'r', encoding='utf-8') as f:
+        content = f.read()
+    statements = []
+    for ddl in re.findall(r"^CREATE INDEX .*?;", content, flags=re.M | re.S):
+        name, table = re.match(r"CREATE INDEX (\w+) ON (\w+)", ddl).groups()
+        statements.append((name, table, ddl.replace('CREATE INDEX', 'CREATE INDEX IF NOT EXISTS', 1)))
+    return statements
+
+
+def summarize(timings: List[float]) -> Dict:
+    """ Estadísticos de una serie de tiempos en milisegundos """
+    values = np.array(timings)
+    return {
+        'runs': len(values),
+        'min_ms': round(float(values.min()), 3),
+        'median_ms': round(float(np.median(values)), 3),
+        'p95_ms': round(float(np.percentile(values, 95)), 3),
+        'mean_ms': round(float(values.mean()), 3)
+    }
+
+
+class QueryBenchmark:
+    def __init__(self, runs: int = 10, cold_runs: int = 3, cold_command: str = None):
+        self.runs = runs
+        self.cold_runs = cold_runs
+        # Comando opcional para vaciar cachés antes de cada corrida fría (p. ej. reiniciar PostgreSQL y
+        # liberar la caché del sistema operativo); sin él, la corrida fría usa una conexión nueva
+        self.cold_command = cold_command
+        self.queries = load_queries()
+        self.indexes = load_index_statements()
+        self.conn = None
+        self.can_evict = False
+
+    def connect(self):
+        """ Conexión principal en autocommit (DDL de índices y corridas calientes) """
+        self.conn = psycopg2.connect(**DB_CONFIG)
+        self.conn.autocommit = True
+        cursor = self.conn.cursor()
+        # pg_buffercache_evict (PostgreSQL 17+) permite vaciar shared_buffers sin reiniciar el servidor
+        cursor.execute("SELECT EXISTS (SELECT 1 FROM pg_proc WHERE proname = 'pg_buffercache_evict')")
+        self.can_evict = cursor.fetchone()[0]
+        cursor.execute("SHOW server_version")
+        self.server_version = cursor.fetchone()[0]
+        cursor.close()
+        logging.info(f" Conectado a PostgreSQL {self.server_version}")
+
+    def existing_indexes(self) -> List[str]:
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT indexname FROM pg_indexes WHERE schemaname = 'public' AND indexname = ANY(%s)",
+                       ([name for name, _, _ in self.indexes],))
+        names = [r[0] for r in cursor.fetchall()]
+        cursor.close()
+        return names
+
+    def set_indexes(self, enabled: bool, only: List[str] = None):
+        """ Crea o elimina los índices de A2-03 (o solo los indicados) y actualiza estadísticas """
+        selected = [(name, table, ddl) for name, table, ddl in self.indexes if only is None or name in only]
+        if not selected:
+            return
+        cursor = self.conn.cursor()
+        tables = set()
+        for name, table, ddl in selected:
+            cursor.execute(ddl if enabled else f"DROP INDEX IF EXISTS {name}")
+            tables.add(table)
+        for table in sorted(tables):
+            cursor.execute(f"ANALYZE {table}")
+        cursor.close()
+        logging.info(f" Índices A2-03 {'creados' if enabled else 'eliminados'}")
+
+    def clear_cache(self) -> str:
+        """ Vacía las cachés disponibles antes de una corrida fría y devuelve el método usado """
+        if self.cold_command:
+            subprocess.run(self.cold_command, shell=True, check=True)
+            return 'command'
+        if self.can_evict:
+            cursor = self.conn.cursor()
+            cursor.execute("SELECT COUNT(*) FROM pg_buffercache WHERE relfilenode IS NOT NULL AND pg_buffercache_evict(bufferid)")
+            cursor.close()
+            return 'evict'
+        return 'new_connection'
+
+    def time_query(self, conn, sql: str) -> float:
+        """ Tiempo de ejecución y lectura completa del resultado en milisegundos """
+        cursor = conn.cursor()
+        start = time.perf_counter()
+        cursor.execute(sql)
+        cursor.fetchall()
+        elapsed = (time.perf_counter() - start) * 1000
+        cursor.close()
+        return elapsed
+
+    def explain(self, sql: str) -> Dict:
+        """ Plan EXPLAIN (ANALYZE, BUFFERS) en JSON con un resumen de tiempos y bloques leídos """
+        cursor = self.conn.cursor()
+        cursor.execute(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {sql}")
+        plan = cursor.fetchone()[0][0]
+        cursor.close()
+        root = plan['Plan']
+        return {
+            'execution_ms': plan['Execution Time'],
+            'planning_ms': plan['Planning Time'],
+            'shared_hit_blocks': root.get('Shared Hit Blocks', 0),
+            'shared_read_blocks': root.get('Shared Read Blocks', 0),
+            'plan': plan
+        }
+
+    def benchmark_query(self, query: Dict) -> Dict:
+        """ Corridas frías (cada una con cachés vaciadas y conexión nueva) y calientes (tras una de
+        calentamiento en la conexión principal), más el plan con ANALYZE y BUFFERS """
+        cold = []
+        method = None
+        for _ in range(self.cold_runs):
+            method = self.clear_cache()
+            conn = psycopg2.connect(**DB_CONFIG)
+            try:
+                cold.append(self.time_query(conn, query['sql']))
+            finally:
+                conn.close()
+
+        self.time_query(self.conn, query['sql'])
+        warm = [self.time_query(self.conn, query['sql']) for _ in range(self.runs)]
+        result = {
+            'title': query['title'],
+            'cold': {**summarize(cold), 'method': method} if cold else None,
+            'warm': summarize(warm),
+            'explain': self.explain(query['sql'])
+        }
+        logging.info(f" {query['name']}: caliente {result['warm']['median_ms']} ms"
+                     + (f", fría {result['cold']['median_ms']} ms" if cold else ""))
+        return result
+
+    def run_scenario(self, indexes: bool) -> Dict:
+        """ Ejecuta las 12 queries con o sin los índices de A2-03 """
+        self.set_indexes(indexes)
+        logging.info(f" Escenario {'con' if indexes else 'sin'} índices A2-03 ({self.runs} corridas calientes, {self.cold_runs} frías)")
+        return {query['name']: self.benchmark_query(query) for query in self.queries}
+
+    def run(self, scenarios: List[str]) -> Dict:
+        """ Ejecuta los escenarios pedidos y deja los índices como estaban al empezar """
+        self.connect()
+        initial = self.existing_indexes()
+        report = {
+            'run_date': datetime.now().isoformat(),
+            'server_version': self.server_version,
+            'database': DB_CONFIG['database'],
+            'runs': self.runs,
+            'cold_runs': self.cold_runs,
+            'scenarios': {}
+        }
+        try:
+            for scenario in scenarios:
+                report['scenarios'][scenario] = self.run_scenario(scenario == 'with_indexes')
+        finally:
+            # Restaurar el estado original de los índices
+            self.set_indexes(False, only=[name for name, _, _ in self.indexes if name not in initial])
+            self.set_indexes(True, only=initial)
+            self.conn.close()
+        if 'with_indexes' in report['scenarios'] and 'without_indexes' in report['scenarios']:
+            report['index_gain'] = index_gains(report)
+        return report
+
+
+def index_gains(report: Dict) -> Dict:
+    """ Mejora de la mediana caliente de cada query al crear los índices, frente al objetivo de A2-03 """
+    without, with_ = report['scenarios']['without_indexes'], report['scenarios']['with_indexes']
+    gains = {}
+    for name in with_:
+        before, after = without[name]['warm']['median_ms'], with_[name]['warm']['median_ms']
+        gains[name] = round((before - after) / before, 4) if before > 0 else 0.0
+    total_before = sum(q['warm']['median_ms'] for q in without.values())
+    total_after = sum(q['warm']['median_ms'] for q in with_.values())
+    gains['total'] = round((total_before - total_after) / total_before, 4) if total_before > 0 else 0.0
+    gains['target_met'] = gains['total'] >= INDEX_TARGET_GAIN
+    return gains
+
+
+def find_regressions(report: Dict, baseline: Dict, threshold: float = REGRESSION_THRESHOLD) -> List[Dict]:
+    """ Queries cuya mediana caliente supera la de la línea base en más de threshold (y del piso de ruido) """
+    regressions = []
+    for scenario, queries in report['scenarios'].items():
+        for name, result in queries.items():
+            base = baseline.get('scenarios', {}).get(scenario, {}).get(name)
+            if base is None:
+                continue
+            before, after = base['warm']['median_ms'], result['warm']['median_ms']
+            if after > before * (1 + threshold) and after - before > NOISE_FLOOR_MS:
+                regressions.append({
+                    'scenario': scenario,
+                    'query': name,
+                    'baseline_ms': before,
+                    'current_ms': after,
+                    'change': round(after / before - 1, 4)
+                })
+    return regressions
+
+
+def parse_args():
+    """ Opciones de línea de comandos del benchmark """
+    parser = argparse.ArgumentParser(description="FleetLogix - Benchmark de las 12 queries analíticas")
+    parser.add_argument('--runs', type=int, default=10, help="Corridas calientes por query")
+    parser.add_argument('--cold-runs', type=int, default=3, help="Corridas frías por query (0 para omitirlas)")
+    parser.add_argument('--cold-command', default=None,
+                        help="Comando de shell que vacía cachés antes de cada corrida fría")
+    parser.add_argument('--scenarios', nargs='+', choices=['without_indexes', 'with_indexes'],
+                        default=['without_indexes', 'with_indexes'], help="Escenarios de índices a medir")
+    parser.add_argument('--output', default='query_benchmark.json', help="Archivo JSON con tiempos y planes")
+    parser.add_argument('--baseline', default='query_baseline.json', help="Línea base para detectar regresiones")
+    parser.add_argument('--save-baseline', action='store_true', help="Guardar esta corrida como nueva línea base")
+    parser.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD,
+                        help="Empeoramiento relativo que se considera regresión")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    benchmark = QueryBenchmark(runs=args.runs, cold_runs=args.cold_runs, cold_command=args.cold_command)
+    report = benchmark.run(args.scenarios)
+
+    if 'index_gain' in report:
+        gain = report['index_gain']
+        logging.info(f" Mejora total con índices A2-03: {gain['total']:.1%} "
+                     f"(objetivo {INDEX_TARGET_GAIN:.0%}: {'cumplido' if gain['target_met'] else 'no cumplido'})")
+
+    regressions = []
+    if os.path.exists(args.baseline):
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = find_regressions(report, baseline, args.threshold)
+        report['baseline'] = {'file': args.baseline, 'run_date': baseline.get('run_date'), 'regressions': regressions}
+        for r in regressions:
+            logging.warning(f" Regresión en {r['query']} ({r['scenario']}): {r['baseline_ms']} ms -> "
+                            f"{r['current_ms']} ms (+{r['change']:.1%})")
+        if not regressions:
+            logging.info(f" Sin regresiones frente a {args.baseline}")
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, default=str)
+    logging.info(f" Resultados guardados en {args.output}")
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, default=str)
+        logging.info(f" Línea base guardada en {args.baseline}")
+
+    # Código de salida distinto de cero para que CI detecte las regresiones
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,334 @@
+"""
+FleetLogix - Benchmark de Particionamiento Mensual
+Compara trips/deliveries como tablas heap frente a su versión particionada por mes (SQL/A2-05_partitioning.sql):
+las 12 queries de SQL/A2-01_queries.sql con el arnés de A2-04 y la retención de histórico (DELETE + VACUUM
+frente a DETACH + DROP de particiones). Trabaja sobre copias de los datos en esquemas aparte, así que no
+modifica las tablas de public. Verifica además que la extracción incremental del ETL (A3-05), con sus cotas de
+poda, recoja una entrega antigua modificada hoy (cambio revertido en una transacción)
+"""
+
+import os
+import json
+import time
+import logging
+import argparse
+import importlib.util
+import tempfile
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+import psycopg2
+
+
+# Configuración de logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    handlers=[
+        logging.FileHandler('partition_benchmark.log'),
+        logging.StreamHandler()
+    ]
+)
+
+QUERY_BENCHMARK_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'A2-04_query_benchmark.py')
+ETL_MODULE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'A3-05_etl_pipeline_estudiantes.py')
+# Antigüedad mínima (días antes de la marca de agua) de la entrega modificada en la verificación del ETL
+LATE_UPDATE_DAYS = 30
+
+# Esquemas con las copias de cada variante; el resto de tablas se resuelve en public por search_path
+SCHEMAS = {'heap': 'bench_heap', 'partitioned': 'bench_partitioned'}
+# Tablas comparadas: columna de partición y llave del registro
+PARTITIONED_TABLES = {
+    'trips': ('departure_datetime', 'trip_id'),
+    'deliveries': ('scheduled_datetime', 'delivery_id')
+}
+
+
+def load_query_benchmark():
+    """ Importa el arnés de A2-04 desde su archivo (el nombre con guiones no es importable directamente) """
+    spec = importlib.util.spec_from_file_location('fleetlogix_query_benchmark', QUERY_BENCHMARK_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def load_etl_module():
+    """ Importa el pipeline ETL desde su archivo (el nombre con guiones no es importable directamente) """
+    spec = importlib.util.spec_from_file_location('fleetlogix_etl', ETL_MODULE_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def scanned_relations(plan: Dict) -> List[str]:
+    """ Tablas y particiones leídas por un plan EXPLAIN (FORMAT JSON), incluidas las de subplanes """
+    relations = []
+    if 'Relation Name' in plan:
+        relations.append(plan['Relation Name'])
+    for child in plan.get('Plans', []):
+        relations.extend(scanned_relations(child))
+    return relations
+
+
+class PartitionBenchmark:
+    def __init__(self, runs: int = 10, cold_runs: int = 0, retention_months: int = 3, keep_copies: bool = False):
+        self.runs = runs
+        self.cold_runs = cold_runs
+        # Meses más antiguos que se eliminan en la prueba de retención
+        self.retention_months = retention_months
+        self.keep_copies = keep_copies
+        self.query_benchmark = load_query_benchmark()
+        self.db_config = self.query_benchmark.DB_CONFIG
+        self.conn = None
+
+    def connect(self):
+        self.conn = psycopg2.connect(**self.db_config)
+        self.conn.autocommit = True
+        cursor = self.conn.cursor()
+        cursor.execute("SHOW server_version")
+        self.server_version = cursor.fetchone()[0]
+        cursor.close()
+        logging.info(f" Conectado a PostgreSQL {self.server_version}")
+
+    def build_copies(self) -> Dict:
+        """ Copia trips y deliveries de public a un esquema heap y a uno particionado por mes, con la misma
+        llave primaria e índice sobre la columna de fecha en ambos """
+        cursor = self.conn.cursor()
+        rows = {}
+        for variant, schema in SCHEMAS.items():
+            start = time.perf_counter()
+            cursor.execute(f"DROP SCHEMA IF EXISTS {schema} CASCADE")
+            cursor.execute(f"CREATE SCHEMA {schema}")
+            for table, (column, key) in PARTITIONED_TABLES.items():
+                if variant == 'heap':
+                    cursor.execute(f"CREATE TABLE {schema}.{table} (LIKE public.{table} INCLUDING DEFAULTS)")
+                else:
+                    cursor.execute(f"""
+                        CREATE TABLE {schema}.{table} (LIKE public.{table} INCLUDING DEFAULTS)
+                        PARTITION BY RANGE ({column})
+                    """)
+                    self._create_monthly_partitions(cursor, schema, table, column)
+                cursor.execute(f"INSERT INTO {schema}.{table} SELECT * FROM public.{table}")
+                rows[table] = cursor.rowcount
+                primary_key = key if variant == 'heap' else f"{key}, {column}"
+                cursor.execute(f"ALTER TABLE {schema}.{table} ADD PRIMARY KEY ({primary_key})")
+                cursor.execute(f"CREATE INDEX ON {schema}.{table} ({column})")
+                cursor.execute(f"ANALYZE {schema}.{table}")
+            logging.info(f" Copia {variant} ({schema}) lista en {time.perf_counter() - start:.1f}s: {rows}")
+        cursor.close()
+        return rows
+
+    def _create_monthly_partitions(self, cursor, schema: str, table: str, column: str):
+        """ Una partición por mes del rango de datos de public, más la partición por defecto """
+        cursor.execute(f"""
+            SELECT month::date, (month + INTERVAL '1 month')::date
+            FROM generate_series(
+                (SELECT date_trunc('month', MIN({column})) FROM public.{table}),
+                (SELECT date_trunc('month', MAX({column})) FROM public.{table}),
+                INTERVAL '1 month'
+            ) AS month
+        """)
+        for month_start, month_end in cursor.fetchall():
+            cursor.execute(f"CREATE TABLE {schema}.{table}_{month_start:%Y_%m} PARTITION OF {schema}.{table} "
+                           f"FOR VALUES FROM ('{month_start}') TO ('{month_end}')")
+        cursor.execute(f"CREATE TABLE {schema}.{table}_default PARTITION OF {schema}.{table} DEFAULT")
+
+    def run_queries(self, variant: str) -> Dict:
+        """ Las 12 queries con el arnés de A2-04 resolviendo trips/deliveries en el esquema de la variante.
+        El search_path se fija con PGOPTIONS para que también lo usen las conexiones de las corridas frías """
+        schema = SCHEMAS[variant]
+        os.environ['PGOPTIONS'] = f"-c search_path={schema},public"
+        benchmark = self.query_benchmark.QueryBenchmark(runs=self.runs, cold_runs=self.cold_runs)
+        benchmark.connect()
+        logging.info(f" Queries sobre {variant} ({self.runs} corridas calientes, {self.cold_runs} frías)")
+        try:
+            results = {}
+            for query in benchmark.queries:
+                result = benchmark.benchmark_query(query)
+                # Particiones (o tablas) de trips/deliveries que el plan llegó a leer
+                relations = [r for r in scanned_relations(result['explain']['plan']['Plan'])
+                             if r.split('_')[0] in PARTITIONED_TABLES]
+                result['relations_scanned'] = len(relations)
+                results[query['name']] = result
+            return results
+        finally:
+            benchmark.conn.close()
+            os.environ.pop('PGOPTIONS', None)
+
+    def run_retention(self) -> Dict:
+        """ Elimina los retention_months meses más antiguos en ambas copias: DELETE por rango (más el VACUUM
+        que recupera el espacio) en heap, DETACH + DROP de las particiones en la particionada """
+        cursor = self.conn.cursor()
+        column, _ = PARTITIONED_TABLES['deliveries']
+        cursor.execute(f"""
+            SELECT (date_trunc('month', MIN({column})) + INTERVAL '{self.retention_months} months')::date
+            FROM public.deliveries
+        """)
+        cutoff = cursor.fetchone()[0]
+        logging.info(f" Retención: eliminar datos anteriores a {cutoff}")
+        result = {'cutoff': str(cutoff), 'months': self.retention_months}
+
+        # Heap: DELETE por rango de fecha y VACUUM para que el espacio sea reutilizable
+        schema = SCHEMAS['heap']
+        heap = {'rows_deleted': 0}
+        start = time.perf_counter()
+        for table, (column, _) in PARTITIONED_TABLES.items():
+            cursor.execute(f"DELETE FROM {schema}.{table} WHERE {column} < %s", (cutoff,))
+            heap['rows_deleted'] += cursor.rowcount
+        heap['delete_seconds'] = round(time.perf_counter() - start, 3)
+        start = time.perf_counter()
+        for table in PARTITIONED_TABLES:
+            cursor.execute(f"VACUUM {schema}.{table}")
+        heap['vacuum_seconds'] = round(time.perf_counter() - start, 3)
+        heap['total_seconds'] = round(heap['delete_seconds'] + heap['vacuum_seconds'], 3)
+        result['heap'] = heap
+
+        # Particionada: las particiones completamente anteriores al corte se desprenden y eliminan
+        schema = SCHEMAS['partitioned']
+        partitioned = {'rows_deleted': 0, 'partitions_dropped': 0}
+        start = time.perf_counter()
+        for table in PARTITIONED_TABLES:
+            cursor.execute("""
+                SELECT c.relname, c.reltuples::BIGINT FROM pg_inherits i
+                JOIN pg_class c ON c.oid = i.inhrelid
+                WHERE i.inhparent = %s::regclass AND c.relname <> %s AND c.relname < %s
+                ORDER BY c.relname
+            """, (f"{schema}.{table}", f"{table}_default", f"{table}_{cutoff:%Y_%m}"))
+            for partition, tuples in cursor.fetchall():
+                cursor.execute(f"ALTER TABLE {schema}.{table} DETACH PARTITION {schema}.{partition}")
+                cursor.execute(f"DROP TABLE {schema}.{partition}")
+                partitioned['rows_deleted'] += max(tuples, 0)
+                partitioned['partitions_dropped'] += 1
+        partitioned['total_seconds'] = round(time.perf_counter() - start, 3)
+        result['partitioned'] = partitioned
+        result['speedup'] = round(heap['total_seconds'] / partitioned['total_seconds'], 1) if partitioned['total_seconds'] > 0 else None
+        logging.info(f" Retención heap: {heap['rows_deleted']:,} filas en {heap['total_seconds']}s "
+                     f"(DELETE {heap['delete_seconds']}s + VACUUM {heap['vacuum_seconds']}s)")
+        logging.info(f" Retención particionada: {partitioned['partitions_dropped']} particiones "
+                     f"(~{partitioned['rows_deleted']:,} filas) en {partitioned['total_seconds']}s")
+        cursor.close()
+        return result
+
+    def check_late_update(self) -> Dict:
+        """ Marca como entregada ahora una entrega programada más de LATE_UPDATE_DAYS días antes de la marca de
+        agua y comprueba que la extracción incremental del ETL, con las cotas de poda de _extract_params, la
+        incluya. Todo ocurre en una transacción de public que se revierte al terminar """
+        etl_module = load_etl_module()
+        conn = psycopg2.connect(**self.db_config)
+        cursor = conn.cursor()
+        try:
+            cursor.execute("SELECT MAX(delivery_id), MAX(delivered_datetime) FROM public.deliveries")
+            last_delivery_id, since = cursor.fetchone()
+            if since is None:
+                logging.info(" Verificación de cambios tardíos omitida: deliveries no tiene entregas")
+                return {'skipped': True}
+            cursor.execute("""
+                SELECT delivery_id, scheduled_datetime FROM public.deliveries
+                WHERE scheduled_datetime < %s ORDER BY scheduled_datetime LIMIT 1
+            """, (since - timedelta(days=LATE_UPDATE_DAYS),))
+            row = cursor.fetchone()
+            if row is None:
+                logging.info(f" Verificación de cambios tardíos omitida: sin entregas de más de {LATE_UPDATE_DAYS} días")
+                return {'skipped': True}
+            delivery_id, scheduled = row
+            cursor.execute("UPDATE public.deliveries SET delivered_datetime = %s WHERE delivery_id = %s",
+                           (since + timedelta(minutes=1), delivery_id))
+
+            # ETL con la marca de agua actual (sin archivo de estado ni warehouse) sobre esta misma transacción
+            etl = etl_module.FleetLogixETL(warehouse='duckdb', state_file=os.path.join(tempfile.gettempdir(), 'late_update_check.json'))
+            etl.pg_conn = conn
+            etl.state['watermark'] = {'last_delivery_id': last_delivery_id, 'last_delivered_datetime': since.isoformat()}
+            params = etl._extract_params(since)
+            cursor.execute(f"""
+                SELECT COUNT(*) FILTER (WHERE e.delivery_id = %(check_delivery_id)s)
+                FROM ({etl_module.EXTRACT_QUERY.format(where=etl_module.INCREMENTAL_FILTER)}) e
+            """, dict(params, check_delivery_id=delivery_id))
+            extracted = cursor.fetchone()[0] == 1
+        finally:
+            conn.rollback()
+            cursor.close()
+            conn.close()
+
+        result = {'delivery_id': delivery_id, 'scheduled_datetime': scheduled, 'watermark': since,
+                  'scheduled_since': params['scheduled_since'], 'extracted': extracted}
+        if extracted:
+            logging.info(f" Cambio tardío extraído: entrega {delivery_id} programada {scheduled:%Y-%m-%d}, marca de agua {since:%Y-%m-%d}")
+        else:
+            logging.error(f" Cambio tardío NO extraído: entrega {delivery_id} programada {scheduled:%Y-%m-%d} "
+                          f"quedó fuera de la cota {params['scheduled_since']}")
+        return result
+
+    def drop_copies(self):
+        cursor = self.conn.cursor()
+        for schema in SCHEMAS.values():
+            cursor.execute(f"DROP SCHEMA IF EXISTS {schema} CASCADE")
+        cursor.close()
+
+    def run(self, retention: bool = True) -> Dict:
+        self.connect()
+        report = {
+            'run_date': datetime.now().isoformat(),
+            'server_version': self.server_version,
+            'database': self.db_config['database'],
+            'runs': self.runs,
+            'cold_runs': self.cold_runs
+        }
+        try:
+            report['late_update'] = self.check_late_update()
+            report['rows'] = self.build_copies()
+            report['queries'] = {variant: self.run_queries(variant) for variant in SCHEMAS}
+            report['speedup'] = query_speedups(report['queries'])
+            if retention:
+                report['retention'] = self.run_retention()
+        finally:
+            if not self.keep_copies:
+                self.drop_copies()
+            self.conn.close()
+        return report
+
+
+def query_speedups(queries: Dict) -> Dict:
+    """ Mediana caliente heap / particionada por query (>1: la particionada es más rápida) """
+    heap, partitioned = queries['heap'], queries['partitioned']
+    speedups = {}
+    for name in heap:
+        before, after = heap[name]['warm']['median_ms'], partitioned[name]['warm']['median_ms']
+        speedups[name] = round(before / after, 2) if after > 0 else None
+        logging.info(f" {name}: heap {before} ms ({heap[name]['relations_scanned']} tablas) -> particionada "
+                     f"{after} ms ({partitioned[name]['relations_scanned']} particiones): x{speedups[name]}")
+    total_before = sum(q['warm']['median_ms'] for q in heap.values())
+    total_after = sum(q['warm']['median_ms'] for q in partitioned.values())
+    speedups['total'] = round(total_before / total_after, 2) if total_after > 0 else None
+    return speedups
+
+
+def parse_args():
+    """ Opciones de línea de comandos del benchmark de particionamiento """
+    parser = argparse.ArgumentParser(description="FleetLogix - Benchmark de trips/deliveries particionadas por mes")
+    parser.add_argument('--runs', type=int, default=10, help="Corridas calientes por query")
+    parser.add_argument('--cold-runs', type=int, default=0, help="Corridas frías por query (conexión nueva)")
+    parser.add_argument('--retention-months', type=int, default=3,
+                        help="Meses más antiguos a eliminar en la prueba de retención")
+    parser.add_argument('--skip-retention', action='store_true', help="Omitir la prueba de retención")
+    parser.add_argument('--keep-copies', action='store_true',
+                        help="Conservar los esquemas con las copias al terminar")
+    parser.add_argument('--output', default='partition_benchmark.json', help="Archivo JSON con tiempos y planes")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    benchmark = PartitionBenchmark(runs=args.runs, cold_runs=args.cold_runs,
+                                   retention_months=args.retention_months, keep_copies=args.keep_copies)
+    report = benchmark.run(retention=not args.skip_retention)
+    logging.info(f" Mejora total de las 12 queries con particiones: x{report['speedup']['total']}")
+    if 'retention' in report:
+        logging.info(f" Retención con DROP de particiones: x{report['retention']['speedup']} más rápida que DELETE + VACUUM")
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, default=str)
+    logging.info(f" Resultados guardados en {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,492 @@
+"""
+FleetLogix - Asesor de Índices Basado en la Carga de Trabajo
+Reproduce las 12 queries de SQL/A2-01_queries.sql y la extracción incremental del ETL (A3-05) contra el
+PostgreSQL local, mide qué índices usa realmente (pg_stat_user_indexes y planes) y evalúa candidatos con
+costos what-if: HypoPG si está instalado o, si no, el índice construido y eliminado al terminar. Reporta
+qué índices agregar o eliminar, partiendo del conjunto de SQL/A2-03_optimization_indexes.sql, con la mejora
+estimada (costo del planificador) y la medida (mediana caliente) de cada uno
+"""
+
+import os
+import re
+import json
+import time
+import logging
+import argparse
+import importlib.util
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Tuple
+
+import numpy as np
+import psycopg2
+
+
+# Configuración de logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    handlers=[
+        logging.FileHandler('index_advisor.log'),
+        logging.StreamHandler()
+    ]
+)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+QUERY_BENCHMARK_PATH = os.path.join(BASE_DIR, 'A2-04_query_benchmark.py')
+ETL_MODULE_PATH = os.path.join(BASE_DIR, 'A3-05_etl_pipeline_estudiantes.py')
+
+# Tablas con menos filas se recorren completas más barato de lo que cuesta mantener un índice
+MIN_TABLE_ROWS = 10000
+# Mejora mínima del costo estimado de la carga para proponer un índice nuevo
+ADD_MIN_GAIN = 0.05
+# Pérdida máxima del costo estimado de la carga para proponer eliminar un índice existente
+DROP_MAX_LOSS = 0.01
+# Diferencias medidas por debajo de este valor se consideran ruido
+NOISE_FLOOR_MS = 1.0
+# Ventana de cambios de la extracción incremental reproducida (un batch diario)
+ETL_WORKLOAD_DAYS = 1
+# Nombre del índice construido al evaluar un candidato sin HypoPG
+CANDIDATE_INDEX = 'idx_advisor_candidate'
+# Claves de un nodo del plan con condiciones sobre la tabla que recorre o sobre un join
+SCAN_CONDITIONS = ('Filter', 'Index Cond', 'Recheck Cond')
+JOIN_CONDITIONS = ('Hash Cond', 'Merge Cond', 'Join Filter')
+
+
+def load_module(name: str, path: str):
+    """ Importa un script del proyecto desde su archivo (el nombre con guiones no es importable directamente) """
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def plan_nodes(plan: Dict) -> Iterator[Dict]:
+    """ Recorre todos los nodos de un plan EXPLAIN (FORMAT JSON), incluidos los de subplanes """
+    yield plan
+    for child in plan.get('Plans', []):
+        yield from plan_nodes(child)
+
+
+def condition_columns(condition: str) -> List[Tuple[str, str]]:
+    """ (alias, columna) mencionados en una condición del plan; alias vacío si no está calificada """
+    text = re.sub(r"'(?:[^']|'')*'", '', condition)
+    return re.findall(r"\b(?:(\w+)\.)?([a-z_][a-z0-9_]*)\b", text)
+
+
+def index_columns(definition: str) -> Tuple[Tuple[str, ...], bool]:
+    """ Columnas de un CREATE INDEX (pg_get_indexdef) y si el índice es parcial """
+    match = re.search(r"USING \w+ \((.*?)\)(\s+WHERE\s+.*)?$", definition)
+    columns = tuple(c.strip().split(' ')[0].strip('"') for c in match.group(1).split(','))
+    return columns, match.group(2) is not None
+
+
+class IndexAdvisor:
+    def __init__(self, runs: int = 5, use_hypopg: bool = True, min_gain: float = ADD_MIN_GAIN,
+                 max_loss: float = DROP_MAX_LOSS):
+        self.runs = runs
+        self.use_hypopg = use_hypopg
+        self.min_gain = min_gain
+        self.max_loss = max_loss
+        self.query_benchmark = load_module('fleetlogix_query_benchmark', QUERY_BENCHMARK_PATH)
+        self.db_config = self.query_benchmark.DB_CONFIG
+        # Arnés de A2-04: conexión en autocommit, DDL de los índices de A2-03 y medición de tiempos
+        self.harness = self.query_benchmark.QueryBenchmark(runs=runs, cold_runs=0)
+        self.conn = None
+        self.hypopg = False
+        # Partición (tabla o índice) -> tabla o índice raíz
+        self.roots = {}
+        self.table_rows = {}
+        self.table_columns = {}
+
+    def connect(self):
+        """ Conexión del arnés (autocommit) y una transaccional para evaluar eliminaciones con ROLLBACK """
+        self.harness.connect()
+        self.conn = psycopg2.connect(**self.db_config)
+        cursor = self.harness.conn.cursor()
+        # Un candidato que quedó de una corrida interrumpida no forma parte de los índices existentes
+        cursor.execute(f"DROP INDEX IF EXISTS {CANDIDATE_INDEX}")
+        if self.use_hypopg:
+            cursor.execute("SELECT 1 FROM pg_available_extensions WHERE name = 'hypopg'")
+            if cursor.fetchone():
+                cursor.execute("CREATE EXTENSION IF NOT EXISTS hypopg")
+                self.hypopg = True
+        cursor.close()
+        logging.info(f" What-if de candidatos: {'HypoPG' if self.hypopg else 'índice real construido y eliminado'}")
+
+    def load_catalog(self):
+        """ Filas y columnas de las tablas de public y el mapa de particiones a su tabla o índice raíz """
+        cursor = self.harness.conn.cursor()
+        cursor.execute("""
+            SELECT c.relname, pg_partition_root(c.oid)::regclass::text
+            FROM pg_class c WHERE c.relispartition AND c.relnamespace = 'public'::regnamespace
+        """)
+        self.roots = dict(cursor.fetchall())
+        cursor.execute("""
+            SELECT c.relname, COALESCE((SELECT SUM(GREATEST(l.reltuples, 0))
+                                        FROM pg_partition_tree(c.oid) p JOIN pg_class l ON l.oid = p.relid
+                                        WHERE p.isleaf), GREATEST(c.reltuples, 0))::BIGINT
+            FROM pg_class c
+            WHERE c.relnamespace = 'public'::regnamespace AND c.relkind IN ('r', 'p') AND NOT c.relispartition
+        """)
+        self.table_rows = dict(cursor.fetchall())
+        cursor.execute("SELECT table_name, column_name FROM information_schema.columns WHERE table_schema = 'public'")
+        for table, column in cursor.fetchall():
+            self.table_columns.setdefault(table, set()).add(column)
+        cursor.close()
+
+    def load_workload(self) -> List[Dict]:
+        """ Las 12 queries analíticas más la extracción incremental del ETL con los cambios del último día """
+        etl = load_module('fleetlogix_etl', ETL_MODULE_PATH)
+        cursor = self.harness.conn.cursor()
+        cursor.execute("SELECT MAX(delivery_id), MAX(delivered_datetime) FROM public.deliveries")
+        last_delivery_id, last_delivered = cursor.fetchone()
+        if last_delivered is None:
+            # Sin entregas completadas la extracción incremental no tiene ventana que reproducir
+            logging.warning(" Sin entregas con delivered_datetime: la carga no incluye la extracción del ETL")
+            cursor.close()
+            return self.harness.queries
+        since = last_delivered - timedelta(days=ETL_WORKLOAD_DAYS)
+        # Mismas cotas de poda que FleetLogixETL._extract_params (las consultas de las cotas también son carga)
+        scheduled_since, departure_since = etl.partition_bounds(self.harness.conn, last_delivery_id, since)
+        params = {
+            'last_delivery_id': last_delivery_id,
+            'delivered_since': since,
+            'after_trip_id': 0,
+            'scheduled_since': scheduled_since,
+            'departure_since': departure_since
+        }
+        workload = [{'name': 'etl_incremental', 'title': 'Extracción incremental del ETL (A3-05)',
+                     'sql': cursor.mogrify(etl.EXTRACT_QUERY.format(where=etl.INCREMENTAL_FILTER), params).decode()}]
+        if scheduled_since is not None:
+            workload.append({'name': 'etl_changed_bound', 'title': 'Cota de poda de las entregas modificadas (A3-05)',
+                             'sql': cursor.mogrify(etl.CHANGED_SCHEDULED_QUERY, (since,)).decode()})
+        cursor.close()
+        return self.harness.queries + workload
+
+    def existing_indexes(self) -> Dict[str, Dict]:
+        """ Índices raíz de las tablas de public que no respaldan una restricción (PK, UNIQUE) """
+        cursor = self.harness.conn.cursor()
+        cursor.execute("""
+            SELECT ic.relname, t.relname, pg_get_indexdef(i.indexrelid),
+                   EXISTS (SELECT 1 FROM pg_constraint WHERE conindid = i.indexrelid),
+                   COALESCE((SELECT SUM(pg_relation_size(p.relid)) FROM pg_partition_tree(i.indexrelid) p),
+                            pg_relation_size(i.indexrelid))::BIGINT
+            FROM pg_index i
+            JOIN pg_class ic ON ic.oid = i.indexrelid
+            JOIN pg_class t ON t.oid = i.indrelid
+            WHERE t.relnamespace = 'public'::regnamespace AND NOT ic.relispartition
+        """)
+        indexes = {}
+        for name, table, definition, constraint, size in cursor.fetchall():
+            columns, partial = index_columns(definition)
+            indexes[name] = {'table': table, 'definition': definition, 'columns': columns, 'partial': partial,
+                             'constraint': constraint, 'size_bytes': size}
+        cursor.close()
+        return indexes
+
+    def index_scans(self) -> Dict[str, int]:
+        """ idx_scan acumulado por índice raíz (las particiones suman al índice de la tabla particionada) """
+        cursor = self.harness.conn.cursor()
+        cursor.execute("SELECT pg_stat_clear_snapshot()")
+        cursor.execute("""
+            SELECT COALESCE(pg_partition_root(indexrelid), indexrelid)::regclass::text, SUM(idx_scan)::BIGINT
+            FROM pg_stat_user_indexes WHERE schemaname = 'public' GROUP BY 1
+        """)
+        scans = dict(cursor.fetchall())
+        cursor.close()
+        return scans
+
+    def replay_usage(self, workload: List[Dict]) -> Dict[str, int]:
+        """ Ejecuta la carga una vez y devuelve los idx_scan que generó en cada índice """
+        before = self.index_scans()
+        for query in workload:
+            self.harness.time_query(self.harness.conn, query['sql'])
+        cursor = self.harness.conn.cursor()
+        # PostgreSQL 15+ publica las estadísticas de la sesión de forma diferida; se fuerza el envío
+        cursor.execute("SELECT EXISTS (SELECT 1 FROM pg_proc WHERE proname = 'pg_stat_force_next_flush')")
+        if cursor.fetchone()[0]:
+            cursor.execute("SELECT pg_stat_force_next_flush()")
+        cursor.close()
+        after = self.index_scans()
+        return {name: after.get(name, 0) - before.get(name, 0) for name in after}
+
+    def explain(self, conn, sql: str) -> Dict:
+        cursor = conn.cursor()
+        cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}")
+        plan = cursor.fetchone()[0][0]['Plan']
+        cursor.close()
+        return plan
+
+    def analyze_plan(self, plan: Dict) -> Dict:
+        """ Costo total, tablas recorridas, índices usados y columnas candidatas (filtros y joins) de un plan """
+        aliases, indexes, tables = {}, set(), set()
+        scans, joins = [], []
+        for node in plan_nodes(plan):
+            if 'Relation Name' in node:
+                relation = node['Relation Name']
+                table = self.roots.get(relation, relation)
+                alias = node.get('Alias', table)
+                if relation != table:
+                    # Las particiones se rotulan alias_N; las condiciones de join usan el alias de la tabla
+                    alias = re.sub(r"_\d+$", '', alias)
+                aliases[alias] = table
+                tables.add(table)
+                scans.append((table, alias, ' '.join(node.get(k, '') for k in SCAN_CONDITIONS)))
+            if 'Index Name' in node:
+                indexes.add(self.roots.get(node['Index Name'], node['Index Name']))
+            joins.extend(node[k] for k in JOIN_CONDITIONS if k in node)
+
+        filters, join_columns = [], []
+        for table, alias, condition in scans:
+            columns = [c for a, c in condition_columns(condition)
+                       if (not a or a == alias) and c in self.table_columns.get(table, ())]
+            if columns:
+                filters.append((table, tuple(dict.fromkeys(columns))))
+        for condition in joins:
+            for a, c in condition_columns(condition):
+                if a in aliases and c in self.table_columns.get(aliases[a], ()):
+                    join_columns.append((aliases[a], (c,)))
+        return {'cost': plan['Total Cost'], 'tables': tables, 'indexes': indexes,
+                'filters': filters, 'joins': join_columns}
+
+    def candidates(self, plans: Dict[str, Dict], existing: Dict[str, Dict]) -> Dict[Tuple, Dict]:
+        """ Índices candidatos sobre tablas grandes: cada columna filtrada o de join y la combinación de las
+        columnas filtradas en un mismo recorrido; se omiten los ya cubiertos por un índice existente """
+        covered = {}
+        for index in existing.values():
+            if not index['partial']:
+                covered.setdefault(index['table'], []).append(index['columns'])
+        candidates = {}
+        for name, analysis in plans.items():
+            keys = analysis['joins'] + analysis['filters']
+            keys += [(table, (column,)) for table, columns in analysis['filters'] if len(columns) > 1 for column in columns]
+            for table, columns in keys:
+                if self.table_rows.get(table, 0) < MIN_TABLE_ROWS:
+                    continue
+                if any(existing_columns[:len(columns)] == columns for existing_columns in covered.get(table, [])):
+                    continue
+                candidate = candidates.setdefault((table, columns), {
+                    'table': table,
+                    'columns': columns,
+                    'definition': f"CREATE INDEX ON {table} ({', '.join(columns)})",
+                    'queries': set()
+                })
+                candidate['queries'].add(name)
+        return candidates
+
+    def measure(self, conn, workload: Dict[str, Dict], names: List[str]) -> Dict[str, float]:
+        """ Mediana caliente (ms) de las queries indicadas en la conexión dada """
+        medians = {}
+        for name in names:
+            sql = workload[name]['sql']
+            self.harness.time_query(conn, sql)
+            medians[name] = round(float(np.median([self.harness.time_query(conn, sql) for _ in range(self.runs)])), 3)
+        return medians
+
+    def evaluate_drop(self, name: str, workload: Dict, plans: Dict) -> Dict:
+        """ Costo y tiempo de las queries que usan el índice si no existiera: DROP INDEX dentro de una
+        transacción que se revierte (ningún cambio queda aplicado) """
+        users = [q for q, analysis in plans.items() if name in analysis['indexes']]
+        result = {'used_by': users, 'costs': {}, 'measured_ms': {}, 'baseline_ms': {}}
+        if not users:
+            return result
+        cursor = self.conn.cursor()
+        try:
+            cursor.execute(f"DROP INDEX {name}")
+            result['costs'] = {q: self.explain(self.conn, workload[q]['sql'])['Total Cost'] for q in users}
+            result['measured_ms'] = self.measure(self.conn, workload, users)
+        finally:
+            self.conn.rollback()
+            cursor.close()
+        # Medición pareada: las mismas queries con el índice, justo después
+        result['baseline_ms'] = self.measure(self.conn, workload, users)
+        self.conn.rollback()
+        return result
+
+    def evaluate_candidate(self, candidate: Dict, workload: Dict, plans: Dict) -> Dict:
+        """ Costo what-if de las queries que recorren la tabla con el candidato (HypoPG o índice real) y,
+        si la mejora estimada supera min_gain, su tiempo medido con el índice construido """
+        affected = [q for q, analysis in plans.items() if candidate['table'] in analysis['tables']]
+        cursor = self.harness.conn.cursor()
+        result = {'affected': affected, 'costs': {}, 'measured_ms': {}, 'baseline_ms': {}, 'method': 'build'}
+        built = None
+        try:
+            if self.hypopg:
+                try:
+                    cursor.execute("SELECT indexrelid FROM hypopg_create_index(%s)", (candidate['definition'],))
+                    oid = cursor.fetchone()[0]
+                    cursor.execute("SELECT hypopg_relation_size(%s)", (oid,))
+                    result['size_bytes'] = cursor.fetchone()[0]
+                    result['costs'] = {q: self.explain(self.harness.conn, workload[q]['sql'])['Total Cost'] for q in affected}
+                    result['method'] = 'hypopg'
+                except psycopg2.Error as e:
+                    # HypoPG no admite algunas tablas (p. ej. particionadas): se evalúa con el índice real
+                    logging.warning(f" HypoPG no pudo evaluar {candidate['definition']}: {e}")
+                finally:
+                    cursor.execute("SELECT hypopg_reset()")
+            if result['method'] == 'hypopg':
+                gain = sum(plans[q]['cost'] - c for q, c in result['costs'].items()) / self.total_cost
+                if gain < self.min_gain:
+                    return result
+
+            # Sin HypoPG el candidato se construye y confirma: PostgreSQL no usaría un índice creado en la
+            # misma transacción sobre una tabla con cadenas HOT rotas (indcheckxmin)
+            start = time.perf_counter()
+            cursor.execute(f"DROP INDEX IF EXISTS {CANDIDATE_INDEX}")
+            cursor.execute(candidate['definition'].replace('CREATE INDEX ON', f'CREATE INDEX {CANDIDATE_INDEX} ON', 1))
+            built = CANDIDATE_INDEX
+            result['build_seconds'] = round(time.perf_counter() - start, 3)
+            cursor.execute(f"SELECT COALESCE((SELECT SUM(pg_relation_size(relid)) FROM pg_partition_tree('{built}')), "
+                           f"pg_relation_size('{built}'))::BIGINT")
+            result['size_bytes'] = cursor.fetchone()[0]
+            if result['method'] == 'build':
+                result['costs'] = {q: self.explain(self.harness.conn, workload[q]['sql'])['Total Cost'] for q in affected}
+                gain = sum(plans[q]['cost'] - c for q, c in result['costs'].items()) / self.total_cost
+                if gain < self.min_gain:
+                    return result
+            result['measured_ms'] = self.measure(self.harness.conn, workload, affected)
+            # Medición pareada: las mismas queries sin el índice, justo después
+            cursor.execute(f"DROP INDEX {built}")
+            built = None
+            result['baseline_ms'] = self.measure(self.harness.conn, workload, affected)
+        finally:
+            if built:
+                cursor.execute(f"DROP INDEX IF EXISTS {built}")
+            cursor.close()
+        return result
+
+    def advise(self) -> Dict:
+        """ Flujo completo: uso real de los índices, costos y tiempos base, evaluación de eliminaciones y
+        candidatos, y recomendación por índice """
+        workload = {q['name']: q for q in self.load_workload()}
+        scans = self.replay_usage(list(workload.values()))
+        plans = {name: self.analyze_plan(self.explain(self.harness.conn, q['sql'])) for name, q in workload.items()}
+        self.total_cost = sum(p['cost'] for p in plans.values())
+        baseline_ms = self.measure(self.harness.conn, workload, list(workload))
+        total_ms = sum(baseline_ms.values())
+        logging.info(f" Carga base: {len(workload)} queries, costo {self.total_cost:,.0f}, {total_ms:,.1f} ms")
+
+        existing = self.existing_indexes()
+        recommendations = []
+        for name, index in sorted(existing.items()):
+            if index['constraint']:
+                continue
+            result = self.evaluate_drop(name, workload, plans)
+            loss = sum(c - plans[q]['cost'] for q, c in result['costs'].items()) / self.total_cost
+            loss_ms = sum(ms - result['baseline_ms'][q] for q, ms in result['measured_ms'].items())
+            drop = loss < self.max_loss and loss_ms < NOISE_FLOOR_MS
+            recommendations.append({
+                'action': 'drop' if drop else 'keep',
+                'index': name,
+                'table': index['table'],
+                'definition': index['definition'],
+                'size_bytes': index['size_bytes'],
+                'idx_scan': scans.get(name, 0),
+                'used_by': result['used_by'],
+                # Al eliminarlo: pérdida estimada (fracción del costo total) y medida
+                'estimated_gain': round(-loss, 4),
+                'measured_gain_ms': round(-loss_ms, 3),
+                'measured_gain': round(-loss_ms / total_ms, 4) if total_ms > 0 else 0.0
+            })
+
+        for candidate in self.candidates(plans, existing).values():
+            result = self.evaluate_candidate(candidate, workload, plans)
+            gain = sum(plans[q]['cost'] - c for q, c in result['costs'].items()) / self.total_cost
+            gain_ms = sum(result['baseline_ms'][q] - ms for q, ms in result['measured_ms'].items())
+            add = gain >= self.min_gain and gain_ms > NOISE_FLOOR_MS
+            recommendations.append({
+                'action': 'add' if add else 'reject',
+                'index': None,
+                'table': candidate['table'],
+                'definition': candidate['definition'],
+                'size_bytes': result.get('size_bytes'),
+                'method': result['method'],
+                'suggested_by': sorted(candidate['queries']),
+                'improved': sorted(q for q, c in result['costs'].items() if c < plans[q]['cost']),
+                'estimated_gain': round(gain, 4),
+                'measured_gain_ms': round(gain_ms, 3) if result['measured_ms'] else None,
+                'measured_gain': round(gain_ms / total_ms, 4) if result['measured_ms'] and total_ms > 0 else None
+            })
+
+        for r in recommendations:
+            measured = f"{r['measured_gain_ms']} ms" if r['measured_gain_ms'] is not None else "sin medir"
+            logging.info(f" {r['action'].upper():6} {r['index'] or r['definition']}: estimada {r['estimated_gain']:+.1%}, "
+                         f"medida {measured}")
+        return {
+            'workload': {name: {'title': q['title'], 'cost': plans[name]['cost'], 'median_ms': baseline_ms[name],
+                                'indexes': sorted(plans[name]['indexes'])} for name, q in workload.items()},
+            'total_cost': self.total_cost,
+            'total_ms': round(total_ms, 3),
+            'recommendations': recommendations
+        }
+
+    def run(self) -> Dict:
+        """ Evalúa con el conjunto de A2-03 creado y deja los índices como estaban al empezar """
+        self.connect()
+        initial = self.harness.existing_indexes()
+        report = {
+            'run_date': datetime.now().isoformat(),
+            'server_version': self.harness.server_version,
+            'database': self.db_config['database'],
+            'runs': self.runs
+        }
+        try:
+            self.harness.set_indexes(True)
+            self.load_catalog()
+            report['what_if'] = 'hypopg' if self.hypopg else 'build'
+            report.update(self.advise())
+        finally:
+            a2_03 = [name for name, _, _ in self.harness.indexes]
+            self.harness.set_indexes(False, only=[name for name in a2_03 if name not in initial])
+            self.harness.conn.close()
+            self.conn.close()
+        return report
+
+
+def recommended_sql(report: Dict) -> str:
+    """ DDL de las recomendaciones de agregar y eliminar, con su mejora como comentario """
+    lines = ["-- FleetLogix - Recomendaciones del asesor de índices (A2-06)",
+             f"-- Generado: {report['run_date']}", ""]
+    for r in report['recommendations']:
+        if r['action'] == 'add':
+            lines += [f"-- Mejora estimada {r['estimated_gain']:.1%}, medida {r['measured_gain_ms']} ms "
+                      f"({', '.join(r['improved'])})", f"{r['definition']};", ""]
+        elif r['action'] == 'drop':
+            lines += [f"-- Pérdida estimada {-r['estimated_gain']:.1%}, medida {-r['measured_gain_ms']} ms "
+                      f"(idx_scan={r['idx_scan']}, {r['size_bytes'] or 0:,} bytes)",
+                      f"DROP INDEX IF EXISTS {r['index']};", ""]
+    return '\n'.join(lines)
+
+
+def parse_args():
+    """ Opciones de línea de comandos del asesor """
+    parser = argparse.ArgumentParser(description="FleetLogix - Asesor de índices basado en la carga de trabajo")
+    parser.add_argument('--runs', type=int, default=5, help="Corridas calientes por query al medir")
+    parser.add_argument('--no-hypopg', action='store_true',
+                        help="Evaluar candidatos construyendo el índice aunque HypoPG esté disponible")
+    parser.add_argument('--min-gain', type=float, default=ADD_MIN_GAIN,
+                        help="Mejora estimada mínima (fracción del costo de la carga) para agregar un índice")
+    parser.add_argument('--max-loss', type=float, default=DROP_MAX_LOSS,
+                        help="Pérdida estimada máxima para eliminar un índice existente")
+    parser.add_argument('--output', default='index_advice.json', help="Archivo JSON con el reporte")
+    parser.add_argument('--sql-output', default='index_advice.sql', help="Archivo SQL con las recomendaciones")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    advisor = IndexAdvisor(runs=args.runs, use_hypopg=not args.no_hypopg, min_gain=args.min_gain, max_loss=args.max_loss)
+    report = advisor.run()
+
+    actions = [r['action'] for r in report['recommendations']]
+    logging.info(f" Recomendaciones: {actions.count('add')} agregar, {actions.count('drop')} eliminar, "
+                 f"{actions.count('keep')} conservar, {actions.count('reject')} candidatos descartados")
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, default=str)
+    with open(args.sql_output, 'w', encoding='utf-8') as f:
+        f.write(recommended_sql(report))
+    logging.info(f" Reporte guardado en {args.output} y recomendaciones en {args.sql_output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,14 @@
 """
 FleetLogix - Pipeline ETL Automático
-Extrae de PostgreSQL, Transforma y Carga en Snowflake
+Extrae de PostgreSQL, Transforma y Carga en Snowflake (o en DuckDB local para pruebas y benchmarks)
 Ejecución diaria automatizada
 """
 
+import re
+import struct
+import select
 import psycopg2
-import snowflake.connector
+from psycopg2.extras import LogicalReplicationConnection
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
@@ -13,10 +16,36 @@ import logging
 import schedule
 import time
 import json
-from typing import Dict, List, Tuple
+import argparse
+import queue
+import threading
+import importlib.util
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterator, List, Tuple
+from abc import ABC, abstractmethod
 import os
 from dotenv import load_dotenv
-from snowflake.connector.pandas_tools import write_pandas
+
+# Destinos del warehouse: cada conector es opcional y solo se exige el del destino elegido
+try:
+    import snowflake.connector
+    from snowflake.connector.pandas_tools import write_pandas
+except ImportError:
+    snowflake = None
+    write_pandas = None
+
+try:
+    import duckdb
+except ImportError:
+    duckdb = None
+
+# Ruta Arrow de extracción y transformación (opcional)
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    from pyarrow import csv as pa_csv
+except ImportError:
+    pa = None
 
 
 # Configuración de logging para rastrear la ejecución y errores en consola y archivo local
@@ -48,20 +77,704 @@ SNOWFLAKE_CONFIG = {
     'schema': os.getenv('SNOWFLAKE_SCHEMA')
 }
 
-class FleetLogixETL:
+# Destino del ETL ('snowflake' o 'duckdb') y archivo de la base local de DuckDB
+ETL_WAREHOUSE = os.getenv('ETL_WAREHOUSE', 'snowflake')
+DUCKDB_PATH = os.getenv('DUCKDB_PATH', 'fleetlogix_dw.duckdb')
+
+# Modelo estrella del warehouse (fuente del esquema de la réplica local)
+DIMENSIONAL_MODEL_SQL = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'SQL', 'A3-04_dimensional_model.sql')
+
+# Motor de reglas de calidad compartido con el generador (el nombre con guiones no es importable directamente)
+DATA_QUALITY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'A1-02_data_quality.py')
+_spec = importlib.util.spec_from_file_location('fleetlogix_data_quality', DATA_QUALITY_PATH)
+data_quality = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(data_quality)
+
+# Reglas de calidad sobre cada bloque transformado antes de cargarlo: 'report' solo las reporta, 'strict' no carga
+# un bloque con violaciones de integridad (el batch se detiene y queda su checkpoint) y 'off' no valida
+ETL_QUALITY = os.getenv('ETL_QUALITY', 'report')
+
+# Filas por bloque en la extracción en streaming (acota la memoria del ETL)
+EXTRACT_CHUNK_SIZE = int(os.getenv('ETL_CHUNK_SIZE', 50000))
+
+# Directorio local donde se escriben los archivos Parquet de hechos antes de subirlos al warehouse
+ETL_STAGE_DIR = os.getenv('ETL_STAGE_DIR', 'etl_stage')
+
+# Columnas de fact_deliveries en el orden en que se escriben los archivos de stage
+FACT_COLUMNS = [
+    'date_key', 'scheduled_time_key', 'delivered_time_key', 'vehicle_key', 'driver_key', 'route_key', 'customer_key',
+    'delivery_id', 'trip_id', 'tracking_number', 'package_weight_kg', 'distance_km', 'fuel_consumed_liters',
+    'delivery_time_minutes', 'delay_minutes', 'deliveries_per_hour', 'fuel_efficiency_km_per_liter',
+    'cost_per_delivery', 'revenue_per_delivery', 'is_on_time', 'delivery_status', 'etl_batch_id'
+]
+
+# Resolución de Surrogate Keys: dimensión -> (tabla, llave natural, surrogate key, columna en el bloque, filtro)
+DIMENSION_KEYS = {
+    'vehicle': ('dim_vehicle', 'vehicle_id', 'vehicle_key', 'vehicle_id', 'is_current = TRUE'),
+    'driver': ('dim_driver', 'driver_id', 'driver_key', 'driver_id', 'is_current = TRUE'),
+    'route': ('dim_route', 'route_id', 'route_key', 'route_id', None),
+    'customer': ('dim_customer', 'customer_name', 'customer_key', 'customer_name', None),
+}
+# Miembro desconocido usado cuando la llave natural no existe en la dimensión. Las secuencias de SK empiezan
+# en 1, así que la llave 0 nunca corresponde a un miembro real
+UNKNOWN_KEY = 0
+# Atributos de la fila del miembro desconocido que setup_infrastructure siembra en cada dimensión (la llave
+# natural 0 no existe en las tablas maestras: sus SERIAL empiezan en 1)
+UNKNOWN_MEMBERS = {
+    'vehicle': {'vehicle_id': 0, 'license_plate': 'N/A', 'vehicle_type': 'Desconocido', 'status': 'Desconocido',
+                'is_current': True},
+    'driver': {'driver_id': 0, 'employee_code': 'N/A', 'full_name': 'Desconocido', 'status': 'Desconocido',
+               'is_current': True},
+    'route': {'route_id': 0, 'route_code': 'N/A', 'origin_city': 'Desconocido', 'destination_city': 'Desconocido'},
+    'customer': {'customer_name': 'Desconocido', 'city': 'Desconocido', 'customer_type': 'Desconocido'},
+}
+
+# Rollups mantenidos incrementalmente por cada carga de hechos: tabla -> columnas del grano
+ROLLUPS = {
+    'rollup_date_route': ['date_key', 'route_key'],
+    'rollup_date_driver': ['date_key', 'driver_key'],
+    'rollup_date_hour': ['date_key', 'hour_of_day'],
+    'rollup_month_city': ['month_key', 'city'],
+}
+# Columnas de grano: (tipo, expresión sobre fact_deliveries f y dim_route rt)
+ROLLUP_GRAIN = {
+    'date_key': ('INT', 'f.date_key'),
+    'route_key': ('INT', 'f.route_key'),
+    'driver_key': ('INT', 'f.driver_key'),
+    'hour_of_day': ('INT', 'CAST(FLOOR(f.scheduled_time_key / 10000) AS INT)'),
+    'month_key': ('INT', 'CAST(FLOOR(f.date_key / 100) AS INT)'),
+    'city': ('VARCHAR(100)', "COALESCE(rt.destination_city, 'Desconocida')"),
+}
+# Medidas aditivas (los promedios se derivan al consultar): (tipo, agregado sobre f)
+ROLLUP_MEASURES = {
+    'total_deliveries': ('INT', 'COUNT(*)'),
+    'delivered_deliveries': ('INT', 'COUNT(f.delivered_time_key)'),
+    'on_time_deliveries': ('INT', 'SUM(CASE WHEN f.is_on_time THEN 1 ELSE 0 END)'),
+    'total_delivery_minutes': ('BIGINT', 'COALESCE(SUM(f.delivery_time_minutes), 0)'),
+    'total_delay_minutes': ('BIGINT', 'COALESCE(SUM(f.delay_minutes), 0)'),
+    'total_weight_kg': ('DECIMAL(18,2)', 'COALESCE(SUM(f.package_weight_kg), 0)'),
+    'total_revenue': ('DECIMAL(18,2)', 'COALESCE(SUM(f.revenue_per_delivery), 0)'),
+    'total_cost': ('DECIMAL(18,2)', 'COALESCE(SUM(f.cost_per_delivery), 0)'),
+}
+
+# Sincronización de dimensiones: tabla maestra del origen, atributos comparados por hash, columnas que solo
+# se escriben al insertar y tipo de historia (SCD2 versiona con valid_from/valid_to/is_current, SCD1
+# sobrescribe). Los clientes no tienen tabla maestra: se derivan de las entregas y su ciudad es la del
+# primer envío visto (la última ciudad de destino cambiaría en casi cada bloque)
+DIMENSION_SOURCES = {
+    'vehicle': {
+        'query': """SELECT vehicle_id, license_plate, vehicle_type, capacity_kg, fuel_type, acquisition_date, status
+                    FROM public.vehicles""",
+        'attributes': ['license_plate', 'vehicle_type', 'capacity_kg', 'fuel_type', 'acquisition_date', 'status'],
+        'insert_only': ['age_months'],
+        'scd': 2
+    },
+    'driver': {
+        'query': """SELECT driver_id, employee_code, (first_name || ' ' || last_name) AS full_name, license_number,
+                           license_expiry, phone, hire_date, status
+                    FROM public.drivers""",
+        'attributes': ['employee_code', 'full_name', 'license_number', 'license_expiry', 'phone', 'hire_date', 'status'],
+        'insert_only': ['experience_months'],
+        'scd': 2
+    },
+    'route': {
+        'query': """SELECT route_id, route_code, origin_city, destination_city, distance_km, estimated_duration_hours, toll_cost
+                    FROM public.routes""",
+        'attributes': ['route_code', 'origin_city', 'destination_city', 'distance_km', 'estimated_duration_hours', 'toll_cost'],
+        'insert_only': [],
+        'scd': 1
+    },
+    'customer': {
+        'query': None,
+        'attributes': [],
+        'insert_only': ['city', 'customer_type', 'first_delivery_date', 'total_deliveries', 'customer_category'],
+        'scd': 1
+    },
+}
+
+# Calendario de dim_date (años inclusive) y mes de inicio del año fiscal (1 = año calendario)
+DIM_DATE_START_YEAR = int(os.getenv('ETL_DIM_DATE_START_YEAR', 2015))
+DIM_DATE_END_YEAR = int(os.getenv('ETL_DIM_DATE_END_YEAR', 2040))
+FISCAL_YEAR_START_MONTH = int(os.getenv('ETL_FISCAL_YEAR_START_MONTH', 1))
+
+# Festivos de Colombia: fechas fijas, trasladables al lunes siguiente (Ley Emiliani) y relativos a la Pascua
+# (días desde el Domingo de Resurrección, ya trasladados al lunes cuando aplica)
+HOLIDAYS_FIXED = [
+    (1, 1, 'Año Nuevo'), (5, 1, 'Día del Trabajo'), (7, 20, 'Día de la Independencia'),
+    (8, 7, 'Batalla de Boyacá'), (12, 8, 'Inmaculada Concepción'), (12, 25, 'Navidad')
+]
+HOLIDAYS_MONDAY = [
+    (1, 6, 'Reyes Magos'), (3, 19, 'San José'), (6, 29, 'San Pedro y San Pablo'), (8, 15, 'Asunción de la Virgen'),
+    (10, 12, 'Día de la Raza'), (11, 1, 'Todos los Santos'), (11, 11, 'Independencia de Cartagena')
+]
+HOLIDAYS_EASTER = [
+    (-3, 'Jueves Santo'), (-2, 'Viernes Santo'), (43, 'Ascensión del Señor'),
+    (64, 'Corpus Christi'), (71, 'Sagrado Corazón')
+]
+DAY_NAMES = np.array(['Lunes', 'Martes', 'Miércoles', 'Jueves', 'Viernes', 'Sábado', 'Domingo'])
+MONTH_NAMES = np.array(['Enero', 'Febrero', 'Marzo', 'Abril', 'Mayo', 'Junio', 'Julio', 'Agosto',
+                        'Septiembre', 'Octubre', 'Noviembre', 'Diciembre'])
+
+# Bloques en espera entre etapas del modo pipeline (acota la memoria: ~2 colas x QUEUE_SIZE bloques)
+ETL_QUEUE_SIZE = int(os.getenv('ETL_QUEUE_SIZE', 2))
+
+# Procesos para transform_data y filas mínimas por proceso para que el reparto compense
+ETL_TRANSFORM_WORKERS = int(os.getenv('ETL_TRANSFORM_WORKERS', 1))
+PARALLEL_MIN_ROWS = 10000
+
+# Estado persistente del ETL incremental (marca de agua) y ventana de reproceso en días
+ETL_STATE_FILE = os.getenv('ETL_STATE_FILE', 'etl_state.json')
+ETL_BACKFILL_DAYS = int(os.getenv('ETL_BACKFILL_DAYS', 0))
+
+# Captura de cambios (CDC) por replicación lógica: publicación, slot pgoutput y tamaño de los micro-batches
+CDC_PUBLICATION = os.getenv('ETL_CDC_PUBLICATION', 'fleetlogix_cdc')
+CDC_SLOT = os.getenv('ETL_CDC_SLOT', 'fleetlogix_etl')
+CDC_BATCH_SECONDS = float(os.getenv('ETL_CDC_BATCH_SECONDS', 60))
+CDC_BATCH_MAX_TRIPS = int(os.getenv('ETL_CDC_BATCH_MAX_TRIPS', 5000))
+
+# Consulta de extracción: ordenada por viaje para que cada bloque contenga viajes completos.
+# {where} queda vacío en la carga completa o recibe INCREMENTAL_FILTER en la incremental
+EXTRACT_QUERY = """
+    SELECT 
+        d.delivery_id, d.tracking_number, d.customer_name, d.delivery_address, 
+        d.package_weight_kg, d.scheduled_datetime, d.delivered_datetime, d.delivery_status,
+        t.trip_id, t.fuel_consumed_liters, t.departure_datetime, t.arrival_datetime,
+        v.vehicle_id, v.license_plate, v.vehicle_type, v.capacity_kg, v.fuel_type,
+        dr.driver_id, dr.employee_code, (dr.first_name || ' ' || dr.last_name) AS full_name,
+        r.route_id, r.route_code, r.origin_city, r.destination_city, r.distance_km, r.toll_cost
+    FROM public.deliveries d
+    JOIN public.trips t ON d.trip_id = t.trip_id
+    JOIN public.vehicles v ON t.vehicle_id = v.vehicle_id
+    JOIN public.drivers dr ON t.driver_id = dr.driver_id
+    JOIN public.routes r ON t.route_id = r.route_id
+    {where}
+    ORDER BY d.trip_id, d.delivery_id
+"""
+
+# Tipos Arrow de cada columna de EXTRACT_QUERY para leer el COPY sin inferencia ni objetos Python
+EXTRACT_ARROW_TYPES = {
+    'delivery_id': 'int64', 'tracking_number': 'string', 'customer_name': 'string', 'delivery_address': 'string',
+    'package_weight_kg': 'float64', 'scheduled_datetime': 'timestamp[us]', 'delivered_datetime': 'timestamp[us]',
+    'delivery_status': 'string', 'trip_id': 'int64', 'fuel_consumed_liters': 'float64',
+    'departure_datetime': 'timestamp[us]', 'arrival_datetime': 'timestamp[us]', 'vehicle_id': 'int64',
+    'license_plate': 'string', 'vehicle_type': 'string', 'capacity_kg': 'float64', 'fuel_type': 'string',
+    'driver_id': 'int64', 'employee_code': 'string', 'full_name': 'string', 'route_id': 'int64',
+    'route_code': 'string', 'origin_city': 'string', 'destination_city': 'string', 'distance_km': 'float64',
+    'toll_cost': 'float64'
+}
+
+# Viajes completos con al menos una entrega nueva (delivery_id) o modificada (delivered_datetime).
+# after_trip_id salta los viajes ya cargados por un batch que se retoma desde su checkpoint.
+# Con trips/deliveries particionadas por mes, scheduled_since y departure_since son cotas constantes
+# sobre las columnas de partición para que PostgreSQL descarte los meses sin cambios al planificar
+# (NULL cuando el origen no está particionado: el filtro se reduce a TRUE)
+INCREMENTAL_FILTER = """
+    WHERE d.trip_id > %(after_trip_id)s
+      AND (%(departure_since)s IS NULL OR d.scheduled_datetime >= %(departure_since)s)
+      AND (%(departure_since)s IS NULL OR t.departure_datetime >= %(departure_since)s)
+      AND d.trip_id IN (
+        SELECT n.trip_id FROM public.deliveries n
+        WHERE (%(scheduled_since)s IS NULL OR n.scheduled_datetime >= %(scheduled_since)s)
+          AND (n.delivery_id > %(last_delivery_id)s
+               OR n.delivered_datetime > %(delivered_since)s)
+    )
+"""
+# Holgura de la poda: duración máxima de un viaje (de su salida a la última entrega programada), para traer
+# completos los viajes de las entregas nuevas o modificadas
+ETL_PARTITION_LOOKBACK_DAYS = int(os.getenv('ETL_PARTITION_LOOKBACK_DAYS', 7))
+# scheduled_datetime mínimo real de las entregas nuevas (por llave primaria) y de las modificadas desde la marca
+# de agua (por delivered_datetime, con idx_deliveries_delivered de SQL/A2-05_partitioning.sql): la cota de la
+# subconsulta no descarta ninguna entrega cambiada, por antigua que sea su fecha programada
+NEW_SCHEDULED_QUERY = "SELECT MIN(scheduled_datetime) FROM public.deliveries WHERE delivery_id > %s"
+CHANGED_SCHEDULED_QUERY = "SELECT MIN(scheduled_datetime) FROM public.deliveries WHERE delivered_datetime > %s"
+
+# Viajes completos tocados por un micro-batch del CDC (búsqueda por llave, sin recorrer las tablas)
+CDC_FILTER = """
+    WHERE d.trip_id = ANY(%(trip_ids)s)
+"""
+
+def partition_bounds(conn, last_delivery_id: int, since) -> Tuple:
+    """ Cotas scheduled_since y departure_since de INCREMENTAL_FILTER: el mínimo real de scheduled_datetime de
+    las entregas nuevas o modificadas, y ese mínimo menos ETL_PARTITION_LOOKBACK_DAYS para los viajes y sus
+    demás entregas. (None, None) si deliveries no está particionada o no hay cambios """
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = 'public.deliveries'::regclass)")
+        if not cursor.fetchone()[0]:
+            return None, None
+        cursor.execute(NEW_SCHEDULED_QUERY, (last_delivery_id,))
+        bounds = [cursor.fetchone()[0]]
+        if since is not None:
+            cursor.execute(CHANGED_SCHEDULED_QUERY, (since,))
+            bounds.append(cursor.fetchone()[0])
+    finally:
+        cursor.close()
+    bounds = [b for b in bounds if b is not None]
+    if not bounds:
+        return None, None
+    return min(bounds), min(bounds) - timedelta(days=ETL_PARTITION_LOOKBACK_DAYS)
+
+
+def split_by_trip(df: pd.DataFrame, parts: int) -> List[pd.DataFrame]:
+    """ Divide un bloque ordenado por trip_id en hasta `parts` particiones contiguas de tamaño similar,
+    cortando solo en cambios de viaje para que deliveries_in_trip se calcule completo en cada una """
+    trip_ids = df['trip_id'].to_numpy()
+    trip_starts = np.flatnonzero(np.r_[True, trip_ids[1:] != trip_ids[:-1]])
+    targets = np.arange(1, parts) * len(df) // parts
+    cuts = np.unique(trip_starts[np.searchsorted(trip_starts, targets).clip(max=len(trip_starts) - 1)])
+    bounds = [0] + [int(c) for c in cuts if c > 0] + [len(df)]
+    return [df.iloc[start:end] for start, end in zip(bounds[:-1], bounds[1:]) if end > start]
+
+
+def row_hashes(df: pd.DataFrame, columns: List[str]) -> np.ndarray:
+    """ Hash estable (int64) de los atributos de cada fila para detectar miembros nuevos o modificados.
+    Se hashea el texto de cada valor para que Decimal, fechas y floats den lo mismo en cada ejecución """
+    return pd.util.hash_pandas_object(df[columns].astype(str), index=False).to_numpy().view(np.int64)
+
+
+def months_since(values: pd.Series) -> np.ndarray:
+    """ Meses completos desde cada fecha hasta hoy (antigüedad de vehículos y experiencia de conductores) """
+    dates = pd.to_datetime(values)
+    today = pd.Timestamp.now()
+    months = (today.year - dates.dt.year) * 12 + (today.month - dates.dt.month) - (today.day < dates.dt.day)
+    return months.fillna(0).astype('int64').to_numpy()
+
+
+def easter_sundays(years: np.ndarray) -> np.ndarray:
+    """ Domingo de Resurrección de cada año (algoritmo gregoriano anónimo, vectorizado) """
+    a = years % 19
+    b, c = years // 100, years % 100
+    d, e = b // 4, b % 4
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = c // 4, c % 4
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month = (h + l - 7 * m + 114) // 31
+    day = (h + l - 7 * m + 114) % 31 + 1
+    return pd.to_datetime(pd.DataFrame({'year': years, 'month': month, 'day': day})).to_numpy()
+
+
+def colombian_holidays(years: np.ndarray) -> pd.DataFrame:
+    """ Festivos de Colombia de los años indicados (fecha, nombre), calculados por regla para todos los años
+    a la vez: fijos, trasladados al lunes siguiente y relativos a la Pascua """
+    def on(month, day):
+        return pd.to_datetime(pd.DataFrame({'year': years, 'month': month, 'day': day})).to_numpy()
+
+    parts = [pd.DataFrame({'full_date': on(month, day), 'holiday_name': name}) for month, day, name in HOLIDAYS_FIXED]
+    for month, day, name in HOLIDAYS_MONDAY:
+        dates = pd.DatetimeIndex(on(month, day))
+        parts.append(pd.DataFrame({'full_date': dates + pd.to_timedelta((7 - dates.dayofweek) % 7, unit='D'),
+                                   'holiday_name': name}))
+    easter = easter_sundays(years)
+    for offset, name in HOLIDAYS_EASTER:
+        parts.append(pd.DataFrame({'full_date': easter + np.timedelta64(offset, 'D'), 'holiday_name': name}))
+    # Si dos festivos coinciden se conserva uno solo por fecha
+    return pd.concat(parts, ignore_index=True).drop_duplicates('full_date')
+
+
+def date_keys(values: pd.Series) -> np.ndarray:
+    """ date_key YYYYMMDD calculado con aritmética sobre datetime64 (año, mes y día por cambio de unidad),
+    sin formatear un texto por fila. NaT -> 0 """
+    ts = values.to_numpy(dtype='datetime64[us]')
+    months = ts.astype('datetime64[M]')
+    year = ts.astype('datetime64[Y]').astype(np.int64) + 1970
+    month = months.astype(np.int64) % 12 + 1
+    day = (ts.astype('datetime64[D]') - months.astype('datetime64[D]')).astype(np.int64) + 1
+    return np.where(np.isnat(ts), 0, year * 10000 + month * 100 + day)
+
+
+def time_keys(values: pd.Series, fill=0):
+    """ time_key HHMMSS (llave de dim_time, al segundo) desde los segundos transcurridos del día.
+    NaT -> fill; con fill=None devuelve un entero nullable con NA """
+    ts = values.to_numpy(dtype='datetime64[us]')
+    seconds = (ts - ts.astype('datetime64[D]')).astype('timedelta64[s]').astype(np.int64)
+    keys = seconds // 3600 * 10000 + seconds // 60 % 60 * 100 + seconds % 60
+    missing = np.isnat(ts)
+    if fill is None:
+        return pd.arrays.IntegerArray(np.where(missing, 0, keys), missing)
+    return np.where(missing, fill, keys)
+
+
+def transform_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """ Transformación pura de un bloque (sin estado del ETL), ejecutable en procesos del pool.
+    Requiere que cada viaje esté completo dentro del bloque """
+    # Normalización de tipos de datos a fechas para cálculos temporales
+    for col in ['scheduled_datetime', 'delivered_datetime', 'departure_datetime', 'arrival_datetime']:
+        df[col] = pd.to_datetime(df[col], errors='coerce')
+
+    # Cálculo de KPIs de tiempo de entrega y retrasos
+    df['delivery_time_minutes'] = ((df['delivered_datetime'] - df['scheduled_datetime']).dt.total_seconds() / 60).round(2)
+    df['delay_minutes'] = df['delivery_time_minutes'].clip(lower=0).fillna(0)
+    df['is_on_time'] = df['delay_minutes'] <= 30
+    
+    # Cálculo de duración de viajes para métricas de eficiencia
+    df['trip_duration_hours'] = ((df['arrival_datetime'] - df['departure_datetime']).dt.total_seconds() / 3600).round(2)
+    df.loc[df['trip_duration_hours'] <= 0, 'trip_duration_hours'] = np.nan
+
+    # Agregación vectorizada para determinar cuántas entregas se hicieron por hora de viaje
+    deliveries_per_trip = df.groupby('trip_id').size()
+    df['deliveries_in_trip'] = df['trip_id'].map(deliveries_per_trip)
+    df['deliveries_per_hour'] = (df['deliveries_in_trip'] / df['trip_duration_hours']).fillna(0).round(2)
+    
+    # Cálculos financieros y operativos: eficiencia de combustible, costos y utilidades
+    df['fuel_efficiency_km_per_liter'] = (df['distance_km'] / df['fuel_consumed_liters']).replace([np.inf, -np.inf], 0).fillna(0).round(2)
+    df['cost_per_delivery'] = ((df['fuel_consumed_liters'].fillna(0) * 5000 + df['toll_cost'].fillna(0)) / df['deliveries_in_trip']).round(2)
+    df['revenue_per_delivery'] = (20000 + df['package_weight_kg'] * 500).round(2)
+
+    # Limpieza de valores extremos o erróneos en el peso del paquete
+    df = df[(df['package_weight_kg'] > 0) & (df['package_weight_kg'] < 10000)].copy()
+    
+    # Generación de llaves inteligentes (Smart Keys) para dimensiones de fecha y hora en el Warehouse
+    df['date_key'] = date_keys(df['scheduled_datetime'])
+    df['scheduled_time_key'] = time_keys(df['scheduled_datetime'])
+    df['delivered_time_key'] = time_keys(df['delivered_datetime'], fill=None)
+    
+    return df
+
+
+def transform_table(table: 'pa.Table') -> 'pa.Table':
+    """ Mismos KPIs y limpieza que transform_frame, calculados con pyarrow.compute sobre el bloque Arrow
+    (columnas nativas, sin objetos Python). Requiere que cada viaje esté completo dentro del bloque """
+    def elapsed(end, start, unit_us):
+        return pc.divide(pc.cast(pc.cast(pc.subtract(end, start), pa.int64()), pa.float64()), unit_us)
+
+    def finite_or_zero(values):
+        return pc.fill_null(pc.if_else(pc.is_finite(values), values, 0.0), 0.0)
+
+    scheduled = table['scheduled_datetime']
+    fuel = table['fuel_consumed_liters']
+
+    # Cálculo de KPIs de tiempo de entrega y retrasos
+    delivery_time = pc.round(elapsed(table['delivered_datetime'], scheduled, 60e6), 2)
+    delay = pc.fill_null(pc.max_element_wise(delivery_time, 0.0), 0.0)
+    is_on_time = pc.less_equal(delay, 30)
+
+    # Cálculo de duración de viajes para métricas de eficiencia
+    trip_hours = pc.round(elapsed(table['arrival_datetime'], table['departure_datetime'], 3600e6), 2)
+    trip_hours = pc.if_else(pc.less_equal(trip_hours, 0), pa.scalar(None, pa.float64()), trip_hours)
+
+    # Entregas por viaje: conteo por trip_id devuelto a cada fila
+    _, inverse, counts = np.unique(table['trip_id'].to_numpy(), return_inverse=True, return_counts=True)
+    deliveries_in_trip = pa.array(counts[inverse])
+    deliveries_per_hour = pc.fill_null(pc.round(pc.divide(pc.cast(deliveries_in_trip, pa.float64()), trip_hours), 2), 0.0)
+
+    # Cálculos financieros y operativos: eficiencia de combustible, costos y utilidades
+    fuel_efficiency = pc.round(finite_or_zero(pc.divide(table['distance_km'], fuel)), 2)
+    trip_cost = pc.add(pc.multiply(pc.fill_null(fuel, 0.0), 5000), pc.fill_null(table['toll_cost'], 0.0))
+    cost_per_delivery = pc.round(pc.divide(trip_cost, pc.cast(deliveries_in_trip, pa.float64())), 2)
+    revenue_per_delivery = pc.round(pc.add(pc.multiply(table['package_weight_kg'], 500), 20000), 2)
+
+    for name, values in [('delivery_time_minutes', delivery_time), ('delay_minutes', delay),
+                         ('is_on_time', is_on_time), ('trip_duration_hours', trip_hours),
+                         ('deliveries_in_trip', deliveries_in_trip), ('deliveries_per_hour', deliveries_per_hour),
+                         ('fuel_efficiency_km_per_liter', fuel_efficiency), ('cost_per_delivery', cost_per_delivery),
+                         ('revenue_per_delivery', revenue_per_delivery)]:
+        table = table.append_column(name, values)
+
+    # Limpieza de valores extremos o erróneos en el peso del paquete
+    weight = table['package_weight_kg']
+    table = table.filter(pc.and_(pc.greater(weight, 0), pc.less(weight, 10000)))
+
+    # Llaves inteligentes de fecha y hora (aritméticas, sin formatear texto)
+    def hhmmss(ts):
+        return pc.cast(pc.add(pc.add(pc.multiply(pc.hour(ts), 10000), pc.multiply(pc.minute(ts), 100)), pc.second(ts)), pa.int64())
+
+    scheduled = table['scheduled_datetime']
+    date_key = pc.add(pc.add(pc.multiply(pc.year(scheduled), 10000), pc.multiply(pc.month(scheduled), 100)), pc.day(scheduled))
+    table = table.append_column('date_key', pc.cast(pc.fill_null(date_key, 0), pa.int64()))
+    table = table.append_column('scheduled_time_key', pc.fill_null(hhmmss(scheduled), 0))
+    return table.append_column('delivered_time_key', hhmmss(table['delivered_datetime']))
+
+
+class PgOutputDecoder:
+    """ Decodifica los mensajes del protocolo pgoutput (versión 1) que usa el CDC: definiciones de relación,
+    filas insertadas, actualizadas y borradas (valores en texto) y fin de transacción """
+
+    def __init__(self):
+        # relid -> (tabla, columnas), enviado por el servidor antes de la primera fila de cada tabla
+        self.relations = {}
+
+    def decode(self, payload: bytes):
+        """ Devuelve (operación, tabla, fila) con operación 'I', 'U', 'D' o 'C' (COMMIT); None para el resto """
+        kind = payload[:1]
+        if kind == b'C':
+            return 'C', None, None
+        if kind == b'R':
+            relid, = struct.unpack_from('!I', payload, 1)
+            _, pos = self._string(payload, 5)  # esquema
+            table, pos = self._string(payload, pos)
+            ncols, = struct.unpack_from('!h', payload, pos + 1)  # tras el byte de replica identity
+            pos += 3
+            columns = []
+            for _ in range(ncols):
+                name, pos = self._string(payload, pos + 1)  # tras el byte de flags
+                columns.append(name)
+                pos += 8  # OID del tipo + typmod
+            self.relations[relid] = (table, columns)
+            return None
+        if kind not in (b'I', b'U', b'D'):
+            return None
+
+        relid, = struct.unpack_from('!I', payload, 1)
+        table, columns = self.relations[relid]
+        pos = 5
+        # UPDATE puede traer la fila anterior ('K' llave u 'O' completa) antes de la nueva ('N')
+        if kind == b'U' and payload[pos:pos + 1] in (b'K', b'O'):
+            _, pos = self._tuple(payload, pos + 1, columns)
+        row, _ = self._tuple(payload, pos + 1, columns)
+        return kind.decode(), table, row
+
+    @staticmethod
+    def _string(payload: bytes, pos: int) -> Tuple[str, int]:
+        end = payload.index(b'\0', pos)
+        return payload[pos:end].decode(), end + 1
+
+    @staticmethod
+    def _tuple(payload: bytes, pos: int, columns: List[str]) -> Tuple[Dict, int]:
+        """ TupleData: por columna 'n' (nulo), 'u' (TOAST sin cambios) o 't' + largo + texto """
+        ncols, = struct.unpack_from('!h', payload, pos)
+        pos += 2
+        row = {}
+        for name in columns[:ncols]:
+            kind = payload[pos:pos + 1]
+            pos += 1
+            if kind == b't':
+                length, = struct.unpack_from('!i', payload, pos)
+                row[name] = payload[pos + 4:pos + 4 + length].decode()
+                pos += 4 + length
+            else:
+                row[name] = None
+        return row, pos
+
+
+class WarehouseAdapter(ABC):
+    """ Interfaz del destino del ETL: el pipeline solo usa estos métodos, de modo que el mismo run_etl
+    corre contra Snowflake o contra una réplica local embebida """
+    name = None
+
     def __init__(self):
+        self.conn = None
+
+    @abstractmethod
+    def connect(self):
+        """ Abre la conexión con el destino en self.conn """
+
+    @abstractmethod
+    def setup_schema(self):
+        """ Crea el modelo estrella si el destino lo requiere """
+
+    @abstractmethod
+    def execute(self, sql: str):
+        """ Ejecuta una sentencia y devuelve un cursor con fetchone/fetchall """
+
+    @abstractmethod
+    def write_frame(self, df: pd.DataFrame, table: str):
+        """ Sube un DataFrame a una tabla temporal de staging (reemplazándola) """
+
+    @abstractmethod
+    def copy_parquet(self, table: str, stage_file: str, columns: List[str]):
+        """ Ingiere en bloque un archivo Parquet del stage local en la tabla indicada """
+
+    @abstractmethod
+    def nextval(self, sequence: str) -> str:
+        """ Expresión SQL del siguiente valor de una secuencia """
+
+    def commit(self):
+        self.conn.commit()
+
+    def rollback(self):
+        self.conn.rollback()
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+
+class SnowflakeWarehouse(WarehouseAdapter):
+    """ Destino productivo: Snowflake con write_pandas para staging y PUT + COPY INTO para los hechos """
+    name = 'snowflake'
+
+    def __init__(self, config: Dict, private_key: bytes = None):
+        super().__init__()
+        self.config = config
+        self.private_key = private_key
+
+    def connect(self):
+        if snowflake is None:
+            raise ImportError("snowflake-connector-python no está instalado")
+        # Conexión al Data Warehouse (Destino) usando la llave privada cargada
+        self.conn = snowflake.connector.connect(**self.config, private_key=self.private_key)
+        logging.info(" Conectado a Snowflake")
+
+    def setup_schema(self):
+        # El modelo estrella se crea una sola vez ejecutando SQL/A3-04_dimensional_model.sql en Snowflake
+        pass
+
+    def execute(self, sql: str):
+        cursor = self.conn.cursor()
+        cursor.execute(sql)
+        return cursor
+
+    def write_frame(self, df: pd.DataFrame, table: str):
+        # Sube el DataFrame a una tabla temporal en Snowflake optimizada para carga masiva
+        write_pandas(self.conn, df, table, auto_create_table=True, table_type="temp", overwrite=True)
+
+    def copy_parquet(self, table: str, stage_file: str, columns: List[str]):
+        # Subir el archivo al stage de la tabla y copiarlo en bloque (el Parquet ya viene comprimido).
+        # FORCE: un bloque reintentado tras un checkpoint perdido tiene el mismo nombre y contenido, y la
+        # metadata de carga de la tabla lo omitiría en silencio después de que _delete_facts borró sus
+        # hechos; la deduplicación ya la hace el DELETE + INSERT del llamador
+        self.execute(f"PUT 'file://{os.path.abspath(stage_file)}' @%{table} AUTO_COMPRESS=FALSE OVERWRITE=TRUE")
+        self.execute(f"""
+            COPY INTO {table} ({', '.join(columns)})
+            FROM (SELECT {', '.join(f'$1:{c}' for c in columns)} FROM @%{table})
+            FILES = ('{os.path.basename(stage_file)}')
+            FILE_FORMAT = (TYPE = PARQUET)
+            PURGE = TRUE
+            FORCE = TRUE
+        """)
+
+    def nextval(self, sequence: str) -> str:
+        return f"{sequence}.NEXTVAL"
+
+
+class DuckDBWarehouse(WarehouseAdapter):
+    """ Réplica local embebida del warehouse en un archivo DuckDB, con el esquema traducido desde
+    SQL/A3-04_dimensional_model.sql; permite correr y perfilar el ETL completo en una sola máquina """
+    name = 'duckdb'
+
+    def __init__(self, path: str = DUCKDB_PATH, model_file: str = DIMENSIONAL_MODEL_SQL):
+        super().__init__()
+        self.path = path
+        self.model_file = model_file
+
+    def connect(self):
+        if duckdb is None:
+            raise ImportError("duckdb no está instalado")
+        self.conn = duckdb.connect(self.path)
+        # DuckDB trabaja en autocommit: se abre una transacción explícita para conservar commit/rollback
+        self.conn.begin()
+        logging.info(f" Conectado a DuckDB ({self.path})")
+
+    def setup_schema(self):
+        """ Traduce las tablas del modelo estrella al dialecto de DuckDB y las crea si no existen """
+        with open(self.model_file, 'r', encoding='utf-8') as f:
+            model_sql = f.read()
+        for ddl in re.findall(r"CREATE OR REPLACE TABLE .*?\n\);", model_sql, flags=re.S):
+            ddl = ddl.replace('CREATE OR REPLACE TABLE', 'CREATE TABLE IF NOT EXISTS')
+            # Las FK no se declaran: el miembro desconocido y los reprocesos no deben bloquear la carga
+            ddl = re.sub(r"\s+REFERENCES \w+\(\w+\)", "", ddl)
+            # IDENTITY de Snowflake -> secuencia propia por columna
+            for column in re.findall(r"(\w+) INT IDENTITY", ddl):
+                self.conn.execute(f"CREATE SEQUENCE IF NOT EXISTS seq_{column} START 1 INCREMENT 1")
+                ddl = ddl.replace(f"{column} INT IDENTITY", f"{column} INT DEFAULT nextval('seq_{column}')")
+            ddl = ddl.replace('TIMESTAMP_NTZ', 'TIMESTAMP').replace('CURRENT_TIMESTAMP()', 'CURRENT_TIMESTAMP')
+            ddl = re.sub(r"\bVARIANT\b", "JSON", ddl)
+            self.conn.execute(ddl)
+        self.commit()
+
+    def execute(self, sql: str):
+        return self.conn.execute(sql)
+
+    def write_frame(self, df: pd.DataFrame, table: str):
+        self.conn.register('stg_frame', df)
+        try:
+            self.conn.execute(f"CREATE OR REPLACE TEMP TABLE {table} AS SELECT * FROM stg_frame")
+        finally:
+            self.conn.unregister('stg_frame')
+
+    def copy_parquet(self, table: str, stage_file: str, columns: List[str]):
+        column_list = ', '.join(columns)
+        self.conn.execute(f"INSERT INTO {table} ({column_list}) SELECT {column_list} FROM read_parquet('{stage_file}')")
+
+    def nextval(self, sequence: str) -> str:
+        return f"nextval('{sequence}')"
+
+    def commit(self):
+        self.conn.commit()
+        self.conn.begin()
+
+    def rollback(self):
+        self.conn.rollback()
+        self.conn.begin()
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.commit()
+        super().close()
+
+
+WAREHOUSES = {'snowflake': SnowflakeWarehouse, 'duckdb': DuckDBWarehouse}
+
+
+class FleetLogixETL:
+    def __init__(self, chunk_size: int = EXTRACT_CHUNK_SIZE, backfill_days: int = ETL_BACKFILL_DAYS,
+                 state_file: str = ETL_STATE_FILE, stage_dir: str = ETL_STAGE_DIR,
+                 warehouse: str = ETL_WAREHOUSE, pipelined: bool = False, queue_size: int = ETL_QUEUE_SIZE,
+                 transform_workers: int = ETL_TRANSFORM_WORKERS, arrow: bool = False,
+                 cdc_batch_seconds: float = CDC_BATCH_SECONDS, quality: str = ETL_QUALITY):
         """ Inicializa el estado del ETL, contadores de métricas y carga de seguridad """
         self.pg_conn = None
-        self.sf_conn = None
+        self.warehouse = None
+        self.warehouse_name = warehouse
+        # Modo pipeline: extracción, transformación y carga concurrentes unidas por colas acotadas
+        self.pipelined = pipelined
+        self.queue_size = queue_size
+        # Pool de procesos de la transformación (se crea al primer bloque que lo necesite)
+        self.transform_workers = transform_workers
+        self._transform_pool = None
+        # Ruta Arrow: COPY -> record batches -> pyarrow.compute -> Parquet
+        self.arrow = arrow
+        # Modo CDC: micro-batches desde el slot de replicación lógica (los hechos se reemplazan siempre)
+        self.cdc = False
+        self.cdc_batch_seconds = cdc_batch_seconds
         self.batch_id = int(datetime.now().timestamp())
+        self.chunk_size = chunk_size
+        self.backfill_days = backfill_days
+        self.state_file = state_file
+        self.stage_dir = stage_dir
+        self._stage_part = 0
+        # Marca de agua de la ejecución anterior y la que alcanza este batch
+        self.state = self.load_state()
+        self.watermark = dict(self.state['watermark'])
+        # Checkpoint de un batch que no terminó: se retoma con su batch_id tras el último bloque cargado
+        self.checkpoint = self.state.get('checkpoint')
+        if self.checkpoint:
+            self.batch_id = self.checkpoint['batch_id']
+            self.watermark = dict(self.checkpoint['watermark'])
+            self._stage_part = len(self.checkpoint['chunks'])
+            logging.info(f" Retomando batch {self.batch_id} desde trip_id > {self.checkpoint['last_trip_id']} "
+                         f"({len(self.checkpoint['chunks'])} bloques ya cargados)")
         self.metrics = {
             'records_extracted': 0,
             'records_transformed': 0,
             'records_loaded': 0,
-            'errors': 0
+            'errors': 0,
+            'unknown_keys': {dim: 0 for dim in DIMENSION_KEYS},
+            'dimension_changes': {dim: {'new': 0, 'changed': 0} for dim in DIMENSION_SOURCES},
+            # Rendimiento por etapa (bloques, filas, segundos de trabajo) y ocupación de las colas del pipeline
+            'stages': {stage: {'chunks': 0, 'rows': 0, 'seconds': 0.0} for stage in ('extract', 'transform', 'load')},
+            'queue_depth': {}
         }
+        # Mapas llave natural -> surrogate key por dimensión (cache de toda la corrida) y última SK leída
+        self.key_maps = {dim: pd.Series(dtype='int64') for dim in DIMENSION_KEYS}
+        self._key_marks = {dim: 0 for dim in DIMENSION_KEYS}
+        # Cache local de hashes ya cargados por dimensión (llave natural -> hash) y la SK máxima que la valida
+        self.dimension_cache_file = f"{os.path.splitext(state_file)[0]}_dimensions.json"
+        self.dim_hashes = None
+        self._dim_cache_marks = {}
+        # Reglas de calidad (A1-02) por bloque y su reporte JSON junto al archivo de estado
+        self.quality_mode = quality
+        self.quality = data_quality.DataQualityEngine() if quality != 'off' else None
+        self.quality_report_file = f"{os.path.splitext(state_file)[0]}_quality.json"
         
         # Cargar llave privada en formato DER para autenticación segura en Snowflake
+        self.private_key = None
+        if warehouse != 'snowflake':
+            return
         try:
             with open('snowflake_key.der', 'rb') as key_file:
                 self.private_key = key_file.read()
@@ -71,16 +784,18 @@ class FleetLogixETL:
             self.private_key = None
     
     def connect_databases(self):
-        """ Establece las conexiones físicas con los motores origen (Postgres) y destino (Snowflake) """
+        """ Establece las conexiones físicas con el motor origen (Postgres) y el warehouse destino """
         try:
             # Conexión a la base de datos transaccional de PostgreSQL
             self.pg_conn = psycopg2.connect(**POSTGRES_CONFIG)
             logging.info(" Conectado a PostgreSQL")
             
-            # Conexión al Data Warehouse (Destino) usando la llave privada cargada
-            SNOWFLAKE_CONFIG['private_key'] = self.private_key
-            self.sf_conn = snowflake.connector.connect(**SNOWFLAKE_CONFIG)
-            logging.info(" Conectado a Snowflake")
+            # Conexión al Data Warehouse (Destino) elegido
+            if self.warehouse_name == 'snowflake':
+                self.warehouse = SnowflakeWarehouse(SNOWFLAKE_CONFIG, self.private_key)
+            else:
+                self.warehouse = WAREHOUSES[self.warehouse_name]()
+            self.warehouse.connect()
             
             return True
         except Exception as e:
@@ -90,23 +805,9 @@ class FleetLogixETL:
     def extract_daily_data(self) -> pd.DataFrame:
         """ Ejecuta la extracción masiva uniendo tablas de envíos, viajes, vehículos, conductores y rutas """
         logging.info(" Extrayendo datos de PostgreSQL...")
-        query = """
-        SELECT 
-            d.delivery_id, d.tracking_number, d.customer_name, d.delivery_address, 
-            d.package_weight_kg, d.scheduled_datetime, d.delivered_datetime, d.delivery_status,
-            t.trip_id, t.fuel_consumed_liters, t.departure_datetime, t.arrival_datetime,
-            v.vehicle_id, v.license_plate, v.vehicle_type, v.capacity_kg, v.fuel_type,
-            dr.driver_id, dr.employee_code, (dr.first_name || ' ' || dr.last_name) AS full_name,
-            r.route_id, r.route_code, r.origin_city, r.destination_city, r.distance_km, r.toll_cost
-        FROM public.deliveries d
-        JOIN public.trips t ON d.trip_id = t.trip_id
-        JOIN public.vehicles v ON t.vehicle_id = v.vehicle_id
-        JOIN public.drivers dr ON t.driver_id = dr.driver_id
-        JOIN public.routes r ON t.route_id = r.route_id;
-        """
         try:
             # Carga el resultado de la query directamente en un DataFrame de Pandas
-            df = pd.read_sql(query, self.pg_conn)
+            df = pd.read_sql(EXTRACT_QUERY.format(where=''), self.pg_conn)
             self.metrics['records_extracted'] = len(df)
             logging.info(f" Extraídos {len(df)} registros")
             return df
@@ -115,219 +816,1013 @@ class FleetLogixETL:
             self.metrics['errors'] += 1
             return pd.DataFrame()
 
+    def extract_chunks(self) -> Iterator[pd.DataFrame]:
+        """ Extracción incremental en streaming con un cursor del lado del servidor: entrega DataFrames de
+        ~chunk_size filas con los viajes que tienen entregas nuevas o modificadas desde la marca de agua.
+        Los viajes nunca quedan partidos entre dos bloques """
+        since = self._delivered_since()
+        logging.info(f" Extrayendo datos de PostgreSQL en bloques de {self.chunk_size} "
+                     f"(delivery_id > {self.state['watermark']['last_delivery_id']}, entregadas después de {since})...")
+        # Cursor con nombre: PostgreSQL mantiene el resultado y lo envía de a itersize filas
+        cursor = self.pg_conn.cursor(name=f"etl_extract_{self.batch_id}")
+        cursor.itersize = self.chunk_size
+        try:
+            cursor.execute(EXTRACT_QUERY.format(where=INCREMENTAL_FILTER), self._extract_params(since))
+            pending = pd.DataFrame()
+            while True:
+                rows = cursor.fetchmany(self.chunk_size)
+                if not rows:
+                    break
+                columns = [c[0] for c in cursor.description]
+                chunk = pd.DataFrame.from_records(rows, columns=columns, coerce_float=True)
+                if not pending.empty:
+                    chunk = pd.concat([pending, chunk], ignore_index=True)
+                
+                # Retener las filas del último viaje para el siguiente bloque (deliveries_in_trip completo)
+                last_trip = chunk['trip_id'].iat[-1]
+                tail = (chunk['trip_id'] == last_trip).to_numpy()
+                if tail.all():
+                    pending = chunk
+                    continue
+                pending = chunk[tail].reset_index(drop=True)
+                chunk = chunk[~tail].reset_index(drop=True)
+                
+                self.metrics['records_extracted'] += len(chunk)
+                self._advance_watermark(chunk)
+                logging.info(f" -> Bloque extraído: {len(chunk)} registros ({self.metrics['records_extracted']} acumulados)")
+                yield chunk
+            
+            if not pending.empty:
+                self.metrics['records_extracted'] += len(pending)
+                self._advance_watermark(pending)
+                yield pending
+            logging.info(f" Extraídos {self.metrics['records_extracted']} registros")
+        except Exception as e:
+            logging.error(f" Error en extracción: {e}")
+            self.metrics['errors'] += 1
+        finally:
+            cursor.close()
+
+    def extract_arrow_chunks(self) -> Iterator['pa.Table']:
+        """ Extracción incremental por COPY ... TO STDOUT: el CSV del servidor se lee por un pipe con el lector
+        en streaming de pyarrow (tipos fijos, sin filas Python) y se entrega en tablas Arrow de ~chunk_size
+        filas, sin partir viajes entre bloques """
+        if pa is None:
+            raise ImportError("pyarrow no está instalado (requerido por la ruta Arrow)")
+        since = self._delivered_since()
+        logging.info(f" Extrayendo datos de PostgreSQL vía COPY -> Arrow en bloques de {self.chunk_size}...")
+        cursor = self.pg_conn.cursor()
+        query = cursor.mogrify(EXTRACT_QUERY.format(where=INCREMENTAL_FILTER), self._extract_params(since)).decode()
+        
+        # El COPY escribe en un pipe desde un hilo mientras pyarrow lo consume: memoria acotada al bloque
+        read_fd, write_fd = os.pipe()
+        copy_errors = []
+
+        def copy_out():
+            try:
+                with os.fdopen(write_fd, 'wb') as sink:
+                    cursor.copy_expert(f"COPY ({query}) TO STDOUT WITH (FORMAT csv, HEADER true)", sink)
+            except Exception as e:
+                copy_errors.append(e)
+
+        writer = threading.Thread(target=copy_out, name='etl-copy', daemon=True)
+        writer.start()
+        try:
+            with os.fdopen(read_fd, 'rb') as source:
+                reader = pa_csv.open_csv(
+                    source,
+                    read_options=pa_csv.ReadOptions(block_size=8 << 20),
+                    convert_options=pa_csv.ConvertOptions(
+                        column_types={c: pa.type_for_alias(t) for c, t in EXTRACT_ARROW_TYPES.items()},
+                        strings_can_be_null=True, quoted_strings_can_be_null=False
+                    )
+                )
+                pending = []
+                pending_rows = 0
+                for batch in reader:
+                    pending.append(batch)
+                    pending_rows += batch.num_rows
+                    if pending_rows < self.chunk_size:
+                        continue
+                    table = pa.Table.from_batches(pending)
+                    # Retener las filas del último viaje para el siguiente bloque (deliveries_in_trip completo)
+                    cut = pc.index(table['trip_id'], table['trip_id'][-1]).as_py()
+                    if cut == 0:
+                        continue
+                    pending = table.slice(cut).to_batches()
+                    pending_rows = table.num_rows - cut
+                    yield self._arrow_chunk(table.slice(0, cut))
+                if pending_rows:
+                    yield self._arrow_chunk(pa.Table.from_batches(pending))
+        finally:
+            writer.join()
+            cursor.close()
+        if copy_errors:
+            raise copy_errors[0]
+        logging.info(f" Extraídos {self.metrics['records_extracted']} registros")
+
+    def _arrow_chunk(self, table: 'pa.Table') -> 'pa.Table':
+        """ Contabiliza un bloque Arrow extraído y avanza la marca de agua con sus máximos """
+        self.metrics['records_extracted'] += table.num_rows
+        self._advance_watermark(table.select(['delivery_id', 'delivered_datetime']).to_pandas(types_mapper=pd.ArrowDtype))
+        logging.info(f" -> Bloque Arrow extraído: {table.num_rows} registros ({self.metrics['records_extracted']} acumulados)")
+        return table
+
+    def _extract_params(self, since) -> Dict:
+        """ Parámetros de INCREMENTAL_FILTER para este batch (o para el resto de un batch retomado) """
+        last_delivery_id = self.state['watermark']['last_delivery_id']
+        scheduled_since, departure_since = partition_bounds(self.pg_conn, last_delivery_id, since)
+        return {
+            'last_delivery_id': last_delivery_id,
+            'delivered_since': since,
+            'after_trip_id': self.checkpoint['last_trip_id'] if self.checkpoint else 0,
+            'scheduled_since': scheduled_since,
+            'departure_since': departure_since
+        }
+
+    def load_state(self) -> Dict:
+        """ Lee la marca de agua persistida; sin archivo de estado se parte de una carga completa """
+        state = {'watermark': {'last_delivery_id': 0, 'last_delivered_datetime': None}, 'batches': [], 'checkpoint': None}
+        try:
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                state.update(json.load(f))
+        except FileNotFoundError:
+            logging.info(f" Sin estado previo en {self.state_file}: se extraerá el histórico completo")
+        return state
+
+    def save_state(self):
+        """ Persiste la nueva marca de agua, la registra contra el batch_id que la alcanzó y cierra su checkpoint """
+        chunks = self.checkpoint['chunks'] if self.checkpoint else []
+        self.state['watermark'] = self.watermark
+        self.state['batches'].append({
+            'batch_id': self.batch_id,
+            'run_date': datetime.now().isoformat(),
+            # Un batch retomado suma lo cargado antes del fallo
+            'records_loaded': sum(c['rows'] for c in chunks) if chunks else self.metrics['records_loaded'],
+            'chunks': len(chunks),
+            **self.watermark
+        })
+        self.checkpoint = None
+        self.state['checkpoint'] = None
+        self._write_state()
+        logging.info(f" Marca de agua guardada: {self.watermark}")
+
+    def save_checkpoint(self, df: pd.DataFrame):
+        """ Registra un bloque cargado y confirmado: rango de viajes, filas y la marca de agua que alcanza lo
+        ya cargado. Los bloques llegan ordenados por trip_id, así que todo viaje <= last_trip_id está cargado.
+        Tras el primer error el checkpoint se congela para no saltar el bloque fallido """
+        if self.cdc or self.metrics['errors'] > 0:
+            return
+        if self.checkpoint is None:
+            since = self._delivered_since()
+            self.checkpoint = {
+                'batch_id': self.batch_id,
+                'delivered_since': since.isoformat() if since else None,
+                'last_trip_id': 0,
+                'watermark': dict(self.state['watermark']),
+                'chunks': []
+            }
+        first_trip, last_trip = int(df['trip_id'].min()), int(df['trip_id'].max())
+        self._advance_watermark(df, self.checkpoint['watermark'])
+        self.checkpoint['last_trip_id'] = last_trip
+        self.checkpoint['chunks'].append({
+            'first_trip_id': first_trip,
+            'last_trip_id': last_trip,
+            'rows': len(df),
+            'loaded_at': datetime.now().isoformat()
+        })
+        self.state['checkpoint'] = self.checkpoint
+        self._write_state()
+
+    def _write_state(self):
+        # Escritura atómica para no dejar un estado corrupto si el proceso se interrumpe
+        tmp_file = f"{self.state_file}.tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(self.state, f, indent=2)
+        os.replace(tmp_file, self.state_file)
+
+    def _delivered_since(self):
+        """ Límite de delivered_datetime para detectar cambios, retrocedido backfill_days para reprocesar.
+        Un batch retomado conserva el límite con el que empezó """
+        if self.checkpoint:
+            since = self.checkpoint['delivered_since']
+            return datetime.fromisoformat(since) if since else None
+        last_delivered = self.state['watermark']['last_delivered_datetime']
+        if last_delivered is None:
+            return None
+        return datetime.fromisoformat(last_delivered) - timedelta(days=self.backfill_days)
+
+    def _advance_watermark(self, df: pd.DataFrame, watermark: Dict = None):
+        """ Avanza la marca de agua (la del batch o la indicada) con el máximo delivery_id y delivered_datetime """
+        watermark = self.watermark if watermark is None else watermark
+        watermark['last_delivery_id'] = max(watermark['last_delivery_id'], int(df['delivery_id'].max()))
+        last_delivered = pd.to_datetime(df['delivered_datetime']).max()
+        if pd.notna(last_delivered):
+            current = watermark['last_delivered_datetime']
+            candidate = last_delivered.to_pydatetime().isoformat()
+            if current is None or candidate > current:
+                watermark['last_delivered_datetime'] = candidate
+
     def transform_data(self, df: pd.DataFrame) -> pd.DataFrame:
         """ Aplica limpieza, lógica de negocio y cálculos de rendimiento de forma vectorizada """
 
         logging.info(" Transformando datos (Pandas Vectorized)...")
         try:
-            # Normalización de tipos de datos a fechas para cálculos temporales
-            for col in ['scheduled_datetime', 'delivered_datetime', 'departure_datetime', 'arrival_datetime']:
-                df[col] = pd.to_datetime(df[col], errors='coerce')
-
-            # Cálculo de KPIs de tiempo de entrega y retrasos
-            df['delivery_time_minutes'] = ((df['delivered_datetime'] - df['scheduled_datetime']).dt.total_seconds() / 60).round(2)
-            df['delay_minutes'] = df['delivery_time_minutes'].clip(lower=0).fillna(0)
-            df['is_on_time'] = df['delay_minutes'] <= 30
+            # Bloques Arrow: cómputo nativo y entrega al cargador como DataFrame respaldado por Arrow (sin copias)
+            if pa is not None and isinstance(df, pa.Table):
+                df = transform_table(df).to_pandas(types_mapper=pd.ArrowDtype)
+            # Bloques grandes se reparten por viaje entre procesos; los pequeños no compensan el envío
+            elif self.transform_workers > 1 and len(df) >= self.transform_workers * PARALLEL_MIN_ROWS:
+                df = self._transform_parallel(df)
+            else:
+                df = transform_frame(df)
             
-            # Cálculo de duración de viajes para métricas de eficiencia
-            df['trip_duration_hours'] = ((df['arrival_datetime'] - df['departure_datetime']).dt.total_seconds() / 3600).round(2)
-            df.loc[df['trip_duration_hours'] <= 0, 'trip_duration_hours'] = np.nan
-
-            # Agregación vectorizada para determinar cuántas entregas se hicieron por hora de viaje
-            deliveries_per_trip = df.groupby('trip_id').size()
-            df['deliveries_in_trip'] = df['trip_id'].map(deliveries_per_trip)
-            df['deliveries_per_hour'] = (df['deliveries_in_trip'] / df['trip_duration_hours']).fillna(0).round(2)
-            
-            # Cálculos financieros y operativos: eficiencia de combustible, costos y utilidades
-            df['fuel_efficiency_km_per_liter'] = (df['distance_km'] / df['fuel_consumed_liters']).replace([np.inf, -np.inf], 0).fillna(0).round(2)
-            df['cost_per_delivery'] = ((df['fuel_consumed_liters'].fillna(0) * 5000 + df['toll_cost'].fillna(0)) / df['deliveries_in_trip']).round(2)
-            df['revenue_per_delivery'] = (20000 + df['package_weight_kg'] * 500).round(2)
-
-            # Limpieza de valores extremos o erróneos en el peso del paquete
-            df = df[(df['package_weight_kg'] > 0) & (df['package_weight_kg'] < 10000)].copy()
-            
-            # Generación de llaves inteligentes (Smart Keys) para dimensiones de fecha y hora en el Warehouse
-            df['date_key'] = df['scheduled_datetime'].dt.strftime('%Y%m%d').fillna(0).astype(int)
-            df['scheduled_time_key'] = (df['scheduled_datetime'].dt.hour * 10000 + df['scheduled_datetime'].dt.minute * 100).fillna(0).astype(int)
-            
-            self.metrics['records_transformed'] = len(df)
+            self.metrics['records_transformed'] += len(df)
             return df
         except Exception as e:
             logging.error(f" Error en transformación: {e}")
             self.metrics['errors'] += 1
             return pd.DataFrame()
 
+    def _transform_parallel(self, df: pd.DataFrame) -> pd.DataFrame:
+        """ Transforma particiones contiguas por trip_id en el pool de procesos y las reúne en orden,
+        con el mismo resultado (filas, índice y valores) que transform_frame sobre el bloque completo """
+        if self._transform_pool is None:
+            self._transform_pool = ProcessPoolExecutor(max_workers=self.transform_workers)
+        parts = split_by_trip(df, self.transform_workers)
+        return pd.concat(self._transform_pool.map(transform_frame, parts))
+
     def load_dimensions(self, df: pd.DataFrame):
-        """ Carga las tablas de dimensiones utilizando tablas temporales de STAGING y comandos MERGE """
+        """ Sincroniza dim_customer con los clientes nuevos del bloque (con la primera ciudad de destino).
+        Vehículos, conductores y rutas se sincronizan desde sus tablas maestras en sync_dimensions """
+        customers = df[['customer_name', 'destination_city']].drop_duplicates('customer_name')
+        customers = customers.rename(columns={'destination_city': 'city'}).reset_index(drop=True)
+        customers['customer_type'] = 'Individual'
+        customers['first_delivery_date'] = datetime.now().date()
+        customers['total_deliveries'] = 1
+        customers['customer_category'] = 'Regular'
+        self.sync_dimension('customer', customers)
 
-        logging.info(" Sincronizando dimensiones (Bulk Write + Merge)...")
-        cursor = self.sf_conn.cursor()
-        try:
-            # --- PROCESAMIENTO DE CLIENTES ---
-            # Extrae clientes únicos para evitar procesar duplicados innecesarios
-            cust_df = df[['customer_name', 'destination_city']].drop_duplicates().copy()
-            cust_df.columns = ['CUSTOMER_NAME', 'CITY']
-            cust_df['CUSTOMER_TYPE'] = 'Individual'
-            cust_df['FIRST_DELIVERY_DATE'] = datetime.now().date()
-            cust_df['TOTAL_DELIVERIES'] = 1
-            cust_df['CUSTOMER_CATEGORY'] = 'Regular'
-
-            # Sube el DataFrame a una tabla temporal en Snowflake optimizada para carga masiva
-            write_pandas(self.sf_conn, cust_df, "STG_CUSTOMERS", auto_create_table=True, table_type="temp")
-            # Actualiza o inserta registros de clientes usando la tabla de Staging
-            cursor.execute("""
-                MERGE INTO dim_customer c USING STG_CUSTOMERS s ON c.customer_name = s.CUSTOMER_NAME
-                WHEN NOT MATCHED THEN INSERT (customer_key, customer_name, customer_type, city, first_delivery_date, total_deliveries, customer_category)
-                VALUES (seq_customer_key.NEXTVAL, s.CUSTOMER_NAME, s.CUSTOMER_TYPE, s.CITY, s.FIRST_DELIVERY_DATE, s.TOTAL_DELIVERIES, s.CUSTOMER_CATEGORY);
-            """)
+    def sync_dimensions(self):
+        """ Sincroniza vehículos, conductores y rutas desde las tablas maestras de PostgreSQL. Solo los
+        miembros nuevos o con atributos distintos al hash en cache pasan por staging y MERGE """
+        logging.info(" Sincronizando dimensiones maestras (detección de cambios por hash)...")
+        for dim, spec in DIMENSION_SOURCES.items():
+            if spec['query'] is None:
+                continue
+            try:
+                with self.pg_conn.cursor() as cursor:
+                    cursor.execute(spec['query'])
+                    columns = [c[0] for c in cursor.description]
+                    members = pd.DataFrame.from_records(cursor.fetchall(), columns=columns)
+                self.pg_conn.rollback()
+            except Exception as e:
+                logging.error(f" Error leyendo la tabla maestra de {dim}: {e}")
+                self.pg_conn.rollback()
+                self.metrics['errors'] += 1
+                continue
+            if dim == 'vehicle':
+                members['age_months'] = months_since(members['acquisition_date'])
+            elif dim == 'driver':
+                members['experience_months'] = months_since(members['hire_date'])
+            self.sync_dimension(dim, members)
 
-            # --- PROCESAMIENTO DE VEHÍCULOS ---
-            # Similar a clientes, deduce vehículos únicos y sincroniza con la dimensión correspondiente
-            v_df = df[['vehicle_id', 'license_plate', 'vehicle_type', 'capacity_kg', 'fuel_type']].drop_duplicates().copy()
-            v_df.columns = [c.upper() for c in v_df.columns]
-            write_pandas(self.sf_conn, v_df, "STG_VEHICLES", auto_create_table=True, table_type="temp")
-            cursor.execute("""
-                MERGE INTO dim_vehicle v USING STG_VEHICLES s ON v.license_plate = s.LICENSE_PLATE
-                WHEN NOT MATCHED THEN INSERT (vehicle_key, vehicle_id, license_plate, vehicle_type, capacity_kg, fuel_type, status, is_current, valid_from)
-                VALUES (seq_vehicle_key.NEXTVAL, s.VEHICLE_ID, s.LICENSE_PLATE, s.VEHICLE_TYPE, s.CAPACITY_KG, s.FUEL_TYPE, 'active', TRUE, CURRENT_DATE());
-            """)
-            self.sf_conn.commit()
+    def sync_dimension(self, dim: str, members: pd.DataFrame):
+        """ Compara el hash de atributos de cada miembro con la cache local y aplica solo el delta:
+        SCD1 actualiza en sitio (MERGE); SCD2 cierra la versión vigente y agrega una nueva """
+        table, natural_key, surrogate_key, _, _ = DIMENSION_KEYS[dim]
+        spec = DIMENSION_SOURCES[dim]
+        if self.dim_hashes is None:
+            self.load_dimension_cache()
+
+        hashes = row_hashes(members, [natural_key] + spec['attributes'])
+        cache = self.dim_hashes[dim]
+        positions = cache.index.get_indexer(members[natural_key])
+        is_new = positions < 0
+        # Igual que en resolve_keys, la posición -1 cae en un centinela final (la cache puede estar vacía)
+        is_changed = ~is_new & (np.append(cache.to_numpy(), 0)[positions] != hashes)
+        delta_mask = is_new | is_changed
+        if not delta_mask.any():
+            return
+
+        delta = members.loc[delta_mask, [natural_key] + spec['attributes'] + spec['insert_only']].copy()
+        delta['row_hash'] = hashes[delta_mask]
+        delta.columns = [c.upper() for c in delta.columns]
+        stg_table = f"STG_DIM_{dim.upper()}"
+        wh = self.warehouse
+        try:
+            wh.write_frame(delta, stg_table)
+            for sql in self._dimension_sync_sql(dim, stg_table):
+                wh.execute(sql)
+            wh.commit()
         except Exception as e:
-            logging.error(f" Error cargando dimensiones: {e}")
-            self.sf_conn.rollback()
+            logging.error(f" Error sincronizando {table}: {e}")
+            wh.rollback()
             self.metrics['errors'] += 1
+            return
 
-        
+        updated = pd.Series(hashes[delta_mask], index=members.loc[delta_mask, natural_key].to_numpy(), dtype='int64')
+        combined = pd.concat([cache, updated])
+        self.dim_hashes[dim] = combined[~combined.index.duplicated(keep='last')]
+        self._dim_cache_marks[dim] = wh.execute(f"SELECT MAX({surrogate_key}) FROM {table}").fetchone()[0]
+        self.metrics['dimension_changes'][dim]['new'] += int(is_new.sum())
+        self.metrics['dimension_changes'][dim]['changed'] += int(is_changed.sum())
+        logging.info(f" -> {table}: {int(is_new.sum())} nuevos, {int(is_changed.sum())} modificados (SCD{spec['scd']})")
+        self.save_dimension_cache()
+
+    def _dimension_sync_sql(self, dim: str, stg_table: str) -> List[str]:
+        """ Sentencias que aplican el delta de una dimensión desde su tabla de staging """
+        table, natural_key, surrogate_key, _, _ = DIMENSION_KEYS[dim]
+        spec = DIMENSION_SOURCES[dim]
+        nk = natural_key.upper()
+        tracked = spec['attributes'] + ['row_hash']
+        inserted = [natural_key] + spec['attributes'] + spec['insert_only'] + ['row_hash']
+        nextval = self.warehouse.nextval(f"seq_{surrogate_key}")
+
+        if spec['scd'] == 1:
+            return [f"""
+                MERGE INTO {table} d USING {stg_table} s ON d.{natural_key} = s.{nk} AND d.{surrogate_key} <> {UNKNOWN_KEY}
+                WHEN MATCHED THEN UPDATE SET {', '.join(f'{c} = s.{c.upper()}' for c in tracked)}
+                WHEN NOT MATCHED THEN INSERT ({surrogate_key}, {', '.join(inserted)})
+                VALUES ({nextval}, {', '.join(f's.{c.upper()}' for c in inserted)})
+            """]
+
+        # El miembro desconocido queda fuera del versionado aunque una llave natural coincida con la suya
+        current = (f"{table}.{natural_key} = s.{nk} AND {table}.is_current = TRUE "
+                   f"AND {table}.{surrogate_key} <> {UNKNOWN_KEY}")
+        return [
+            # Filas cargadas antes de la detección por hash (row_hash nulo): se adoptan sin versionar
+            f"""UPDATE {table} SET {', '.join(f'{c} = s.{c.upper()}' for c in tracked)}
+                FROM {stg_table} s WHERE {current} AND {table}.row_hash IS NULL""",
+            # Cierra la versión vigente de los miembros cuyos atributos cambiaron
+            f"""UPDATE {table} SET valid_to = CURRENT_DATE, is_current = FALSE
+                FROM {stg_table} s WHERE {current} AND {table}.row_hash <> s.ROW_HASH""",
+            # Nueva versión vigente para miembros nuevos o recién cerrados
+            f"""INSERT INTO {table} ({surrogate_key}, {', '.join(inserted)}, valid_from, valid_to, is_current)
+                SELECT {nextval}, {', '.join(f's.{c.upper()}' for c in inserted)}, CURRENT_DATE, NULL, TRUE
+                FROM {stg_table} s
+                WHERE NOT EXISTS (SELECT 1 FROM {table} d WHERE d.{natural_key} = s.{nk} AND d.is_current = TRUE
+                                  AND d.{surrogate_key} <> {UNKNOWN_KEY})"""
+        ]
+
+    def load_dimension_cache(self):
+        """ Carga la cache local de hashes. Cada dimensión se valida contra la SK máxima del warehouse: si
+        no coincide (otro proceso cargó o el warehouse se recreó) se reconstruye desde row_hash """
+        saved = {}
+        try:
+            with open(self.dimension_cache_file, 'r', encoding='utf-8') as f:
+                saved = json.load(f)
+        except FileNotFoundError:
+            pass
+        self.dim_hashes = {}
+        for dim, (table, natural_key, surrogate_key, _, current_filter) in DIMENSION_KEYS.items():
+            max_key = self.warehouse.execute(f"SELECT MAX({surrogate_key}) FROM {table}").fetchone()[0]
+            entry = saved.get(dim)
+            if entry is not None and entry['max_key'] == max_key:
+                keys, values = zip(*entry['hashes']) if entry['hashes'] else ((), ())
+                self.dim_hashes[dim] = pd.Series(values, index=list(keys), dtype='int64')
+            else:
+                where = "row_hash IS NOT NULL" + (f" AND {current_filter}" if current_filter else "")
+                rows = self.warehouse.execute(f"SELECT {natural_key}, row_hash FROM {table} WHERE {where}").fetchall()
+                cache = pd.Series([r[1] for r in rows], index=[r[0] for r in rows], dtype='int64')
+                self.dim_hashes[dim] = cache[~cache.index.duplicated(keep='last')]
+                logging.info(f" Cache de hashes de {table} reconstruida desde el warehouse ({len(rows)} miembros)")
+            self._dim_cache_marks[dim] = max_key
+
+    def save_dimension_cache(self):
+        """ Persiste la cache de hashes con la SK máxima de cada dimensión (escritura atómica) """
+        cache = {
+            dim: {
+                'max_key': self._dim_cache_marks[dim],
+                'hashes': [[k.item() if hasattr(k, 'item') else k, int(h)] for k, h in hashes.items()]
+            }
+            for dim, hashes in self.dim_hashes.items()
+        }
+        tmp_file = f"{self.dimension_cache_file}.tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(cache, f)
+        os.replace(tmp_file, self.dimension_cache_file)
 
     def load_facts(self, df: pd.DataFrame):
-        """ Prepara y carga la tabla de hechos utilizando mapeos en memoria y cargas por lotes (Chunks) """
-        logging.info(f" Cargando {len(df)} hechos por lotes...")
-        cursor = self.sf_conn.cursor()
+        """ Prepara la tabla de hechos con mapeos vectorizados, la escribe como archivo Parquet comprimido
+        en el stage local y la ingiere en bloque en el warehouse (PUT + COPY INTO en Snowflake) """
+        logging.info(f" Cargando {len(df)} hechos vía stage Parquet...")
+        start = time.perf_counter()
+        wh = self.warehouse
         try:
-            # Carga mapeos de nombres/IDs naturales a Surrogated Keys (SK) para evitar JOINs costosos durante la carga
-            cursor.execute("SELECT customer_name, customer_key FROM dim_customer")
-            c_map = dict(cursor.fetchall())
-            cursor.execute("SELECT driver_id, driver_key FROM dim_driver WHERE is_current=True")
-            d_map = dict(cursor.fetchall())
-            cursor.execute("SELECT vehicle_id, vehicle_key FROM dim_vehicle WHERE is_current=True")
-            v_map = dict(cursor.fetchall())
+            # Trae solo los miembros nuevos de cada dimensión; el resto ya está en la cache de la corrida
+            self.refresh_key_maps()
+            
+            fact_df = self._build_fact_frame(df)
+            stage_file = self._stage_facts(fact_df)
+            # Las llaves del bloque acotan el delta de los rollups; se suben antes de cualquier DML
+            self._stage_fact_keys(df['delivery_id'])
             
-            # Transforma el DataFrame en una lista de tuplas lista para el comando executemany
-            fact_data = []
-            for r in df.to_dict('records'):
-                fact_data.append((
-                    r['date_key'], r['scheduled_time_key'], 
-                    v_map.get(r['vehicle_id'], 1), d_map.get(r['driver_id'], 1), 
-                    1, c_map.get(r['customer_name'], 1),
-                    r['delivery_id'], r['trip_id'], r['tracking_number'],
-                    r['package_weight_kg'], r['distance_km'], r['fuel_consumed_liters'],
-                    r['delivery_time_minutes'], r['delay_minutes'],
-                    r['deliveries_per_hour'], r['fuel_efficiency_km_per_liter'],
-                    r['cost_per_delivery'], r['revenue_per_delivery'],
-                    int(r['is_on_time']), r['delivery_status'], self.batch_id
-                ))
-
-            # Definición del SQL de inserción con el orden exacto de la tabla de hechos
-            sql = """INSERT INTO fact_deliveries (
-                        date_key, scheduled_time_key, vehicle_key, driver_key, route_key, customer_key, 
-                        delivery_id, trip_id, tracking_number, package_weight_kg, distance_km, fuel_consumed_liters, 
-                        delivery_time_minutes, delay_minutes, deliveries_per_hour, fuel_efficiency_km_per_liter, 
-                        cost_per_delivery, revenue_per_delivery, is_on_time, delivery_status, etl_batch_id
-                    ) VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s)"""
-            # Envío de datos en lotes de 15,000 registros para optimizar el uso de red y memoria de Snowflake
-            chunk_size = 15000
-            for i in range(0, len(fact_data), chunk_size):
-                cursor.executemany(sql, fact_data[i:i+chunk_size])
-                logging.info(f" -> Lote OK: {i+len(fact_data[i:i+chunk_size])}/{len(fact_data)}")
+            # Si los hechos pueden existir ya (carga incremental, CDC, batch retomado o bloques de un intento
+            # fallido) se reemplazan por delivery_id (DELETE + INSERT): cargar dos veces no duplica
+            if self.state['watermark']['last_delivery_id'] > 0 or self.cdc or self.checkpoint:
+                self._delete_facts()
             
-            self.sf_conn.commit()
-            self.metrics['records_loaded'] = len(fact_data)
+            wh.copy_parquet('fact_deliveries', stage_file, FACT_COLUMNS)
+            # Los rollups suman el aporte del bloque en la misma transacción que los hechos
+            self._apply_rollup_delta(1)
+            wh.commit()
+            # El archivo ya está ingerido: se borra del stage local (si la carga falla se conserva para revisarlo)
+            os.remove(stage_file)
+            
+            elapsed = time.perf_counter() - start
+            self.metrics['records_loaded'] += len(fact_df)
+            logging.info(f" -> Hechos cargados: {len(fact_df)} en {elapsed:.2f}s "
+                         f"({len(fact_df) / elapsed if elapsed > 0 else 0:,.0f} filas/s) - {stage_file}")
         except Exception as e:
             logging.error(f" Error cargando hechos: {e}")
-            self.sf_conn.rollback()
+            wh.rollback()
             self.metrics['errors'] += 1
+
+    def _stage_fact_keys(self, delivery_ids):
+        """ Sube los delivery_id del bloque a STG_FACT_KEYS """
+        self.warehouse.write_frame(pd.DataFrame({'DELIVERY_ID': pd.Series(delivery_ids).astype('int64')}), "STG_FACT_KEYS")
+
+    def _delete_facts(self, delivery_ids=None):
+        """ Borra los hechos de las entregas indicadas (o de las ya subidas a STG_FACT_KEYS) y descuenta su
+        aporte de los rollups (sin confirmar: la transacción es del llamador) """
+        if delivery_ids is not None:
+            self._stage_fact_keys(delivery_ids)
+        self._apply_rollup_delta(-1)
+        self.warehouse.execute("DELETE FROM fact_deliveries USING STG_FACT_KEYS s WHERE fact_deliveries.delivery_id = s.DELIVERY_ID")
+
+    def _rollup_select(self, table: str, sign: int = 1, keys_only: bool = True) -> str:
+        """ Agrega fact_deliveries al grano del rollup; con keys_only solo las entregas de STG_FACT_KEYS """
+        grain = ROLLUPS[table]
+        columns = [f"{ROLLUP_GRAIN[c][1]} AS {c.upper()}" for c in grain]
+        columns += [f"{sign} * {expr} AS {m.upper()}" for m, (_, expr) in ROLLUP_MEASURES.items()]
+        joins = " JOIN STG_FACT_KEYS k ON f.delivery_id = k.DELIVERY_ID" if keys_only else ""
+        if 'city' in grain:
+            joins += " LEFT JOIN dim_route rt ON rt.route_key = f.route_key"
+        return (f"SELECT {', '.join(columns)} FROM fact_deliveries f{joins} "
+                f"GROUP BY {', '.join(str(i + 1) for i in range(len(grain)))}")
+
+    def _apply_rollup_delta(self, sign: int):
+        """ Suma (sign=1) o resta (sign=-1) a cada rollup el aporte de las entregas de STG_FACT_KEYS.
+        Los grupos que quedan sin entregas se eliminan; una resta nunca inserta grupos nuevos """
+        for table, grain in ROLLUPS.items():
+            on = ' AND '.join(f"t.{c} = s.{c.upper()}" for c in grain)
+            update = ', '.join(f"{m} = t.{m} + s.{m.upper()}" for m in ROLLUP_MEASURES)
+            columns = grain + list(ROLLUP_MEASURES)
+            self.warehouse.execute(f"""
+                MERGE INTO {table} t USING ({self._rollup_select(table, sign)}) s ON {on}
+                WHEN MATCHED AND t.total_deliveries + s.TOTAL_DELIVERIES = 0 THEN DELETE
+                WHEN MATCHED THEN UPDATE SET {update}
+                WHEN NOT MATCHED AND s.TOTAL_DELIVERIES > 0 THEN
+                    INSERT ({', '.join(columns)}) VALUES ({', '.join(f's.{c.upper()}' for c in columns)})
+            """)
+
+    def rebuild_rollups(self, tables: List[str] = None):
+        """ Recalcula por completo los rollups indicados desde fact_deliveries (arranque o reparación) """
+        wh = self.warehouse
+        for table in tables or list(ROLLUPS):
+            start = time.perf_counter()
+            columns = ROLLUPS[table] + list(ROLLUP_MEASURES)
+            wh.execute(f"DELETE FROM {table}")
+            wh.execute(f"INSERT INTO {table} ({', '.join(columns)}) {self._rollup_select(table, keys_only=False)}")
+            wh.commit()
+            rows = wh.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+            logging.info(f" -> Rollup {table} reconstruido: {rows} filas en {time.perf_counter() - start:.2f}s")
+
+    def refresh_key_maps(self):
+        """ Actualiza la cache de llaves con las filas de cada dimensión cuya SK supera la última leída.
+        En SCD2 la versión vigente tiene la SK mayor, así que prevalece sobre la anterior """
+        for dim, (table, natural_key, surrogate_key, _, current_filter) in DIMENSION_KEYS.items():
+            where = f"{surrogate_key} > {int(self._key_marks[dim])}" + (f" AND {current_filter}" if current_filter else "")
+            rows = self.warehouse.execute(f"SELECT {natural_key}, {surrogate_key} FROM {table} WHERE {where}").fetchall()
+            if not rows:
+                continue
+            new_keys = pd.Series([r[1] for r in rows], index=[r[0] for r in rows], dtype='int64')
+            combined = pd.concat([self.key_maps[dim], new_keys]).sort_values(kind='stable')
+            self.key_maps[dim] = combined[~combined.index.duplicated(keep='last')]
+            self._key_marks[dim] = int(new_keys.max())
+
+    def resolve_keys(self, df: pd.DataFrame) -> Dict[str, np.ndarray]:
+        """ Resuelve todas las Surrogate Keys del bloque columna a columna (get_indexer sobre el índice hash
+        de cada mapa) y contabiliza los registros que caen en el miembro desconocido """
+        keys = {}
+        for dim, (_, _, surrogate_key, column, _) in DIMENSION_KEYS.items():
+            key_map = self.key_maps[dim]
+            positions = key_map.index.get_indexer(df[column])
+            # La posición -1 (no encontrada) cae en el centinela final: el miembro desconocido
+            keys[surrogate_key] = np.append(key_map.to_numpy(), UNKNOWN_KEY)[positions]
+            self.metrics['unknown_keys'][dim] += int((positions < 0).sum())
+        return keys
+
+    def _build_fact_frame(self, df: pd.DataFrame) -> pd.DataFrame:
+        """ Arma el bloque de hechos con las Surrogate Keys resueltas y las columnas en el orden de la tabla """
+        keys = self.resolve_keys(df)
+        facts = pd.DataFrame({
+            'date_key': df['date_key'].to_numpy(),
+            'scheduled_time_key': df['scheduled_time_key'].to_numpy(),
+            'delivered_time_key': df['delivered_time_key'].array,
+            'vehicle_key': keys['vehicle_key'],
+            'driver_key': keys['driver_key'],
+            'route_key': keys['route_key'],
+            'customer_key': keys['customer_key'],
+        }, index=df.index)
+        for col in FACT_COLUMNS[FACT_COLUMNS.index('delivery_id'):-2]:
+            facts[col] = df[col]
+        facts['is_on_time'] = df['is_on_time'].astype(bool)
+        facts['delivery_status'] = df['delivery_status']
+        facts['etl_batch_id'] = self.batch_id
+        return facts[FACT_COLUMNS]
+
+    def _stage_facts(self, fact_df: pd.DataFrame) -> str:
+        """ Escribe el bloque de hechos como Parquet comprimido en el stage local antes de ingerirlo (load_facts
+        lo borra una vez confirmada la carga) """
+        stage_dir = os.path.join(self.stage_dir, 'fact_deliveries')
+        os.makedirs(stage_dir, exist_ok=True)
+        self._stage_part += 1
+        stage_file = os.path.join(stage_dir, f"batch_{self.batch_id}_part{self._stage_part:05d}.parquet")
+        fact_df.to_parquet(stage_file, compression='zstd', index=False)
+        return stage_file
         
 
     def _calculate_daily_totals(self):
-        """ Genera agregaciones finales directamente en Snowflake para reportes de rendimiento diario """
-        cursor = self.sf_conn.cursor()
+        """ Genera agregaciones finales directamente en el warehouse para reportes de rendimiento diario """
         try:
             # Calcula promedios y sumas del lote actual y los inserta en la tabla de sumario
-            cursor.execute("""
+            self.warehouse.execute(f"""
                 INSERT INTO daily_performance_summary (batch_id, total_deliveries, avg_delay_minutes, total_revenue, fuel_efficiency_avg)
-                SELECT %s, COUNT(*), AVG(delay_minutes), SUM(revenue_per_delivery), AVG(fuel_efficiency_km_per_liter)
-                FROM fact_deliveries WHERE etl_batch_id = %s
-            """, (self.batch_id, self.batch_id))
-            self.sf_conn.commit()
+                SELECT {self.batch_id}, COUNT(*), AVG(delay_minutes), SUM(revenue_per_delivery), AVG(fuel_efficiency_km_per_liter)
+                FROM fact_deliveries WHERE etl_batch_id = {self.batch_id}
+            """)
+            self.warehouse.commit()
         except Exception as e:
             logging.error(f" Error calculando totales: {e}")
     
     def setup_infrastructure(self):
         """ Garantiza que los objetos necesarios (secuencias y tablas de sumario) existan en el Warehouse """
-        cursor = self.sf_conn.cursor()
+        wh = self.warehouse
         logging.info(" Verificando infraestructura de secuencias...")
         try:
-            # Creación de secuencias para la generación automática de Surrogated Keys
-            cursor.execute("CREATE SEQUENCE IF NOT EXISTS seq_customer_key START = 1 INCREMENT = 1")
-            cursor.execute("CREATE SEQUENCE IF NOT EXISTS seq_driver_key START = 1 INCREMENT = 1")
-            cursor.execute("CREATE SEQUENCE IF NOT EXISTS seq_vehicle_key START = 1 INCREMENT = 1")
-            cursor.execute("CREATE SEQUENCE IF NOT EXISTS seq_route_key START = 1 INCREMENT = 1")
+            # Creación de secuencias para la generación automática de Surrogated Keys (sintaxis común a ambos destinos)
+            wh.execute("CREATE SEQUENCE IF NOT EXISTS seq_customer_key START 1 INCREMENT 1")
+            wh.execute("CREATE SEQUENCE IF NOT EXISTS seq_driver_key START 1 INCREMENT 1")
+            wh.execute("CREATE SEQUENCE IF NOT EXISTS seq_vehicle_key START 1 INCREMENT 1")
+            wh.execute("CREATE SEQUENCE IF NOT EXISTS seq_route_key START 1 INCREMENT 1")
+            # Hash de atributos para la detección de cambios (warehouses creados antes de la columna)
+            for table, _, _, _, _ in DIMENSION_KEYS.values():
+                wh.execute(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS row_hash BIGINT")
+            # Miembro desconocido de cada dimensión: sin row_hash y con SK 0, no entra en la cache de hashes ni
+            # en la de llaves (refresh_key_maps lee SK > marca), así que solo lo usa el centinela de resolve_keys
+            for dim, member in UNKNOWN_MEMBERS.items():
+                table, _, surrogate_key, _, _ = DIMENSION_KEYS[dim]
+                columns = [surrogate_key] + list(member)
+                values = [str(UNKNOWN_KEY)] + [f"'{v}'" if isinstance(v, str) else str(v).upper() for v in member.values()]
+                wh.execute(f"""
+                    INSERT INTO {table} ({', '.join(columns)}) SELECT {', '.join(values)}
+                    WHERE NOT EXISTS (SELECT 1 FROM {table} WHERE {surrogate_key} = {UNKNOWN_KEY})
+                """)
             # Creación de la tabla de sumario para KPIs si no ha sido creada previamente
-            cursor.execute("""
+            wh.execute("""
                 CREATE TABLE IF NOT EXISTS daily_performance_summary (
                     batch_id INT,
-                    report_date DATE DEFAULT CURRENT_DATE(),
+                    report_date DATE DEFAULT CURRENT_DATE,
                     total_deliveries INT,
                     avg_delay_minutes DECIMAL(10,2),
                     total_revenue DECIMAL(15,2),
                     fuel_efficiency_avg DECIMAL(10,2)
                 )
             """)
-            self.sf_conn.commit()
+            # Rollups del tablero: grano + medidas aditivas, actualizados por cada carga de hechos. Sin PK: un
+            # reemplazo puede borrar y volver a insertar el mismo grupo en una transacción (DuckDB lo rechaza)
+            for table, grain in ROLLUPS.items():
+                columns = [f"{c} {ROLLUP_GRAIN[c][0]} NOT NULL" for c in grain]
+                columns += [f"{m} {sql_type} NOT NULL" for m, (sql_type, _) in ROLLUP_MEASURES.items()]
+                wh.execute(f"CREATE TABLE IF NOT EXISTS {table} ({', '.join(columns)})")
+            wh.commit()
+            # Un rollup vacío con hechos ya cargados (warehouse previo a los rollups) se construye una vez
+            if wh.execute("SELECT COUNT(*) FROM (SELECT 1 FROM fact_deliveries LIMIT 1) f").fetchone()[0] > 0:
+                empty = [t for t in ROLLUPS if wh.execute(f"SELECT COUNT(*) FROM {t}").fetchone()[0] == 0]
+                if empty:
+                    logging.info(f" Construyendo rollups desde los hechos existentes: {', '.join(empty)}")
+                    self.rebuild_rollups(empty)
         except Exception as e:
             logging.error(f" Error en infraestructura: {e}")
     
     def setup_time_dimension(self):
-        """Genera la dimensión de tiempo directamente en Snowflake si está vacía"""
-        cursor = self.sf_conn.cursor()
+        """Genera la dimensión de tiempo en el warehouse si está vacía"""
+        wh = self.warehouse
         logging.info(" Verificando dimensión de tiempo...")
         
         try:
             # Evita la regeneración de datos si la tabla ya contiene información
-            cursor.execute("SELECT COUNT(*) FROM dim_time")
-            if cursor.fetchone()[0] > 0:
+            if wh.execute("SELECT COUNT(*) FROM dim_time").fetchone()[0] > 0:
                 logging.info(" -> Dimensión de tiempo ya poblada.")
                 return
 
             logging.info(" -> Generando 86,400 registros de tiempo (Bulk Generation)...")
-            # Ejecución de lógica SQL para poblar la dimensión de tiempo con atributos descriptivos (hora, AM/PM, jornada)
-            cursor.execute("""
+            # Se construye en Pandas (independiente del dialecto) y se inserta desde staging
+            wh.write_frame(self._build_time_dimension(), "STG_TIME")
+            wh.execute("""
                 INSERT INTO dim_time (time_key, hour, minute, second, time_of_day, hour_24, am_pm, is_business_hour)
-                SELECT 
-                    (hour(time_val) * 10000 + minute(time_val) * 100 + second(time_val)) as time_key, -- Key predecible HHMMSS
-                    hour(time_val),
-                    minute(time_val),
-                    second(time_val),
-                    CASE 
-                        WHEN hour(time_val) BETWEEN 0 AND 5 THEN 'Madrugada'
-                        WHEN hour(time_val) BETWEEN 6 AND 11 THEN 'Mañana'
-                        WHEN hour(time_val) BETWEEN 12 AND 17 THEN 'Tarde'
-                        ELSE 'Noche'
-                    END,
-                    to_char(time_val, 'HH24:MI'),
-                    to_char(time_val, 'AM'),
-                    CASE WHEN hour(time_val) BETWEEN 8 AND 18 THEN TRUE ELSE FALSE END
-                FROM (
-                    SELECT timeadd(second, seq4(), '00:00:00'::time) as time_val
-                    FROM table(generator(rowcount => 86400))
-                )
+                SELECT TIME_KEY, HOUR, MINUTE, SECOND, TIME_OF_DAY, HOUR_24, AM_PM, IS_BUSINESS_HOUR FROM STG_TIME
             """)
-            self.sf_conn.commit()
+            wh.commit()
             logging.info(" -> Dimensión de tiempo creada exitosamente.")
         except Exception as e:
             logging.error(f" Error creando dimensión de tiempo: {e}")
+
+    def setup_date_dimension(self, start_year: int = DIM_DATE_START_YEAR, end_year: int = DIM_DATE_END_YEAR):
+        """ Puebla dim_date con el calendario completo de los años indicados. Es idempotente: si la tabla ya
+        cubre el rango solo cuesta una consulta; si el rango crece, se insertan solo las fechas faltantes """
+        wh = self.warehouse
+        logging.info(" Verificando dimensión de fecha...")
+        try:
+            expected = (pd.Timestamp(end_year, 12, 31) - pd.Timestamp(start_year, 1, 1)).days + 1
+            first_key, last_key = start_year * 10000 + 101, end_year * 10000 + 1231
+            loaded = wh.execute(f"SELECT COUNT(*) FROM dim_date WHERE date_key BETWEEN {first_key} AND {last_key}").fetchone()[0]
+            if loaded == expected:
+                logging.info(" -> Dimensión de fecha ya poblada.")
+                return
+
+            logging.info(f" -> Generando calendario {start_year}-{end_year} ({expected:,} fechas, con festivos de Colombia)...")
+            wh.write_frame(self._build_date_dimension(start_year, end_year), "STG_DATE")
+            wh.execute("""
+                INSERT INTO dim_date (date_key, full_date, day_of_week, day_name, day_of_month, day_of_year, week_of_year,
+                                      month_num, month_name, quarter, year, is_weekend, is_holiday, holiday_name,
+                                      fiscal_quarter, fiscal_year)
+                SELECT s.DATE_KEY, s.FULL_DATE, s.DAY_OF_WEEK, s.DAY_NAME, s.DAY_OF_MONTH, s.DAY_OF_YEAR, s.WEEK_OF_YEAR,
+                       s.MONTH_NUM, s.MONTH_NAME, s.QUARTER, s.YEAR, s.IS_WEEKEND, s.IS_HOLIDAY, s.HOLIDAY_NAME,
+                       s.FISCAL_QUARTER, s.FISCAL_YEAR
+                FROM STG_DATE s
+                WHERE NOT EXISTS (SELECT 1 FROM dim_date d WHERE d.date_key = s.DATE_KEY)
+            """)
+            wh.commit()
+            logging.info(" -> Dimensión de fecha creada exitosamente.")
+        except Exception as e:
+            logging.error(f" Error creando dimensión de fecha: {e}")
+            wh.rollback()
+
+    def _build_date_dimension(self, start_year: int, end_year: int) -> pd.DataFrame:
+        """ Un registro por día con atributos de calendario, festivos de Colombia y periodo fiscal """
+        dates = pd.date_range(f"{start_year}-01-01", f"{end_year}-12-31", freq='D')
+        holidays = colombian_holidays(np.arange(start_year, end_year + 1))
+        holiday_name = pd.Series(holidays['holiday_name'].to_numpy(), index=pd.DatetimeIndex(holidays['full_date']))
+        holiday_name = holiday_name.reindex(dates).to_numpy(dtype=object)
+        
+        month = dates.month.to_numpy()
+        # Año fiscal nombrado por el año en que termina (con inicio en enero coincide con el calendario)
+        fiscal_offset = (month - FISCAL_YEAR_START_MONTH) % 12
+        fiscal_year = dates.year.to_numpy() + ((FISCAL_YEAR_START_MONTH > 1) & (month >= FISCAL_YEAR_START_MONTH))
+        return pd.DataFrame({
+            'DATE_KEY': dates.year * 10000 + month * 100 + dates.day,  # Key predecible YYYYMMDD
+            'FULL_DATE': dates.date,
+            'DAY_OF_WEEK': dates.dayofweek + 1,  # 1 = lunes ... 7 = domingo (ISO)
+            'DAY_NAME': DAY_NAMES[dates.dayofweek],
+            'DAY_OF_MONTH': dates.day,
+            'DAY_OF_YEAR': dates.dayofyear,
+            'WEEK_OF_YEAR': dates.isocalendar().week.to_numpy(dtype='int64'),
+            'MONTH_NUM': month,
+            'MONTH_NAME': MONTH_NAMES[month - 1],
+            'QUARTER': dates.quarter,
+            'YEAR': dates.year,
+            'IS_WEEKEND': dates.dayofweek >= 5,
+            'IS_HOLIDAY': pd.notna(holiday_name),
+            'HOLIDAY_NAME': holiday_name,
+            'FISCAL_QUARTER': fiscal_offset // 3 + 1,
+            'FISCAL_YEAR': fiscal_year
+        })
+
+    def _build_time_dimension(self) -> pd.DataFrame:
+        """ Un registro por segundo del día con atributos descriptivos (hora, AM/PM, jornada) """
+        seconds = np.arange(86400)
+        hour, minute, second = seconds // 3600, seconds // 60 % 60, seconds % 60
+        return pd.DataFrame({
+            'TIME_KEY': hour * 10000 + minute * 100 + second,  # Key predecible HHMMSS
+            'HOUR': hour,
+            'MINUTE': minute,
+            'SECOND': second,
+            'TIME_OF_DAY': np.select([hour <= 5, hour <= 11, hour <= 17], ['Madrugada', 'Mañana', 'Tarde'], 'Noche'),
+            'HOUR_24': pd.Series(hour).astype(str).str.zfill(2) + ':' + pd.Series(minute).astype(str).str.zfill(2),
+            'AM_PM': np.where(hour < 12, 'AM', 'PM'),
+            'IS_BUSINESS_HOUR': (hour >= 8) & (hour <= 18)
+        })
     
     
+    def close_connections(self):
+        """ Cierra las conexiones abiertas con el origen y el warehouse, y el pool de transformación """
+        if self._transform_pool is not None:
+            self._transform_pool.shutdown()
+            self._transform_pool = None
+        if self.pg_conn is not None:
+            self.pg_conn.close()
+            self.pg_conn = None
+        if self.warehouse is not None:
+            self.warehouse.close()
+            self.warehouse = None
+
+    def _process_chunks_sequential(self):
+        """ Extrae, transforma y carga cada bloque uno tras otro """
+        for df in self._timed_chunks(self._extract_source()):
+            df = self._transform_stage(df)
+            if not df.empty:
+                self._load_stage(df)
+            if self.metrics['errors'] > 0:
+                logging.error(" Batch detenido: la próxima ejecución lo retoma desde el último checkpoint")
+                break
+
+    def _process_chunks_pipelined(self):
+        """ Ejecuta las tres etapas a la vez: mientras se carga el bloque N-1 se transforma el N y se extrae
+        el N+1. Extracción y transformación corren en hilos; la carga queda en el hilo principal, dueño de
+        la conexión al warehouse. Un None en la cola marca el fin de la etapa anterior """
+        logging.info(f" Modo pipeline: colas de {self.queue_size} bloques entre etapas")
+        extracted = queue.Queue(maxsize=self.queue_size)
+        transformed = queue.Queue(maxsize=self.queue_size)
+        stop = threading.Event()
+
+        def extract_worker():
+            try:
+                for df in self._timed_chunks(self._extract_source()):
+                    if not self._put_chunk(extracted, df, 'extract_transform', stop):
+                        return
+            except Exception as e:
+                self._stage_failed('extract', e, stop)
+            finally:
+                self._put_chunk(extracted, None, None, stop)
+
+        def transform_worker():
+            try:
+                while (df := self._get_chunk(extracted, stop)) is not None:
+                    df = self._transform_stage(df)
+                    if not df.empty and not self._put_chunk(transformed, df, 'transform_load', stop):
+                        return
+            except Exception as e:
+                self._stage_failed('transform', e, stop)
+            finally:
+                self._put_chunk(transformed, None, None, stop)
+
+        workers = [threading.Thread(target=extract_worker, name='etl-extract', daemon=True),
+                   threading.Thread(target=transform_worker, name='etl-transform', daemon=True)]
+        for worker in workers:
+            worker.start()
+        try:
+            while (df := self._get_chunk(transformed, stop)) is not None:
+                self._load_stage(df)
+                if self.metrics['errors'] > 0:
+                    logging.error(" Pipeline detenido: la próxima ejecución lo retoma desde el último checkpoint")
+                    stop.set()
+        except Exception as e:
+            self._stage_failed('load', e, stop)
+        finally:
+            for worker in workers:
+                worker.join()
+
+    def _extract_source(self) -> Iterator:
+        """ Bloques del origen: tablas Arrow (ruta Arrow) o DataFrames del cursor del servidor """
+        return self.extract_arrow_chunks() if self.arrow else self.extract_chunks()
+
+    def _put_chunk(self, chunk_queue: queue.Queue, df, queue_name, stop: threading.Event) -> bool:
+        """ Encola un bloque esperando mientras la cola esté llena; devuelve False si el pipeline se detuvo """
+        while not stop.is_set():
+            try:
+                chunk_queue.put(df, timeout=0.5)
+            except queue.Full:
+                continue
+            if queue_name:
+                depth = self.metrics['queue_depth'].setdefault(queue_name, {'max': 0, 'samples': 0, 'total': 0})
+                size = chunk_queue.qsize()
+                depth['max'] = max(depth['max'], size)
+                depth['samples'] += 1
+                depth['total'] += size
+            return True
+        return False
+
+    def _get_chunk(self, chunk_queue: queue.Queue, stop: threading.Event):
+        """ Toma el siguiente bloque; None al terminar la etapa anterior o si el pipeline se detuvo """
+        while not stop.is_set():
+            try:
+                return chunk_queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+        return None
+
+    def _stage_failed(self, stage: str, error: Exception, stop: threading.Event):
+        """ Registra el error de una etapa y detiene las demás """
+        logging.error(f" Error en etapa {stage} del pipeline: {error}")
+        self.metrics['errors'] += 1
+        stop.set()
+
+    def _timed_chunks(self, chunks: Iterator[pd.DataFrame]) -> Iterator[pd.DataFrame]:
+        """ Mide el tiempo que tarda la extracción en producir cada bloque (sin contar la espera aguas abajo) """
+        while True:
+            start = time.perf_counter()
+            df = next(chunks, None)
+            if df is None:
+                return
+            self._record_stage('extract', len(df), time.perf_counter() - start)
+            yield df
+
+    def _transform_stage(self, df: pd.DataFrame) -> pd.DataFrame:
+        start = time.perf_counter()
+        df = self.transform_data(df)
+        self._record_stage('transform', len(df), time.perf_counter() - start)
+        if self.quality is not None and not df.empty:
+            df = self.validate_chunk(df)
+        return df
+
+    def validate_chunk(self, df: pd.DataFrame) -> pd.DataFrame:
+        """ Evalúa las reglas de calidad sobre el bloque transformado antes de cargarlo: los viajes una vez por
+        trip_id y las entregas por fila (las reglas sin sus columnas en el bloque se omiten). En modo strict un
+        bloque con violaciones de integridad no se carga """
+        invalid = self.quality.validate('trips', df.drop_duplicates('trip_id'))
+        invalid += self.quality.validate('deliveries', df)
+        if invalid and self.quality_mode == 'strict':
+            logging.error(f" Calidad de datos: {invalid} filas del bloque violan reglas de integridad; no se carga")
+            self.metrics['errors'] += 1
+            return df.iloc[0:0]
+        if invalid:
+            logging.warning(f" Calidad de datos: {invalid} filas del bloque violan reglas de integridad")
+        return df
+
+    def _load_stage(self, df: pd.DataFrame):
+        start = time.perf_counter()
+        self.load_dimensions(df)
+        self.load_facts(df)
+        self.save_checkpoint(df)
+        self._record_stage('load', len(df), time.perf_counter() - start)
+
+    def _record_stage(self, stage: str, rows: int, seconds: float):
+        stats = self.metrics['stages'][stage]
+        stats['chunks'] += 1
+        stats['rows'] += rows
+        stats['seconds'] += seconds
+
+    def _finalize_stage_metrics(self):
+        """ Calcula filas/segundo por etapa y la ocupación promedio de cada cola """
+        for stats in self.metrics['stages'].values():
+            stats['seconds'] = round(stats['seconds'], 3)
+            stats['rows_per_sec'] = round(stats['rows'] / stats['seconds'], 1) if stats['seconds'] > 0 else 0.0
+        for depth in self.metrics['queue_depth'].values():
+            depth['avg'] = round(depth.pop('total') / depth['samples'], 2) if depth['samples'] else 0.0
+
+    def save_quality_report(self):
+        """ Guarda el reporte JSON de calidad del batch y resume su resultado en las métricas """
+        if self.quality is None or not self.quality.tables:
+            return
+        report = self.quality.save_report(self.quality_report_file, load_seconds=self.metrics['stages']['load']['seconds'])
+        self.metrics['data_quality'] = {'passed': report['passed'], 'errors': report['errors'],
+                                        'warnings': report['warnings'], 'seconds': report['seconds'],
+                                        'overhead_pct': report['overhead_pct']}
+        logging.info(f" Reporte de calidad guardado en {self.quality_report_file}")
+
+    def setup_cdc(self) -> bool:
+        """ Crea la publicación de trips/deliveries y el slot lógico (pgoutput) si no existen.
+        Devuelve True si el slot es nuevo: lo anterior a su creación no está en el stream """
+        cursor = self.pg_conn.cursor()
+        cursor.execute("SELECT 1 FROM pg_publication WHERE pubname = %s", (CDC_PUBLICATION,))
+        if cursor.fetchone() is None:
+            # Con trips/deliveries particionadas los cambios se publican con el nombre de la tabla raíz
+            cursor.execute(f"CREATE PUBLICATION {CDC_PUBLICATION} FOR TABLE public.trips, public.deliveries "
+                           f"WITH (publish_via_partition_root = true)")
+            logging.info(f" Publicación {CDC_PUBLICATION} creada")
+        cursor.execute("SELECT 1 FROM pg_replication_slots WHERE slot_name = %s", (CDC_SLOT,))
+        created = cursor.fetchone() is None
+        self.pg_conn.commit()
+        cursor.close()
+        if created:
+            repl_conn = psycopg2.connect(**POSTGRES_CONFIG, connection_factory=LogicalReplicationConnection)
+            repl_conn.cursor().create_replication_slot(CDC_SLOT, output_plugin='pgoutput')
+            repl_conn.close()
+            logging.info(f" Slot de replicación {CDC_SLOT} creado")
+        return created
+
+    def consume_changes(self, max_batches: int = None):
+        """ Consume el stream de replicación lógica en micro-batches de cdc_batch_seconds: junta los viajes
+        tocados, los re-extrae completos por llave, los transforma y carga, y solo entonces confirma el LSN al
+        slot. Un micro-batch fallido detiene el consumo sin confirmar, así que se repite al reiniciar """
+        repl_conn = psycopg2.connect(**POSTGRES_CONFIG, connection_factory=LogicalReplicationConnection)
+        cursor = repl_conn.cursor()
+        cursor.start_replication(slot_name=CDC_SLOT, decode=False,
+                                 options={'proto_version': '1', 'publication_names': CDC_PUBLICATION})
+        decoder = PgOutputDecoder()
+        logging.info(f" CDC: consumiendo {CDC_SLOT} en micro-batches de {self.cdc_batch_seconds}s")
+        batches = 0
+        try:
+            while max_batches is None or batches < max_batches:
+                trip_ids, deleted_ids, lsn = self._collect_changes(cursor, decoder)
+                batches += 1
+                if (trip_ids or deleted_ids) and not self._apply_changes(trip_ids, deleted_ids):
+                    logging.error(" CDC detenido: el micro-batch se repetirá desde el último LSN confirmado")
+                    return
+                if lsn is not None:
+                    cursor.send_feedback(flush_lsn=lsn)
+        except KeyboardInterrupt:
+            logging.info(" CDC detenido por el usuario")
+        finally:
+            repl_conn.close()
+
+    def _collect_changes(self, cursor, decoder: PgOutputDecoder):
+        """ Lee el stream hasta cumplir la ventana del micro-batch (o CDC_BATCH_MAX_TRIPS viajes), cortando
+        siempre en un COMMIT. Devuelve los viajes a recargar, las entregas borradas y el LSN a confirmar """
+        deadline = time.monotonic() + self.cdc_batch_seconds
+        trip_ids, deleted_ids = set(), set()
+        lsn = None
+        in_transaction = False
+        while in_transaction or (time.monotonic() < deadline and len(trip_ids) < CDC_BATCH_MAX_TRIPS):
+            message = cursor.read_message()
+            if message is None:
+                select.select([cursor], [], [], max(0.1, deadline - time.monotonic()))
+                continue
+            change = decoder.decode(message.payload)
+            in_transaction = message.payload[:1] != b'C' and (in_transaction or message.payload[:1] == b'B')
+            if change is None:
+                continue
+            operation, table, row = change
+            if operation == 'C':
+                lsn = message.data_start
+            elif operation == 'D':
+                # Con REPLICA IDENTITY por defecto el borrado solo trae la llave primaria
+                if table == 'deliveries':
+                    deleted_ids.add(int(row['delivery_id']))
+            elif row.get('trip_id') is not None:
+                trip_ids.add(int(row['trip_id']))
+        return trip_ids, deleted_ids, lsn
+
+    def _apply_changes(self, trip_ids, deleted_ids) -> bool:
+        """ Aplica un micro-batch: borra los hechos de entregas eliminadas y recarga los viajes tocados """
+        errors = self.metrics['errors']
+        logging.info(f" CDC micro-batch: {len(trip_ids)} viajes modificados, {len(deleted_ids)} entregas borradas")
+        if deleted_ids:
+            try:
+                self._delete_facts(sorted(deleted_ids))
+                self.warehouse.commit()
+            except Exception as e:
+                logging.error(f" Error borrando hechos: {e}")
+                self.warehouse.rollback()
+                self.metrics['errors'] += 1
+        if trip_ids:
+            # Las tablas maestras no están en la publicación: se revisan por hash en cada micro-batch
+            self.sync_dimensions()
+            start = time.perf_counter()
+            df = self.extract_trips(sorted(trip_ids))
+            self._record_stage('extract', len(df), time.perf_counter() - start)
+            if not df.empty:
+                df = self._transform_stage(df)
+                if not df.empty:
+                    self._load_stage(df)
+        return self.metrics['errors'] == errors
+
+    def extract_trips(self, trip_ids: List[int]) -> pd.DataFrame:
+        """ Extrae los viajes completos indicados (todas sus entregas) con la consulta de extracción """
+        try:
+            with self.pg_conn.cursor() as cursor:
+                cursor.execute(EXTRACT_QUERY.format(where=CDC_FILTER), {'trip_ids': trip_ids})
+                columns = [c[0] for c in cursor.description]
+                df = pd.DataFrame.from_records(cursor.fetchall(), columns=columns, coerce_float=True)
+            # Libera el snapshot: el consumidor CDC mantiene la conexión abierta por horas
+            self.pg_conn.rollback()
+            self.metrics['records_extracted'] += len(df)
+            if not df.empty:
+                self._advance_watermark(df)
+            return df
+        except Exception as e:
+            logging.error(f" Error en extracción CDC: {e}")
+            self.pg_conn.rollback()
+            self.metrics['errors'] += 1
+            return pd.DataFrame()
+
+    def run_cdc(self, max_batches: int = None):
+        """ Orquestador del modo CDC: prepara el warehouse, crea publicación y slot, pone al día lo anterior
+        al slot con la extracción incremental y luego consume el stream de cambios en micro-batches """
+        start_time = datetime.now()
+        logging.info(f" Iniciando ETL en modo CDC - Batch ID: {self.batch_id}")
+        try:
+            if not self.connect_databases(): return
+            self.warehouse.setup_schema()
+            self.setup_time_dimension()
+            self.setup_date_dimension()
+            self.setup_infrastructure()
+            self.sync_dimensions()
+
+            # El slot se crea antes de la puesta al día: lo que cambie entre ambos llega dos veces y se reemplaza
+            if self.setup_cdc():
+                self._process_chunks_sequential()
+            self.cdc = True
+            if self.metrics['errors'] == 0:
+                self.consume_changes(max_batches)
+            self._finalize_stage_metrics()
+            self.save_quality_report()
+            if self.metrics['errors'] == 0:
+                if self.metrics['records_loaded'] > 0:
+                    self._calculate_daily_totals()
+                self.save_state()
+
+            elapsed = (datetime.now() - start_time).total_seconds()
+            logging.info(f" CDC Finalizado en {elapsed:.1f}s. Métricas: {self.metrics}")
+            self.close_connections()
+        except Exception as e:
+            logging.error(f" Error fatal en CDC: {e}")
+            self.metrics['errors'] += 1
+            self.close_connections()
+
     def run_etl(self):
         """ Método orquestador que ejecuta el flujo completo de vida del ETL: Conectar -> Setup -> E -> T -> L """
         start_time = datetime.now()
@@ -337,26 +1832,77 @@ class FleetLogixETL:
             if not self.connect_databases(): return
             
             # Fase 2: Garantizar que el entorno esté listo (DDL y Dimensiones estáticas)
+            self.warehouse.setup_schema()
             self.setup_time_dimension()
+            self.setup_date_dimension()
             self.setup_infrastructure()
+            self.sync_dimensions()
             
-            # Fase 3: Proceso de datos
-            df = self.extract_daily_data()
-            if not df.empty:
-                df = self.transform_data(df)
-                self.load_dimensions(df)
-                self.load_facts(df)
-                self._calculate_daily_totals()
+            # Fase 3: Proceso de datos, bloque a bloque para mantener la memoria acotada
+            if self.pipelined:
+                self._process_chunks_pipelined()
+            else:
+                self._process_chunks_sequential()
+            self._finalize_stage_metrics()
+            self.save_quality_report()
+            
+            # Totales y marca de agua solo cuando el batch terminó sin errores (si no, queda su checkpoint)
+            if self.metrics['errors'] == 0:
+                if self.metrics['records_loaded'] > 0:
+                    self._calculate_daily_totals()
+                self.save_state()
             
             # Fase 4: Finalización y métricas
-            logging.info(f" ETL Finalizado. Métricas: {self.metrics}")
-            self.pg_conn.close()
-            self.sf_conn.close()
+            elapsed = (datetime.now() - start_time).total_seconds()
+            logging.info(f" ETL Finalizado en {elapsed:.1f}s. Métricas: {self.metrics}")
+            self.close_connections()
         except Exception as e:
             logging.error(f" Error fatal en ETL: {e}")
             self.metrics['errors'] += 1
             self.close_connections()
 
+def parse_args():
+    """ Opciones de línea de comandos del ETL """
+    parser = argparse.ArgumentParser(description="FleetLogix - Pipeline ETL PostgreSQL -> Snowflake / DuckDB")
+    parser.add_argument('--chunk-size', type=int, default=EXTRACT_CHUNK_SIZE,
+                        help="Filas por bloque en la extracción en streaming")
+    parser.add_argument('--backfill-days', type=int, default=ETL_BACKFILL_DAYS,
+                        help="Días hacia atrás desde la marca de agua que se vuelven a procesar")
+    parser.add_argument('--warehouse', choices=sorted(WAREHOUSES), default=ETL_WAREHOUSE,
+                        help="Destino: Snowflake o la réplica local en DuckDB (DUCKDB_PATH)")
+    parser.add_argument('--pipelined', action='store_true',
+                        help="Extraer, transformar y cargar bloques en paralelo con colas acotadas")
+    parser.add_argument('--queue-size', type=int, default=ETL_QUEUE_SIZE,
+                        help="Bloques máximos en espera entre etapas del modo pipeline")
+    parser.add_argument('--transform-workers', type=int, default=ETL_TRANSFORM_WORKERS,
+                        help="Procesos para transformar cada bloque (particionado por trip_id)")
+    parser.add_argument('--arrow', action='store_true',
+                        help="Extraer con COPY a tablas Arrow y transformar con pyarrow.compute")
+    parser.add_argument('--cdc', action='store_true',
+                        help="Consumir la replicación lógica de trips/deliveries en micro-batches (requiere wal_level=logical)")
+    parser.add_argument('--cdc-batch-seconds', type=float, default=CDC_BATCH_SECONDS,
+                        help="Ventana de cada micro-batch del modo CDC")
+    parser.add_argument('--cdc-max-batches', type=int, default=None,
+                        help="Detener el modo CDC tras N micro-batches (por defecto, hasta interrumpirlo)")
+    parser.add_argument('--quality', choices=['report', 'strict', 'off'], default=ETL_QUALITY,
+                        help="Reglas de calidad por bloque: reportar, no cargar bloques inválidos o no validar")
+    parser.add_argument('--stage-dir', default=ETL_STAGE_DIR,
+                        help="Directorio local de los archivos Parquet de hechos")
+    parser.add_argument('--state-file', default=None,
+                        help="Archivo de la marca de agua (por defecto uno por destino local)")
+    return parser.parse_args()
+
+
 if __name__ == "__main__":
-    etl = FleetLogixETL()
-    etl.run_etl()
\ No newline at end of file
+    args = parse_args()
+    # La marca de agua es del destino: la réplica local no debe adelantar la de Snowflake
+    state_file = args.state_file or (ETL_STATE_FILE if args.warehouse == 'snowflake' else f"etl_state_{args.warehouse}.json")
+    etl = FleetLogixETL(chunk_size=args.chunk_size, backfill_days=args.backfill_days,
+                        state_file=state_file, stage_dir=args.stage_dir, warehouse=args.warehouse,
+                        pipelined=args.pipelined, queue_size=args.queue_size,
+                        transform_workers=args.transform_workers, arrow=args.arrow,
+                        cdc_batch_seconds=args.cdc_batch_seconds, quality=args.quality)
+    if args.cdc:
+        etl.run_cdc(max_batches=args.cdc_max_batches)
+    else:
+        etl.run_etl()
\ No newline at end of file
@@ -0,0 +1,254 @@
+"""
+FleetLogix - Benchmarks del Pipeline ETL
+Mide el rendimiento de las etapas del ETL (A3-05) sobre bloques sintéticos con la forma de la extracción
+"""
+
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import tempfile
+import importlib.util
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import resource
+except ImportError:  # No disponible en Windows
+    resource = None
+
+import numpy as np
+import pandas as pd
+
+
+ETL_MODULE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'A3-05_etl_pipeline_estudiantes.py')
+
+
+def load_etl_module():
+    """ Importa el pipeline ETL desde su archivo (el nombre con guiones no es importable directamente) """
+    spec = importlib.util.spec_from_file_location('fleetlogix_etl', ETL_MODULE_PATH)
+    module = importlib.util.module_from_spec(spec)
+    # Registrado en sys.modules para que el pool de procesos pueda serializar sus funciones
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def synthetic_extract(rows: int, seed: int = 42) -> pd.DataFrame:
+    """ Bloque sintético con las columnas de EXTRACT_QUERY, ordenado por viaje (2-6 entregas por viaje).
+    Las fechas llegan como objetos, igual que desde psycopg2, para que pd.to_datetime tenga trabajo real """
+    rng = np.random.default_rng(seed)
+    per_trip = rng.choice([2, 3, 4, 5, 6], size=rows // 2 + 1, p=[0.1, 0.2, 0.4, 0.2, 0.1])
+    trip_of_row = np.repeat(np.arange(1, len(per_trip) + 1), per_trip)[:rows]
+    trips = trip_of_row[-1]
+
+    departure = np.datetime64('2024-01-01T00:00') + rng.integers(0, 730 * 1440, trips).astype('timedelta64[m]')
+    arrival = departure + rng.integers(60, 1200, trips).astype('timedelta64[m]')
+    scheduled = departure[trip_of_row - 1] + rng.integers(30, 600, rows).astype('timedelta64[m]')
+    delivered = scheduled + rng.integers(-30, 90, rows).astype('timedelta64[m]')
+    delivered[rng.random(rows) < 0.05] = np.datetime64('NaT')
+
+    vehicle = rng.integers(1, 201, trips)[trip_of_row - 1]
+    driver = rng.integers(1, 401, trips)[trip_of_row - 1]
+    route = rng.integers(1, 51, trips)[trip_of_row - 1]
+    cities = np.array(['Bogotá', 'Medellín', 'Cali', 'Barranquilla', 'Cartagena'])
+    return pd.DataFrame({
+        'delivery_id': np.arange(1, rows + 1),
+        'tracking_number': pd.Series(np.arange(1, rows + 1)).astype(str).radd('FL2024'),
+        'customer_name': pd.Series(rng.integers(0, 5000, rows)).astype(str).radd('Cliente '),
+        'delivery_address': 'Calle 1 # 2-3',
+        'package_weight_kg': rng.uniform(0.5, 400, rows).round(2),
+        'scheduled_datetime': scheduled.astype('datetime64[us]').astype(object),
+        'delivered_datetime': pd.Series(delivered).astype(object),
+        'delivery_status': np.where(np.isnat(delivered), 'pending', 'delivered'),
+        'trip_id': trip_of_row,
+        'fuel_consumed_liters': rng.uniform(5, 200, trips).round(2)[trip_of_row - 1],
+        'departure_datetime': departure.astype('datetime64[us]').astype(object)[trip_of_row - 1],
+        'arrival_datetime': arrival.astype('datetime64[us]').astype(object)[trip_of_row - 1],
+        'vehicle_id': vehicle,
+        'license_plate': pd.Series(vehicle).astype(str).radd('ABC'),
+        'vehicle_type': 'Camión Mediano',
+        'capacity_kg': 5000.0,
+        'fuel_type': 'diesel',
+        'driver_id': driver,
+        'employee_code': pd.Series(driver).astype(str).radd('EMP'),
+        'full_name': 'Conductor Prueba',
+        'route_id': route,
+        'route_code': pd.Series(route).astype(str).radd('R'),
+        'origin_city': cities[route % 5],
+        'destination_city': cities[(route + 1) % 5],
+        'distance_km': rng.uniform(10, 1000, 50).round(2)[route - 1],
+        'toll_cost': rng.uniform(0, 200000, 50).round(2)[route - 1],
+    })
+
+
+def benchmark_transform(etl_module, df: pd.DataFrame, workers_list, repeat: int) -> list:
+    """ Tiempo de transform_data con 1..N procesos (mejor de `repeat`), verificando igualdad con 1 proceso """
+    results = []
+    baseline = None
+    with tempfile.TemporaryDirectory(prefix='fleetlogix_bench_') as state_dir:
+        for workers in workers_list:
+            etl = etl_module.FleetLogixETL(warehouse='duckdb', transform_workers=workers,
+                                           state_file=os.path.join(state_dir, 'state.json'))
+            # Calentamiento: crea el pool de procesos fuera de la medición
+            etl.transform_data(df.head(workers * etl_module.PARALLEL_MIN_ROWS).copy())
+            timings = []
+            for _ in range(repeat):
+                block = df.copy()
+                start = time.perf_counter()
+                out = etl.transform_data(block)
+                timings.append(time.perf_counter() - start)
+            etl.close_connections()
+
+            if baseline is None:
+                baseline = out
+            pd.testing.assert_frame_equal(out, baseline)
+            best = min(timings)
+            results.append({
+                'workers': workers,
+                'rows': len(df),
+                'seconds': round(best, 3),
+                'rows_per_sec': round(len(df) / best, 1),
+                'speedup': round(results[0]['seconds'] / best, 2) if results else 1.0
+            })
+            logging.info(f" transform_data x{workers}: {best:.3f}s ({len(df) / best:,.0f} filas/s, "
+                         f"speedup {results[-1]['speedup']}x, resultado idéntico a 1 proceso)")
+    return results
+
+
+def _run_extract_path(arrow: bool, chunk_size: int) -> dict:
+    """ Extrae y transforma todo el origen con una de las rutas, en un proceso nuevo para medir su memoria """
+    etl_module = load_etl_module()
+    with tempfile.TemporaryDirectory(prefix='fleetlogix_bench_') as state_dir:
+        etl = etl_module.FleetLogixETL(warehouse='duckdb', chunk_size=chunk_size, arrow=arrow,
+                                       state_file=os.path.join(state_dir, 'state.json'))
+        etl.pg_conn = etl_module.psycopg2.connect(**etl_module.POSTGRES_CONFIG)
+        extracted_bytes = 0
+        transformed_bytes = 0
+        rows = 0
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        for block in etl._extract_source():
+            # Bytes en memoria del bloque extraído (Arrow: buffers; pandas: incluye objetos Python)
+            extracted_bytes += block.nbytes if arrow else int(block.memory_usage(deep=True).sum())
+            out = etl.transform_data(block)
+            transformed_bytes += int(out.memory_usage(deep=True).sum())
+            rows += len(out)
+        wall, cpu = time.perf_counter() - wall_start, time.process_time() - cpu_start
+        etl.close_connections()
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024 if resource else None
+    return {
+        'path': 'arrow' if arrow else 'cursor',
+        'rows': rows,
+        'wall_seconds': round(wall, 3),
+        'cpu_seconds': round(cpu, 3),
+        'rows_per_sec': round(rows / wall, 1) if wall > 0 else 0.0,
+        'extracted_bytes_per_row': round(extracted_bytes / rows, 1) if rows else 0.0,
+        'transformed_bytes_per_row': round(transformed_bytes / rows, 1) if rows else 0.0,
+        'peak_rss_mb': round(peak_rss, 1) if peak_rss else None
+    }
+
+
+def benchmark_extract(chunk_size: int) -> list:
+    """ Ruta actual (cursor del servidor + pandas) frente a la ruta Arrow (COPY + pyarrow.compute) sobre
+    PostgreSQL: tiempo, CPU, bytes por fila del bloque y memoria pico de cada proceso """
+    results = []
+    for arrow in (False, True):
+        with ProcessPoolExecutor(max_workers=1) as pool:
+            result = pool.submit(_run_extract_path, arrow, chunk_size).result()
+        results.append(result)
+        logging.info(f" extract+transform ({result['path']}): {result['wall_seconds']}s, CPU {result['cpu_seconds']}s, "
+                     f"{result['extracted_bytes_per_row']} B/fila extraída, {result['transformed_bytes_per_row']} B/fila "
+                     f"transformada, RSS pico {result['peak_rss_mb']} MB")
+    return results
+
+
+def benchmark_keys(etl_module, rows: int, repeat: int) -> list:
+    """ date_key / time_key: strftime + aritmética de accesores .dt (ruta anterior) frente a la derivación
+    aritmética sobre datetime64 de A3-05, verificando que ambas producen las mismas llaves """
+    rng = np.random.default_rng(42)
+    values = pd.Series(np.datetime64('2024-01-01T00:00:00') + rng.integers(0, 730 * 86400, rows).astype('timedelta64[s]'))
+    values[rng.random(rows) < 0.01] = pd.NaT
+
+    def strftime_keys():
+        date_key = values.dt.strftime('%Y%m%d').fillna(0).astype(int)
+        time_key = (values.dt.hour * 10000 + values.dt.minute * 100 + values.dt.second).fillna(0).astype(int)
+        return date_key.to_numpy(), time_key.to_numpy()
+
+    def arithmetic_keys():
+        return etl_module.date_keys(values), etl_module.time_keys(values)
+
+    results = []
+    outputs = []
+    for name, method in (('strftime', strftime_keys), ('arithmetic', arithmetic_keys)):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            out = method()
+            timings.append(time.perf_counter() - start)
+        outputs.append(out)
+        best = min(timings)
+        results.append({
+            'method': name,
+            'rows': rows,
+            'seconds': round(best, 3),
+            'rows_per_sec': round(rows / best, 1),
+            'speedup': round(results[0]['seconds'] / best, 2) if results else 1.0
+        })
+        logging.info(f" llaves ({name}): {best:.3f}s ({rows / best:,.0f} filas/s, speedup {results[-1]['speedup']}x)")
+
+    for expected, actual in zip(*outputs):
+        np.testing.assert_array_equal(actual, expected)
+    logging.info(" Llaves idénticas en ambos métodos")
+    return results
+
+
+def parse_args():
+    """ Opciones de línea de comandos de los benchmarks del ETL """
+    parser = argparse.ArgumentParser(description="FleetLogix - Benchmarks del pipeline ETL")
+    sub = parser.add_subparsers(dest='benchmark', required=True)
+
+    transform = sub.add_parser('transform', help="Escalamiento de transform_data con el pool de procesos")
+    transform.add_argument('--rows', type=int, default=1000000, help="Filas del bloque sintético")
+    transform.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8, 16],
+                           help="Cantidades de procesos a medir (la primera es la referencia)")
+    transform.add_argument('--repeat', type=int, default=3, help="Repeticiones por medición (se toma la mejor)")
+
+    extract = sub.add_parser('extract', help="Ruta actual vs ruta Arrow (requiere PostgreSQL con datos)")
+    extract.add_argument('--chunk-size', type=int, default=50000, help="Filas por bloque de extracción")
+
+    keys = sub.add_parser('keys', help="date_key/time_key con strftime vs aritmética sobre datetime64")
+    keys.add_argument('--rows', type=int, default=10000000, help="Cantidad de timestamps")
+    keys.add_argument('--repeat', type=int, default=3, help="Repeticiones por medición (se toma la mejor)")
+
+    parser.add_argument('--output', default='etl_benchmarks.json', help="Archivo JSON con los resultados")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    etl_module = load_etl_module()
+    logging.info(f" Benchmark '{args.benchmark}' en {os.cpu_count()} CPUs")
+
+    if args.benchmark == 'transform':
+        df = synthetic_extract(args.rows)
+        results = benchmark_transform(etl_module, df, args.workers, args.repeat)
+    elif args.benchmark == 'extract':
+        results = benchmark_extract(args.chunk_size)
+    elif args.benchmark == 'keys':
+        results = benchmark_keys(etl_module, args.rows, args.repeat)
+
+    report = {
+        'benchmark': args.benchmark,
+        'run_date': datetime.now().isoformat(),
+        'cpu_count': os.cpu_count(),
+        'results': results
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    logging.info(f" Resultados guardados en {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+-- =====================================================
+-- FLEETLOGIX - 12 QUERIES ANALÍTICAS
+-- Definiciones usadas por el benchmark (A2-04_query_benchmark.py)
+-- Cada query inicia con "-- name:" (identificador) y "-- title:" (descripción)
+-- =====================================================
+
+-- =====================================================
+-- QUERIES BÁSICAS
+-- =====================================================
+
+-- name: q01_vehiculos_por_tipo
+-- title: Contar vehículos por tipo
+SELECT vehicle_type, COUNT(*)
+FROM vehicles
+GROUP BY vehicle_type;
+
+-- name: q02_licencias_por_vencer
+-- title: Conductores con licencia próxima a vencer
+SELECT first_name, last_name, license_expiry
+FROM drivers
+WHERE license_expiry <= CURRENT_DATE + 30
+  AND license_expiry >= CURRENT_DATE;
+
+-- name: q03_viajes_por_estado
+-- title: Total de viajes por estado
+SELECT status, COUNT(*)
+FROM trips
+GROUP BY status;
+
+-- =====================================================
+-- QUERIES INTERMEDIAS
+-- =====================================================
+
+-- name: q04_entregas_por_ciudad
+-- title: Total de entregas por ciudad (últimos 60 días)
+SELECT
+    delivery_address AS ciudad,
+    COUNT(delivery_id) AS total_entregas,
+    SUM(package_weight_kg) AS peso_total_kg
+FROM deliveries
+WHERE scheduled_datetime >= CURRENT_DATE - INTERVAL '60 days'
+GROUP BY delivery_address
+ORDER BY total_entregas DESC;
+
+-- name: q05_carga_conductores_activos
+-- title: Conductores activos y carga de trabajo
+SELECT
+    d.first_name,
+    d.last_name,
+    COUNT(t.trip_id) AS total_viajes
+FROM drivers d
+LEFT JOIN trips t ON d.driver_id = t.driver_id
+WHERE d.status = 'active'
+GROUP BY d.driver_id, d.first_name, d.last_name
+ORDER BY total_viajes DESC;
+
+-- name: q06_promedio_entregas_conductor
+-- title: Promedio de entregas por conductor (6 meses)
+SELECT
+    dr.first_name,
+    dr.last_name,
+    COUNT(de.delivery_id) / 6.0 AS promedio_entregas_mes
+FROM drivers dr
+JOIN trips tr ON dr.driver_id = tr.driver_id
+JOIN deliveries de ON tr.trip_id = de.trip_id
+WHERE tr.departure_datetime >= CURRENT_DATE - INTERVAL '6 months'
+GROUP BY dr.driver_id, dr.first_name, dr.last_name;
+
+-- name: q07_consumo_por_ruta
+-- title: Rutas con mayor consumo de combustible
+SELECT
+    r.origin_city,
+    r.destination_city,
+    AVG((t.fuel_consumed_liters / r.distance_km) * 100) AS consumo_promedio_100km
+FROM routes r
+JOIN trips t ON r.route_id = t.route_id
+WHERE r.distance_km > 0
+GROUP BY r.route_id, r.origin_city, r.destination_city
+ORDER BY consumo_promedio_100km DESC
+LIMIT 10;
+
+-- name: q08_retrasos_dia_semana
+-- title: Análisis de retrasos por día de semana
+SELECT
+    EXTRACT(DOW FROM scheduled_datetime) AS dia_semana,
+    COUNT(*) FILTER (WHERE delivered_datetime > scheduled_datetime) * 100.0 / COUNT(*) AS porcentaje_retraso
+FROM deliveries
+WHERE delivered_datetime IS NOT NULL
+GROUP BY dia_semana
+ORDER BY dia_semana;
+
+-- =====================================================
+-- QUERIES COMPLEJAS
+-- =====================================================
+
+-- name: q09_costo_mantenimiento_km
+-- title: Costo de mantenimiento por kilómetro
+WITH totales_mantenimiento AS (
+    SELECT vehicle_id, SUM(cost) AS costo_total
+    FROM maintenance
+    GROUP BY vehicle_id
+),
+distancia_recorrida AS (
+    SELECT t.vehicle_id, v.vehicle_type, SUM(r.distance_km) AS km_totales
+    FROM trips t
+    JOIN vehicles v ON t.vehicle_id = v.vehicle_id
+    JOIN routes r ON t.route_id = r.route_id
+    GROUP BY t.vehicle_id, v.vehicle_type
+)
+SELECT
+    d.vehicle_type,
+    SUM(m.costo_total) / SUM(d.km_totales) AS costo_por_km
+FROM distancia_recorrida d
+JOIN totales_mantenimiento m ON d.vehicle_id = m.vehicle_id
+GROUP BY d.vehicle_type;
+
+-- name: q10_ranking_conductores
+-- title: Ranking de conductores por eficiencia
+SELECT
+    first_name,
+    last_name,
+    total_viajes,
+    RANK() OVER (ORDER BY total_viajes DESC) AS puesto_ranking
+FROM (
+    SELECT d.first_name, d.last_name, COUNT(t.trip_id) AS total_viajes
+    FROM drivers d
+    JOIN trips t ON d.driver_id = t.driver_id
+    WHERE t.status = 'completed'
+    GROUP BY d.driver_id, d.first_name, d.last_name
+) AS subconsulta
+LIMIT 20;
+
+-- name: q11_tendencia_mensual
+-- title: Análisis de tendencia mensual
+SELECT
+    mes,
+    viajes_mes,
+    LAG(viajes_mes) OVER (ORDER BY mes) AS viajes_mes_anterior,
+    viajes_mes - LAG(viajes_mes) OVER (ORDER BY mes) AS diferencia_crecimiento
+FROM (
+    SELECT DATE_TRUNC('month', departure_datetime) AS mes, COUNT(*) AS viajes_mes
+    FROM trips
+    GROUP BY mes
+) AS datos_mensuales;
+
+-- name: q12_pivot_hora_dia
+-- title: Pivot de entregas por hora y día
+SELECT
+    EXTRACT(HOUR FROM scheduled_datetime) AS hora_del_dia,
+    COUNT(*) FILTER (WHERE EXTRACT(DOW FROM scheduled_datetime) = 1) AS lunes,
+    COUNT(*) FILTER (WHERE EXTRACT(DOW FROM scheduled_datetime) = 2) AS martes,
+    COUNT(*) FILTER (WHERE EXTRACT(DOW FROM scheduled_datetime) = 3) AS miercoles,
+    COUNT(*) FILTER (WHERE EXTRACT(DOW FROM scheduled_datetime) = 4) AS jueves,
+    COUNT(*) FILTER (WHERE EXTRACT(DOW FROM scheduled_datetime) = 5) AS viernes
+FROM deliveries
+WHERE scheduled_datetime >= CURRENT_DATE - INTERVAL '60 days'
+GROUP BY hora_del_dia
+ORDER BY hora_del_dia;
@@ -0,0 +1,156 @@
+-- =====================================================
+-- FLEETLOGIX - PARTICIONAMIENTO MENSUAL DE TRIPS Y DELIVERIES
+-- Migración OPCIONAL: convierte las tablas heap de fleetlogix_db_schema.sql (el esquema canónico)
+-- en tablas particionadas por rango mensual de departure_datetime / scheduled_datetime
+-- Beneficio: las queries y el ETL que filtran por fecha leen solo los meses relevantes
+-- (partition pruning) y la retención de histórico es un DROP de partición en vez de DELETE
+--
+-- Costos (aplicar solo si la retención por meses compensa):
+--   * PostgreSQL exige la columna de partición en toda llave única: trip_id deja de ser único por sí
+--     solo, así que se pierde la FK deliveries -> trips, y tracking_number pasa a ser único solo
+--     junto con scheduled_datetime (el mismo tracking puede repetirse en otra fecha)
+--   * Ambas garantías quedan como verificaciones, no como restricciones: A1-02_data_quality.py
+--     (--sample-percent) busca en toda la tabla entregas huérfanas y tracking numbers repetidos de
+--     la muestra; el generador y el ETL solo las revisan dentro de cada bloque
+--   * En A2-05_partition_benchmark.py (400k entregas en memoria) las 12 queries calientes fueron
+--     ~10% más lentas y borrar los 3 meses más antiguos ~9x más rápido que DELETE + VACUUM
+-- =====================================================
+
+BEGIN;
+
+-- =====================================================
+-- PASO 1: Apartar las tablas heap actuales
+-- =====================================================
+ALTER TABLE deliveries RENAME TO deliveries_heap;
+ALTER TABLE trips RENAME TO trips_heap;
+
+-- =====================================================
+-- PASO 2: Tablas particionadas (misma definición que fleetlogix_db_schema.sql)
+-- =====================================================
+-- La llave primaria incluye la columna de partición; trip_id deja de ser único en trips,
+-- por lo que deliveries no declara FK (la integridad la valida A1-01)
+CREATE TABLE trips (
+    trip_id SERIAL,
+    vehicle_id INTEGER REFERENCES vehicles(vehicle_id),
+    driver_id INTEGER REFERENCES drivers(driver_id),
+    route_id INTEGER REFERENCES routes(route_id),
+    departure_datetime TIMESTAMP NOT NULL,
+    arrival_datetime TIMESTAMP,
+    fuel_consumed_liters DECIMAL(10,2),
+    total_weight_kg DECIMAL(10,2),
+    status VARCHAR(20) DEFAULT 'in_progress',
+    PRIMARY KEY (trip_id, departure_datetime)
+) PARTITION BY RANGE (departure_datetime);
+
+CREATE TABLE deliveries (
+    delivery_id SERIAL,
+    trip_id INTEGER NOT NULL,
+    tracking_number VARCHAR(50) NOT NULL,
+    customer_name VARCHAR(200) NOT NULL,
+    delivery_address TEXT NOT NULL,
+    package_weight_kg DECIMAL(10,2),
+    scheduled_datetime TIMESTAMP NOT NULL,
+    delivered_datetime TIMESTAMP,
+    delivery_status VARCHAR(20) DEFAULT 'pending',
+    recipient_signature BOOLEAN DEFAULT FALSE,
+    PRIMARY KEY (delivery_id, scheduled_datetime),
+    UNIQUE (tracking_number, scheduled_datetime)
+) PARTITION BY RANGE (scheduled_datetime);
+
+CREATE TABLE trips_default PARTITION OF trips DEFAULT;
+CREATE TABLE deliveries_default PARTITION OF deliveries DEFAULT;
+
+-- =====================================================
+-- PASO 3: Una partición por mes del rango de datos existente (más el mes siguiente)
+-- =====================================================
+DO $$
+DECLARE
+    month_start DATE;
+BEGIN
+    FOR month_start IN
+        SELECT generate_series(
+            date_trunc('month', LEAST((SELECT MIN(departure_datetime) FROM trips_heap),
+                                      (SELECT MIN(scheduled_datetime) FROM deliveries_heap),
+                                      CURRENT_DATE::timestamp)),
+            date_trunc('month', GREATEST((SELECT MAX(departure_datetime) FROM trips_heap),
+                                         (SELECT MAX(scheduled_datetime) FROM deliveries_heap),
+                                         CURRENT_DATE::timestamp)) + INTERVAL '1 month',
+            INTERVAL '1 month'
+        )::date
+    LOOP
+        EXECUTE format('CREATE TABLE %I PARTITION OF trips FOR VALUES FROM (%L) TO (%L)',
+                       'trips_' || to_char(month_start, 'YYYY_MM'), month_start, month_start + INTERVAL '1 month');
+        EXECUTE format('CREATE TABLE %I PARTITION OF deliveries FOR VALUES FROM (%L) TO (%L)',
+                       'deliveries_' || to_char(month_start, 'YYYY_MM'), month_start, month_start + INTERVAL '1 month');
+    END LOOP;
+END $$;
+
+-- =====================================================
+-- PASO 4: Copiar los datos y alinear las secuencias SERIAL
+-- =====================================================
+INSERT INTO trips SELECT * FROM trips_heap;
+INSERT INTO deliveries SELECT * FROM deliveries_heap;
+
+SELECT setval(pg_get_serial_sequence('trips', 'trip_id'), GREATEST(MAX(trip_id), 1)) FROM trips;
+SELECT setval(pg_get_serial_sequence('deliveries', 'delivery_id'), GREATEST(MAX(delivery_id), 1)) FROM deliveries;
+
+-- =====================================================
+-- PASO 5: Retirar las tablas heap y recrear los índices básicos
+-- =====================================================
+DROP TABLE deliveries_heap;
+DROP TABLE trips_heap;
+
+CREATE INDEX idx_trips_departure ON trips(departure_datetime);
+CREATE INDEX idx_deliveries_status ON deliveries(delivery_status);
+-- Cota de poda del ETL incremental (A3-05): MIN(scheduled_datetime) de las entregas modificadas sin
+-- recorrer todas las particiones
+CREATE INDEX idx_deliveries_delivered ON deliveries(delivered_datetime);
+
+-- Índices de SQL/A2-03_optimization_indexes.sql sobre trips y deliveries: se perdieron con las tablas heap
+-- (los de maintenance, drivers y routes no cambian). Otros índices creados a mano deben recrearse aparte
+CREATE INDEX IF NOT EXISTS idx_trips_composite_joins ON trips(vehicle_id, driver_id, route_id, departure_datetime)
+WHERE status = 'completed';
+CREATE INDEX IF NOT EXISTS idx_deliveries_scheduled_datetime ON deliveries(scheduled_datetime, delivery_status)
+WHERE delivery_status = 'delivered';
+
+-- La publicación del CDC (A3-05) debe informar los cambios con el nombre de la tabla raíz
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_publication WHERE pubname = 'fleetlogix_cdc') THEN
+        ALTER PUBLICATION fleetlogix_cdc SET (publish_via_partition_root = true);
+        ALTER PUBLICATION fleetlogix_cdc SET TABLE public.trips, public.deliveries;
+    END IF;
+END $$;
+
+COMMIT;
+
+ANALYZE trips;
+ANALYZE deliveries;
+
+-- =====================================================
+-- RETENCIÓN DE HISTÓRICO
+-- =====================================================
+-- Con particiones, borrar un mes completo es una operación de catálogo (sin recorrer filas,
+-- sin tuplas muertas ni VACUUM posterior). Ejemplo para enero de 2024:
+--   ALTER TABLE deliveries DETACH PARTITION deliveries_2024_01;
+--   DROP TABLE deliveries_2024_01;
+--   ALTER TABLE trips DETACH PARTITION trips_2024_01;
+--   DROP TABLE trips_2024_01;
+-- Equivalente en tablas heap:
+--   DELETE FROM deliveries WHERE scheduled_datetime < '2024-02-01';
+--   DELETE FROM trips WHERE departure_datetime < '2024-02-01';
+--   VACUUM deliveries; VACUUM trips;
+
+-- =====================================================
+-- VERIFICAR PARTICIONES CREADAS
+-- =====================================================
+SELECT
+    parent.relname AS tabla,
+    child.relname AS particion,
+    pg_get_expr(child.relpartbound, child.oid) AS rango,
+    child.reltuples::BIGINT AS filas_estimadas
+FROM pg_inherits i
+JOIN pg_class parent ON parent.oid = i.inhparent
+JOIN pg_class child ON child.oid = i.inhrelid
+WHERE parent.relname IN ('trips', 'deliveries')
+ORDER BY parent.relname, child.relname;
@@ -63,7 +63,8 @@ CREATE OR REPLACE TABLE dim_vehicle (
     last_maintenance_date DATE,
     valid_from DATE,
     valid_to DATE,
-    is_current BOOLEAN
+    is_current BOOLEAN,
+    row_hash BIGINT               -- Hash de atributos (detección de cambios del ETL)
 );
 
 -- Dimensión Conductor
@@ -81,7 +82,8 @@ CREATE OR REPLACE TABLE dim_driver (
     performance_category VARCHAR(20), -- 'Alto', 'Medio', 'Bajo'
     valid_from DATE,
     valid_to DATE,
-    is_current BOOLEAN
+    is_current BOOLEAN,
+    row_hash BIGINT               -- Hash de atributos (detección de cambios del ETL)
 );
 
 -- Dimensión Ruta
@@ -95,7 +97,8 @@ CREATE OR REPLACE TABLE dim_route (
     estimated_duration_hours DECIMAL(5,2),
     toll_cost DECIMAL(10,2),
     difficulty_level VARCHAR(20), -- 'Fácil', 'Medio', 'Difícil'
-    route_type VARCHAR(20)        -- 'Urbana', 'Interurbana', 'Rural'
+    route_type VARCHAR(20),       -- 'Urbana', 'Interurbana', 'Rural'
+    row_hash BIGINT               -- Hash de atributos (detección de cambios del ETL)
 );
 
 -- Dimensión Cliente
@@ -107,7 +110,8 @@ CREATE OR REPLACE TABLE dim_customer (
     city VARCHAR(100),
     first_delivery_date DATE,
     total_deliveries INT,
-    customer_category VARCHAR(20)  -- 'Premium', 'Regular', 'Ocasional'
+    customer_category VARCHAR(20), -- 'Premium', 'Regular', 'Ocasional'
+    row_hash BIGINT                -- Hash de atributos (detección de cambios del ETL)
 );
 
 -- =====================================================
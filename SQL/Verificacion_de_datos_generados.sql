@@ -1,3 +1,6 @@
+-- Estas verificaciones (entregas imposibles, rangos de ocupación, integridad) se evalúan automáticamente
+-- con A1-02_data_quality.py: sobre cada bloque antes de cargarlo o sobre una muestra con --sample-percent
+
 -- Conteo de registros por tabla ✅
 SELECT 'vehicles' as tabla, COUNT(*) as cantidad FROM vehicles
 UNION ALL
@@ -42,6 +42,8 @@ CREATE TABLE routes (
 );
 
 -- Tabla 4: trips (viajes realizados)
+-- trips y deliveries son tablas heap con todas sus restricciones. El particionamiento mensual es opcional
+-- (SQL/A2-05_partitioning.sql) y cambia integridad por retención: ver el encabezado de ese script
 CREATE TABLE trips (
     trip_id SERIAL PRIMARY KEY,
     vehicle_id INTEGER REFERENCES vehicles(vehicle_id),